@@ -24,6 +24,8 @@ const int MQTT_PORT = 1883;
 // Topics avec préfixe unique
 const String UNIQUE_ID = "hachem_smartparking_2026";
 const String TOPIC_STATUS = UNIQUE_ID + "/parking/status";
+// Compteurs seuls, publiés (retenus) uniquement quand ils changent
+const String TOPIC_DISPONIBLES = TOPIC_STATUS + "/disponibles";
 const String TOPIC_BARRIER = UNIQUE_ID + "/parking/barrier/command";
 
 // ═══════════════════════════════════════════════════════════════
@@ -123,7 +125,7 @@ void mqtt_callback(char* topic, byte* payload, unsigned int length) {
   }
 
   // ============ STATUS PARKING ============
-  if (String(topic) == TOPIC_STATUS) {
+  if (String(topic) == TOPIC_DISPONIBLES) {
     int available = doc["available"] | 0;
     int total = doc["total"] | 8;
     
@@ -183,12 +185,12 @@ void reconnect_mqtt() {
       Serial.println("✓");
       
       // S'abonner
-      mqtt.subscribe(TOPIC_STATUS.c_str());
+      mqtt.subscribe(TOPIC_DISPONIBLES.c_str());
       mqtt.subscribe(TOPIC_BARRIER.c_str());
       
       Serial.println("  Abonné à:");
       Serial.print("    - ");
-      Serial.println(TOPIC_STATUS);
+      Serial.println(TOPIC_DISPONIBLES);
       Serial.print("    - ");
       Serial.println(TOPIC_BARRIER);
       
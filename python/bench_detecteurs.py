@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+BENCHMARK DÉTECTEURS D'OCCUPATION
+ms/image et exactitude de chaque détecteur sur des images
+enregistrées (vérité terrain annotée) ou synthétiques
+═══════════════════════════════════════════════════════════════
+
+Usage:
+    python bench_detecteurs.py --enregistrer 50 --dossier enregistrements   (ESP32-CAM → jpg + verite.json)
+    python bench_detecteurs.py --dossier enregistrements                     (après correction de verite.json)
+    python bench_detecteurs.py --demo                                        (images synthétiques, sans caméra)
+    python bench_detecteurs.py --demo --detecteurs diff,histogramme --images 300
+
+Dossier enregistré:
+    reference.jpg      parking vide (sinon reference_vide.jpg)
+    zones.json         zones des places (sinon zones_parking.json)
+    verite.json        {"img_0001.jpg": {"P1": true, "P2": false, ...}, ...}
+    img_*.jpg          images à évaluer
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from detecteurs import creer_detecteur, noms_detecteurs
+
+# ═══════════════════════════════════════════════════════════════
+# JEU D'IMAGES
+# ═══════════════════════════════════════════════════════════════
+
+def charger_dossier(dossier):
+    """Returns: (reference, zones, [(nom_fichier, img, verite)])"""
+    def premier(*chemins):
+        return next((c for c in chemins if os.path.exists(c)), None)
+
+    chemin_reference = premier(os.path.join(dossier, "reference.jpg"), "reference_vide.jpg")
+    chemin_zones = premier(os.path.join(dossier, "zones.json"), "zones_parking.json")
+    if chemin_zones is None:
+        raise FileNotFoundError("zones.json / zones_parking.json introuvable")
+
+    reference = cv2.imread(chemin_reference) if chemin_reference else None
+    with open(chemin_zones) as f:
+        zones = json.load(f)
+    with open(os.path.join(dossier, "verite.json")) as f:
+        verite = json.load(f)
+
+    images = []
+    for nom_fichier in sorted(verite):
+        img = cv2.imread(os.path.join(dossier, nom_fichier))
+        if img is None:
+            print(f"⚠️  {nom_fichier} illisible, ignorée")
+            continue
+        images.append((nom_fichier, img, verite[nom_fichier]))
+    return reference, zones, images
+
+def enregistrer_images(dossier, nombre, ip, port, intervalle):
+    """Capturer des images ESP32-CAM + un verite.json pré-rempli (à corriger à la main)"""
+    from camera_esp32 import obtenir_camera, fermer_cameras
+
+    os.makedirs(dossier, exist_ok=True)
+    if os.path.exists("zones_parking.json"):
+        shutil.copy("zones_parking.json", os.path.join(dossier, "zones.json"))
+    if os.path.exists("reference_vide.jpg"):
+        shutil.copy("reference_vide.jpg", os.path.join(dossier, "reference.jpg"))
+
+    reference, zones = None, {}
+    if os.path.exists(os.path.join(dossier, "zones.json")):
+        with open(os.path.join(dossier, "zones.json")) as f:
+            zones = json.load(f)
+    if os.path.exists(os.path.join(dossier, "reference.jpg")):
+        reference = cv2.imread(os.path.join(dossier, "reference.jpg"))
+    detecteur = creer_detecteur("diff" if reference is not None else "contours")
+
+    camera = obtenir_camera(ip, port)
+    verite = {}
+    for i in range(1, nombre + 1):
+        img = camera.capturer_frame()
+        if img is None:
+            print(f"✗ Capture {i}: échec")
+            continue
+        nom_fichier = f"img_{i:04d}.jpg"
+        cv2.imwrite(os.path.join(dossier, nom_fichier), img)
+        analyses = detecteur.analyser(img, reference, zones)
+        verite[nom_fichier] = {nom: analyses[nom]['occupe'] for nom in sorted(analyses)}
+        print(f"📷 {nom_fichier} ({i}/{nombre})")
+        time.sleep(intervalle)
+    fermer_cameras()
+
+    with open(os.path.join(dossier, "verite.json"), "w") as f:
+        json.dump(verite, f, indent=2)
+    print(f"\n✓ {len(verite)} images dans {dossier}/")
+    print("   Corrigez verite.json (pré-rempli par le détecteur) avant de mesurer")
+
+def images_demo(nombre, graine=0):
+    """
+    Parking synthétique 8 places : texture d'asphalte, marquages,
+    voitures texturées, lumière qui baisse (crépuscule), bruit caméra
+    et piétons ponctuels sur des places libres.
+    """
+    rng = np.random.default_rng(graine)
+    hauteur, largeur = 480, 640
+
+    fond = cv2.GaussianBlur(rng.normal(110, 25, (hauteur, largeur)).astype(np.float32), (0, 0), 2)
+    zones = {}
+    for i in range(8):
+        x, y = 40 + (i % 4) * 145, 60 + (i // 4) * 200
+        zones[f"P{i + 1}"] = [x, y, 120, 150]
+        cv2.rectangle(fond, (x - 6, y), (x - 3, y + 150), 235, -1)  # marquage au sol
+
+    def vers_bgr(gris):
+        return cv2.cvtColor(np.clip(gris, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+    reference = vers_bgr(fond)
+    images = []
+    for n in range(nombre):
+        lumiere = 1.0 - 0.45 * n / max(nombre - 1, 1)
+        gris = fond * lumiere
+        verite = {}
+        for nom, (x, y, w, h) in zones.items():
+            occupe = bool(rng.random() < 0.5)
+            verite[nom] = occupe
+            if occupe:
+                mx, my = int(rng.integers(5, 20)), int(rng.integers(5, 25))
+                teinte = rng.uniform(20, 230)
+                voiture = np.full((h - 2 * my, w - 2 * mx), teinte, np.float32)
+                voiture += rng.normal(0, 12, voiture.shape)
+                cv2.rectangle(voiture, (8, 15), (voiture.shape[1] - 8, 45), teinte * 0.3, -1)  # pare-brise
+                gris[y + my:y + h - my, x + mx:x + w - mx] = voiture * lumiere
+            elif rng.random() < 0.1:
+                px, py = x + int(rng.integers(10, w - 30)), y + int(rng.integers(10, h - 50))
+                gris[py:py + 40, px:px + 18] = rng.uniform(30, 200) * lumiere  # piéton
+        gris += rng.normal(0, 4, gris.shape)
+        images.append((f"demo_{n:04d}", vers_bgr(gris), verite))
+    return reference, zones, images
+
+# ═══════════════════════════════════════════════════════════════
+# MESURE
+# ═══════════════════════════════════════════════════════════════
+
+def mesurer(detecteur, reference, zones, images):
+    if detecteur.besoin_reference and reference is None:
+        return None
+
+    detecteur.analyser(images[0][1], reference, zones)  # caches (gris, géométrie) hors mesure
+    durees = []
+    justes = faux_occupes = faux_libres = 0
+    for _, img, verite in images:
+        debut = time.perf_counter()
+        analyses = detecteur.analyser(img, reference, zones)
+        durees.append(time.perf_counter() - debut)
+
+        for nom, attendu in verite.items():
+            obtenu = analyses.get(nom, {}).get('occupe', False)
+            if obtenu == attendu:
+                justes += 1
+            elif obtenu:
+                faux_occupes += 1
+            else:
+                faux_libres += 1
+
+    total = justes + faux_occupes + faux_libres
+    durees.sort()
+    return {
+        'ms_p50': statistics.median(durees) * 1000,
+        'ms_p95': durees[max(int(len(durees) * 0.95) - 1, 0)] * 1000,
+        'exactitude': justes / total * 100 if total else 0.0,
+        'faux_occupes': faux_occupes,
+        'faux_libres': faux_libres
+    }
+
+def afficher(nom, r):
+    if r is None:
+        print(f"   {nom:15} ignoré (besoin d'une image de référence)")
+        return
+    print(f"   {nom:15} p50 {r['ms_p50']:7.2f}ms | p95 {r['ms_p95']:7.2f}ms | "
+          f"exactitude {r['exactitude']:5.1f}% | faux occupés {r['faux_occupes']:4} | "
+          f"faux libres {r['faux_libres']:4}")
+
+# ═══════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparer les détecteurs d'occupation")
+    parser.add_argument("--dossier", default="enregistrements", help="images enregistrées + verite.json")
+    parser.add_argument("--demo", action="store_true", help="images synthétiques (sans caméra)")
+    parser.add_argument("--images", type=int, default=200, help="nombre d'images synthétiques")
+    parser.add_argument("--detecteurs", default=",".join(noms_detecteurs()), help="liste séparée par des virgules")
+    parser.add_argument("--modele", help="fichier ONNX pour le détecteur 'modele'")
+    parser.add_argument("--enregistrer", type=int, metavar="N", help="capturer N images ESP32-CAM dans --dossier")
+    parser.add_argument("--ip", default="192.168.7.20", help="ESP32-CAM (avec --enregistrer)")
+    parser.add_argument("--port", type=int, default=81)
+    parser.add_argument("--intervalle", type=float, default=2.0, help="secondes entre deux captures")
+    args = parser.parse_args()
+
+    if args.enregistrer:
+        enregistrer_images(args.dossier, args.enregistrer, args.ip, args.port, args.intervalle)
+        return
+
+    if args.demo:
+        reference, zones, images = images_demo(args.images)
+        source = f"{len(images)} images synthétiques"
+    else:
+        reference, zones, images = charger_dossier(args.dossier)
+        source = f"{len(images)} images de {args.dossier}/"
+    if not images:
+        print("✗ Aucune image à évaluer")
+        return
+
+    print(f"\n🔬 {source}, {len(zones)} places, {images[0][1].shape[1]}x{images[0][1].shape[0]}\n")
+
+    for nom in args.detecteurs.split(","):
+        options = {'chemin': args.modele} if nom == "modele" and args.modele else {}
+        try:
+            detecteur = creer_detecteur(nom, **options)
+        except (ValueError, OSError, cv2.error) as e:
+            print(f"   {nom:15} indisponible: {e}")
+            continue
+        afficher(nom, mesurer(detecteur, reference, zones, images))
+
+if __name__ == "__main__":
+    main()
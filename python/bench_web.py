@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+BENCHMARK SERVEUR WEB
+N clients "tableau de bord" en parallèle : /api/status en boucle
++ image annotée revalidée (If-None-Match) une fois sur trois
+═══════════════════════════════════════════════════════════════
+
+Usage:
+    python bench_web.py --url http://localhost:8888            (serveur lancé)
+    python bench_web.py --demo                                 (HTTPServer vs pool, sans caméra)
+    python bench_web.py --demo --clients 50 --lents 3 --duree 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+from serveur_web import ServeurHTTPConcurrent, GestionnaireWeb
+
+# ═══════════════════════════════════════════════════════════════
+# SERVEUR DE DÉMONSTRATION
+# ═══════════════════════════════════════════════════════════════
+
+STATUT_DEMO = {
+    'places': {f"P{i}": {'occupe': i % 3 == 0,
+                         'details': {'occupe': i % 3 == 0, 'pourcentage_diff': 12.5 * i}}
+               for i in range(1, 9)},
+    'timestamp': "2026-01-01 12:00:00",
+    'total': 8,
+    'available': 6,
+    'occupied': 2
+}
+IMAGE_DEMO = os.urandom(200 * 1024)     # taille typique d'un JPEG 800x600
+ETAG_DEMO = '"demo"'
+
+class HandlerAncien(BaseHTTPRequestHandler):
+    """Comportement d'origine : HTTP/1.0, une connexion par requête, pas de gzip"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith('/api/status'):
+            corps, type_contenu = json.dumps(STATUT_DEMO).encode(), 'application/json'
+        else:
+            corps, type_contenu = IMAGE_DEMO, 'image/jpeg'
+        self.send_response(200)
+        self.send_header('Content-type', type_contenu)
+        self.end_headers()
+        self.wfile.write(corps)
+
+class HandlerConcurrent(GestionnaireWeb):
+    """Même contenu via GestionnaireWeb (keep-alive, gzip, 304)"""
+
+    def do_GET(self):
+        if self.path.startswith('/api/status'):
+            self.envoyer_json(STATUT_DEMO)
+        elif self.headers.get('If-None-Match') == ETAG_DEMO:
+            self.send_response(304)
+            self.send_header('ETag', ETAG_DEMO)
+            self.end_headers()
+        else:
+            self.envoyer(IMAGE_DEMO, 'image/jpeg', entetes={'ETag': ETAG_DEMO})
+
+def lancer_demo(classe_serveur, handler):
+    serveur = classe_serveur(('127.0.0.1', 0), handler)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur, f"http://127.0.0.1:{serveur.server_port}"
+
+# ═══════════════════════════════════════════════════════════════
+# CLIENTS
+# ═══════════════════════════════════════════════════════════════
+
+def client_tableau_de_bord(hote, port, fin, latences, erreurs):
+    """Un onglet ouvert : statut en boucle, image revalidée 1 fois sur 3"""
+    connexion = http.client.HTTPConnection(hote, port, timeout=10)
+    etag = None
+    n = 0
+    while time.monotonic() < fin:
+        n += 1
+        chemin, entetes = '/api/status', {'Accept-Encoding': 'gzip'}
+        if n % 3 == 0:
+            chemin = '/image/parking_annotated.jpg'
+            entetes = {'If-None-Match': etag} if etag else {}
+
+        debut = time.perf_counter()
+        try:
+            connexion.request('GET', chemin, headers=entetes)
+            response = connexion.getresponse()
+            response.read()
+            if response.getheader('ETag'):
+                etag = response.getheader('ETag')
+            latences.append(time.perf_counter() - debut)
+        except (OSError, http.client.HTTPException):
+            erreurs.append(chemin)
+            connexion.close()
+    connexion.close()
+
+def client_lent(hote, port, fin):
+    """Téléphone en 3G : télécharge l'image 1 Ko toutes les 50 ms"""
+    while time.monotonic() < fin:
+        try:
+            with socket.create_connection((hote, port), timeout=10) as s:
+                s.sendall(b"GET /image/parking_annotated.jpg HTTP/1.0\r\nHost: x\r\n\r\n")
+                while time.monotonic() < fin and s.recv(1024):
+                    time.sleep(0.05)
+        except OSError:
+            time.sleep(0.1)
+
+def mesurer(url, nb_clients, nb_lents, duree):
+    cible = urlsplit(url)
+    hote, port = cible.hostname, cible.port or 80
+    fin = time.monotonic() + duree
+    latences, erreurs = [], []
+
+    threads = [threading.Thread(target=client_lent, args=(hote, port, fin), daemon=True)
+               for _ in range(nb_lents)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)  # les clients lents occupent le serveur en premier
+
+    clients = [threading.Thread(target=client_tableau_de_bord, args=(hote, port, fin, latences, erreurs))
+               for _ in range(nb_clients)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+
+    resultat = {'requetes': len(latences), 'erreurs': len(erreurs),
+                'req_s': len(latences) / duree}
+    if latences:
+        latences.sort()
+        resultat['p50_ms'] = statistics.median(latences) * 1000
+        resultat['p95_ms'] = latences[int(len(latences) * 0.95) - 1] * 1000
+        resultat['max_ms'] = latences[-1] * 1000
+    return resultat
+
+def afficher(nom, r):
+    if not r['requetes']:
+        print(f"   {nom:28} aucune réponse ({r['erreurs']} erreurs)")
+        return
+    print(f"   {nom:28} {r['req_s']:8.0f} req/s | p50 {r['p50_ms']:7.1f}ms | "
+          f"p95 {r['p95_ms']:7.1f}ms | max {r['max_ms']:7.0f}ms | erreurs {r['erreurs']}")
+
+# ═══════════════════════════════════════════════════════════════
+# MAIN
+# ═══════════════════════════════════════════════════════════════
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge du serveur web parking")
+    parser.add_argument("--url", default="http://localhost:8888", help="serveur à tester")
+    parser.add_argument("--demo", action="store_true", help="comparer HTTPServer et le pool en local")
+    parser.add_argument("--clients", type=int, default=50, help="tableaux de bord simultanés")
+    parser.add_argument("--lents", type=int, default=0, help="clients lents (image en 3G)")
+    parser.add_argument("--duree", type=float, default=10, help="secondes par mesure")
+    args = parser.parse_args()
+
+    print(f"\n🌐 {args.clients} clients, {args.lents} lent(s), {args.duree:.0f}s par mesure\n")
+
+    if not args.demo:
+        afficher(args.url, mesurer(args.url, args.clients, args.lents, args.duree))
+        return
+
+    for nom, classe_serveur, handler in [
+        ("HTTPServer (origine)", HTTPServer, HandlerAncien),
+        ("ServeurHTTPConcurrent", ServeurHTTPConcurrent, HandlerConcurrent),
+    ]:
+        serveur, url = lancer_demo(classe_serveur, handler)
+        afficher(nom, mesurer(url, args.clients, args.lents, args.duree))
+        serveur.shutdown()
+        serveur.server_close()
+
+if __name__ == "__main__":
+    main()
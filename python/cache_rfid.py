@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+CACHE LOCAL DES CARTES RFID
+Table rfid_cards gardée en mémoire (clé card_uid)
+Préchargement au démarrage + rafraîchissement par updated_at
+Cache négatif pour les cartes inconnues, TTL et taille bornée
+═══════════════════════════════════════════════════════════════
+"""
+
+import collections
+import threading
+import time
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+TTL_CARTE = 600              # secondes avant revérification d'une carte connue
+TTL_INCONNUE = 60            # secondes avant revérification d'une carte inconnue
+TAILLE_MAX = 10000           # entrées max (les moins récemment utilisées sortent)
+INTERVALLE_RAFRAICHISSEMENT = 30  # secondes entre deux lectures incrémentales
+TAILLE_PAGE = 1000           # lignes par requête de préchargement
+
+# ═══════════════════════════════════════════════════════════════
+# CACHE
+# ═══════════════════════════════════════════════════════════════
+
+class CacheCartesRFID:
+    """
+    Décisions RFID sans aller-retour Supabase
+
+    obtenir() répond depuis la mémoire ; seule une carte absente ou
+    expirée déclenche une requête. Si Supabase est injoignable, une
+    entrée expirée est encore utilisée (la borne continue de
+    fonctionner pendant une coupure courte). Les cartes modifiées
+    (updated_at) sont relues en arrière-plan.
+
+    Avec un miroir (MiroirLocal synchronisé), une carte absente du
+    cache est lue dans la base SQLite locale ; Supabase n'est
+    interrogé que si le miroir ne la connaît pas (carte ajoutée depuis
+    la dernière synchronisation). Elle n'est mise en cache comme
+    inconnue que si Supabase ne la connaît pas non plus. Le miroir est
+    alors la seule source de rfid_cards : préchargement depuis la base
+    locale, pas de rafraîchissement propre, et les cartes que le miroir
+    modifie ou supprime sont retirées du cache.
+    """
+
+    def __init__(self, supabase, table="rfid_cards", ttl=TTL_CARTE,
+                 ttl_inconnue=TTL_INCONNUE, taille_max=TAILLE_MAX, miroir=None):
+        self.supabase = supabase
+        self.miroir = miroir
+        self.table = table
+        self.ttl = ttl
+        self.ttl_inconnue = ttl_inconnue
+        self.taille_max = taille_max
+
+        self._lock = threading.Lock()
+        self._cartes = collections.OrderedDict()  # card_uid → (carte ou None, expiration)
+        self._dernier_updated_at = None
+        self._arret = threading.Event()
+        if miroir is not None:
+            miroir.sur_changement_cartes(self.oublier)
+
+        # Statistiques
+        self.nb_hits = 0
+        self.nb_hits_inconnues = 0
+        self.nb_requetes = 0
+        self.nb_lectures_miroir = 0
+        self.nb_perimees_servies = 0
+        self.nb_erreurs = 0
+        self.dernier_rafraichissement = None
+
+    def _stocker(self, card_uid, carte, maintenant):
+        """Ajouter / remplacer une entrée (appelé avec self._lock)"""
+        ttl = self.ttl if carte is not None else self.ttl_inconnue
+        self._cartes[card_uid] = (carte, maintenant + ttl)
+        self._cartes.move_to_end(card_uid)
+        while len(self._cartes) > self.taille_max:
+            self._cartes.popitem(last=False)
+
+    def _avancer_updated_at(self, cartes):
+        """
+        Repère de rafraichir() (appelé avec self._lock)
+
+        Seulement depuis une lecture complète ou incrémentale de la table :
+        une carte lue seule (obtenir) peut être plus récente que d'autres
+        modifications pas encore relues.
+        """
+        for carte in cartes:
+            if carte.get('updated_at') and (self._dernier_updated_at is None
+                                            or carte['updated_at'] > self._dernier_updated_at):
+                self._dernier_updated_at = carte['updated_at']
+
+    def oublier(self, card_uids):
+        """Retirer des cartes (supprimées en amont)"""
+        with self._lock:
+            for card_uid in card_uids:
+                self._cartes.pop(card_uid, None)
+
+    def obtenir(self, card_uid):
+        """
+        Returns:
+            dict de la carte, ou None si la carte est inconnue
+
+        Raises:
+            Exception Supabase si la carte n'est pas en cache et que
+            la base est injoignable
+        """
+        maintenant = time.monotonic()
+        with self._lock:
+            entree = self._cartes.get(card_uid)
+            if entree is not None and entree[1] > maintenant:
+                self._cartes.move_to_end(card_uid)
+                if entree[0] is None:
+                    self.nb_hits_inconnues += 1
+                else:
+                    self.nb_hits += 1
+                return entree[0]
+
+        miroir_pret = self.miroir is not None and self.miroir.pret
+        if miroir_pret:
+            self.nb_lectures_miroir += 1
+            carte = self.miroir.carte(card_uid)
+            if carte is not None:
+                with self._lock:
+                    self._stocker(card_uid, carte, time.monotonic())
+                return carte
+
+        # Absente du miroir : peut-être ajoutée depuis la dernière synchronisation
+        try:
+            self.nb_requetes += 1
+            response = self.supabase.table(self.table)\
+                .select("*")\
+                .eq("card_uid", card_uid)\
+                .execute()
+        except Exception:
+            self.nb_erreurs += 1
+            if entree is not None:
+                self.nb_perimees_servies += 1
+                return entree[0]
+            if miroir_pret:
+                return None  # inconnue en local, sans cache négatif : Supabase redemandé au prochain passage
+            raise
+
+        carte = response.data[0] if response.data else None
+        with self._lock:
+            self._stocker(card_uid, carte, time.monotonic())
+        return carte
+
+    def precharger(self):
+        """Charger toute la table (miroir local s'il est prêt, sinon Supabase paginé), retourne le nombre de cartes"""
+        if self.miroir is not None and self.miroir.pret:
+            cartes = self.miroir.cartes()
+            maintenant = time.monotonic()
+            with self._lock:
+                for carte in cartes:
+                    self._stocker(carte['card_uid'], carte, maintenant)
+                self.dernier_rafraichissement = time.time()
+            return len(cartes)
+
+        cartes = []
+        debut = 0
+        while True:
+            response = self.supabase.table(self.table)\
+                .select("*")\
+                .range(debut, debut + TAILLE_PAGE - 1)\
+                .execute()
+            cartes.extend(response.data or [])
+            if not response.data or len(response.data) < TAILLE_PAGE:
+                break
+            debut += TAILLE_PAGE
+
+        maintenant = time.monotonic()
+        with self._lock:
+            for carte in cartes:
+                self._stocker(carte['card_uid'], carte, maintenant)
+            self._avancer_updated_at(cartes)
+            self.dernier_rafraichissement = time.time()
+        return len(cartes)
+
+    def rafraichir(self):
+        """Relire uniquement les cartes modifiées depuis le dernier updated_at"""
+        with self._lock:
+            depuis = self._dernier_updated_at
+
+        requete = self.supabase.table(self.table).select("*")
+        if depuis is not None:
+            requete = requete.gt("updated_at", depuis)
+        response = requete.execute()
+
+        maintenant = time.monotonic()
+        with self._lock:
+            for carte in response.data or []:
+                self._stocker(carte['card_uid'], carte, maintenant)
+            self._avancer_updated_at(response.data or [])
+            self.dernier_rafraichissement = time.time()
+        return len(response.data or [])
+
+    def demarrer(self, intervalle=INTERVALLE_RAFRAICHISSEMENT):
+        """Thread de rafraîchissement incrémental (aucun avec un miroir : il relit déjà rfid_cards)"""
+        if self.miroir is not None:
+            return None
+
+        def boucle():
+            while not self._arret.wait(intervalle):
+                try:
+                    modifiees = self.rafraichir()
+                    if modifiees:
+                        print(f"🔄 Cache RFID: {modifiees} carte(s) mise(s) à jour")
+                except Exception as e:
+                    self.nb_erreurs += 1
+                    print(f"✗ Rafraîchissement cache RFID: {e}")
+
+        self._arret.clear()
+        thread = threading.Thread(target=boucle, daemon=True)
+        thread.start()
+        return thread
+
+    def arreter(self):
+        self._arret.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'taille': len(self._cartes),
+                'hits': self.nb_hits,
+                'hits_inconnues': self.nb_hits_inconnues,
+                'requetes': self.nb_requetes,
+                'lectures_miroir': self.nb_lectures_miroir,
+                'perimees_servies': self.nb_perimees_servies,
+                'erreurs': self.nb_erreurs,
+                'dernier_updated_at': self._dernier_updated_at,
+                'dernier_rafraichissement': self.dernier_rafraichissement
+            }
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+CLIENT CAPTURE ESP32-CAM
+Connexion HTTP/1.1 keep-alive persistante vers /capture
+Reconnexion avec backoff exponentiel + mesure latence
+Décodage JPEG en mémoire (sans passer par le disque)
+═══════════════════════════════════════════════════════════════
+"""
+
+import cv2
+import numpy as np
+import http.client
+import threading
+import time
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+TIMEOUT_CAPTURE = 5          # secondes (connexion + lecture)
+BACKOFF_MIN = 0.5            # délai après le premier échec
+BACKOFF_MAX = 30.0           # délai maximum entre deux tentatives
+USER_AGENT = 'SmartParking/1.0'
+
+# ═══════════════════════════════════════════════════════════════
+# DÉCODAGE
+# ═══════════════════════════════════════════════════════════════
+
+def decoder_jpeg(donnees):
+    """Décoder un JPEG en mémoire (bytes, bytearray ou memoryview) → image BGR ou None"""
+    if not donnees:
+        return None
+    return cv2.imdecode(np.frombuffer(donnees, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+# ═══════════════════════════════════════════════════════════════
+# CLIENT CAMÉRA
+# ═══════════════════════════════════════════════════════════════
+
+class CameraClient:
+    """
+    Client HTTP persistant pour une ESP32-CAM
+
+    Garde une seule connexion TCP ouverte vers la caméra et la
+    réutilise à chaque capture (le serveur httpd de l'ESP32 n'a que
+    quelques sockets). Après un échec, les tentatives sont espacées
+    par un backoff exponentiel pour ne pas bloquer la boucle
+    d'analyse sur des timeouts répétés.
+    """
+
+    def __init__(self, ip, port=81, chemin='/capture', timeout=TIMEOUT_CAPTURE):
+        self.ip = ip
+        self.port = port
+        self.chemin = chemin
+        self.timeout = timeout
+
+        self._conn = None
+        self._lock = threading.Lock()
+        self._tampon = bytearray(64 * 1024)  # réutilisé d'une capture à l'autre
+        self._backoff = 0.0
+        self._prochaine_tentative = 0.0
+
+        # Statistiques
+        self.nb_captures = 0
+        self.nb_erreurs = 0
+        self.nb_connexions = 0
+        self.derniere_latence_ms = None
+        self.latence_moyenne_ms = None
+        self.derniere_erreur = None
+
+    @property
+    def url(self):
+        return f"http://{self.ip}:{self.port}{self.chemin}"
+
+    def _ouvrir(self):
+        self._conn = http.client.HTTPConnection(self.ip, self.port, timeout=self.timeout)
+        self.nb_connexions += 1
+
+    def _fermer(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _echec(self, erreur):
+        self._fermer()
+        self.nb_erreurs += 1
+        self.derniere_erreur = str(erreur)
+        self._backoff = min(BACKOFF_MAX, max(BACKOFF_MIN, self._backoff * 2))
+        self._prochaine_tentative = time.monotonic() + self._backoff
+
+    def _lire(self, response):
+        """Lire le corps de la réponse dans le tampon, retourne la taille"""
+        longueur = response.getheader('Content-Length')
+
+        if longueur is None:
+            donnees = response.read()
+            taille = len(donnees)
+            if taille > len(self._tampon):
+                self._tampon = bytearray(taille)
+            self._tampon[:taille] = donnees
+            return taille
+
+        taille = int(longueur)
+        if taille > len(self._tampon):
+            self._tampon = bytearray(taille)
+
+        vue = memoryview(self._tampon)
+        lus = 0
+        while lus < taille:
+            n = response.readinto(vue[lus:taille])
+            if not n:
+                raise http.client.IncompleteRead(bytes(vue[:lus]), taille - lus)
+            lus += n
+        return taille
+
+    def _requete(self):
+        self._conn.request('GET', self.chemin, headers={
+            'User-Agent': USER_AGENT,
+            'Connection': 'keep-alive'
+        })
+        response = self._conn.getresponse()
+
+        if response.status != 200:
+            response.read()
+            raise http.client.HTTPException(f"HTTP {response.status}")
+
+        taille = self._lire(response)
+
+        # La caméra a demandé la fermeture → nouvelle connexion au prochain appel
+        if response.will_close:
+            self._fermer()
+
+        return taille
+
+    def _capturer(self):
+        """Capture dans le tampon partagé (appelé avec self._lock)"""
+        if time.monotonic() < self._prochaine_tentative:
+            return None
+
+        debut = time.perf_counter()
+        reutilisee = self._conn is not None
+
+        try:
+            if self._conn is None:
+                self._ouvrir()
+            try:
+                taille = self._requete()
+            except ConnectionError:
+                # Connexion keep-alive fermée côté ESP32 → un seul nouvel essai
+                if not reutilisee:
+                    raise
+                self._fermer()
+                self._ouvrir()
+                taille = self._requete()
+        except (http.client.HTTPException, OSError) as e:
+            self._echec(e)
+            return None
+
+        latence = (time.perf_counter() - debut) * 1000
+        self.derniere_latence_ms = latence
+        if self.latence_moyenne_ms is None:
+            self.latence_moyenne_ms = latence
+        else:
+            self.latence_moyenne_ms = 0.8 * self.latence_moyenne_ms + 0.2 * latence
+
+        self.nb_captures += 1
+        self.derniere_erreur = None
+        self._backoff = 0.0
+        self._prochaine_tentative = 0.0
+        return taille
+
+    def _ecrire_debug(self, jpeg, fichier_debug, periode_debug):
+        if fichier_debug and periode_debug and self.nb_captures % periode_debug == 0:
+            with open(fichier_debug, "wb") as f:
+                f.write(jpeg)
+
+    def capturer(self, fichier_debug=None, periode_debug=0):
+        """
+        Récupérer une image JPEG brute
+
+        Returns:
+            bytes du JPEG, ou None si la caméra est injoignable
+            (ou en période de backoff après un échec)
+        """
+        with self._lock:
+            taille = self._capturer()
+            if taille is None:
+                return None
+            jpeg = bytes(self._tampon[:taille])
+            self._ecrire_debug(jpeg, fichier_debug, periode_debug)
+            return jpeg
+
+    def capturer_frame(self, fichier_debug=None, periode_debug=0):
+        """
+        Récupérer et décoder une image directement depuis la mémoire
+
+        Args:
+            fichier_debug: chemin d'une copie JPEG sur disque (optionnel)
+            periode_debug: écrire la copie une capture sur N (0 = jamais)
+
+        Returns:
+            image BGR (numpy), ou None
+        """
+        with self._lock:
+            taille = self._capturer()
+            if taille is None:
+                return None
+
+            jpeg = memoryview(self._tampon)[:taille]
+            img = decoder_jpeg(jpeg)
+            if img is None:
+                self.nb_erreurs += 1
+                self.derniere_erreur = "JPEG invalide"
+                return None
+
+            self._ecrire_debug(jpeg, fichier_debug, periode_debug)
+            return img
+
+    def stats(self):
+        return {
+            'url': self.url,
+            'captures': self.nb_captures,
+            'erreurs': self.nb_erreurs,
+            'connexions': self.nb_connexions,
+            'latence_ms': self.derniere_latence_ms,
+            'latence_moyenne_ms': self.latence_moyenne_ms,
+            'derniere_erreur': self.derniere_erreur
+        }
+
+    def fermer(self):
+        with self._lock:
+            self._fermer()
+
+# ═══════════════════════════════════════════════════════════════
+# POOL (UN CLIENT PAR CAMÉRA)
+# ═══════════════════════════════════════════════════════════════
+
+_cameras = {}
+_cameras_lock = threading.Lock()
+
+def obtenir_camera(ip, port=81):
+    """Retourner le client partagé pour la caméra ip:port"""
+    with _cameras_lock:
+        camera = _cameras.get((ip, port))
+        if camera is None:
+            camera = CameraClient(ip, port)
+            _cameras[(ip, port)] = camera
+        return camera
+
+def fermer_cameras():
+    with _cameras_lock:
+        for camera in _cameras.values():
+            camera.fermer()
+        _cameras.clear()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+DÉTECTEURS D'OCCUPATION INTERCHANGEABLES
+Interface commune : lot de zones → occupée + score par place
+Registre par nom, un détecteur partagé par caméra
+═══════════════════════════════════════════════════════════════
+"""
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from detection_zones import CacheReference, MoteurDifference
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+MIN_CONTOUR_AREA = 800       # pixels² : contours comptés (diff_contours, contours)
+CANNY_BAS = 50               # seuils Canny (détecteur de bords)
+CANNY_HAUT = 150
+BINS_HISTOGRAMME = 32        # classes par histogramme de zone
+ECARTS_HISTOGRAMME = 4       # histogramme des gris centrés-réduits sur ±4 écarts-types
+MODELE_DEFAUT = "modele_places.onnx"
+TAILLE_MODELE = (64, 64)     # entrée du classifieur (largeur, hauteur)
+
+# ═══════════════════════════════════════════════════════════════
+# INTERFACE
+# ═══════════════════════════════════════════════════════════════
+
+class Detecteur:
+    """
+    Interface commune des détecteurs d'occupation
+
+    analyser(img, reference, zones, seuil=None) traite toutes les
+    places d'une image BGR en un appel et retourne
+        {nom_place: {'occupe': bool, 'pourcentage_diff': score, 'methode': str, ...}}
+    Le score (0-100) garde le nom 'pourcentage_diff' : filtre
+    d'occupation, annotations et tableaux de bord le lisent déjà.
+    Chaque détecteur a sa propre échelle de score et son seuil_defaut
+    (contours : 20 % d'origine ; histogramme : calibré sur la scène
+    synthétique de bench_detecteurs.py), à vérifier sur des images
+    enregistrées du parking.
+
+    Attributs:
+        methode: libellé repris dans chaque résultat
+        besoin_reference: sans référence, toutes les places sont libres
+        seuil_defaut: seuil de score si analyser() n'en reçoit pas
+    """
+
+    nom = None
+    methode = None
+    besoin_reference = True
+    seuil_defaut = 25.0
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else CacheReference()
+
+    def seuil(self, seuil=None):
+        return self.seuil_defaut if seuil is None else seuil
+
+    def resultat_vide(self, zones):
+        return {nom: {'occupe': False, 'pourcentage_diff': 0.0} for nom in zones}
+
+    def analyser(self, img, reference, zones, seuil=None):
+        resultats = self.evaluer(img, reference, zones, self.seuil(seuil))
+        for resultat in resultats.values():
+            resultat['methode'] = self.methode
+        return resultats
+
+    def evaluer(self, img, reference, zones, seuil):
+        """Résultats par place, sans 'methode' (à implémenter)"""
+        raise NotImplementedError
+
+# ═══════════════════════════════════════════════════════════════
+# IMPLÉMENTATIONS
+# ═══════════════════════════════════════════════════════════════
+
+class DetecteurDifference(Detecteur):
+    """Différence avec la référence, une passe plein cadre (délègue à MoteurDifference)"""
+
+    methode = "Différence avec référence"
+
+    def __init__(self, ouverture=False, min_contour_area=None, seuil_diff=30, cache=None):
+        super().__init__(cache)
+        self.moteur = MoteurDifference(ouverture, min_contour_area, seuil_diff, cache=self.cache)
+
+    def evaluer(self, img, reference, zones, seuil):
+        return self.moteur.analyser(img, reference, zones, seuil)
+
+class DetecteurContours(Detecteur):
+    """
+    Aire des contours Canny de chaque place (repli sans référence)
+
+    Score = aire des contours de plus de min_contour_area px², en % de
+    la zone. Fonctionne sans référence (parking vide jamais capturé) :
+    marquages et taches au sol forment rarement des contours fermés
+    aussi grands qu'une voiture.
+    """
+
+    methode = "Détection contours (sans référence)"
+    besoin_reference = False
+    seuil_defaut = 20.0          # aire > 20 % de la zone, comme le repli d'origine
+
+    def __init__(self, min_contour_area=MIN_CONTOUR_AREA, cache=None):
+        super().__init__(cache)
+        self.min_contour_area = min_contour_area
+
+    def evaluer(self, img, reference, zones, seuil):
+        resultats = {}
+        for nom, (x, y, w, h) in zones.items():
+            zone = img[max(y, 0):y+h, max(x, 0):x+w]
+            if zone.size == 0:
+                resultats[nom] = {'occupe': False, 'pourcentage_diff': 0.0, 'contours': 0, 'aire': 0}
+                continue
+
+            gris = cv2.GaussianBlur(cv2.cvtColor(zone, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+            contours, _ = cv2.findContours(cv2.Canny(gris, CANNY_BAS, CANNY_HAUT),
+                                           cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            aires = [a for a in map(cv2.contourArea, contours) if a > self.min_contour_area]
+            pourcentage = sum(aires) / (w * h) * 100
+            resultats[nom] = {
+                'occupe': pourcentage > seuil,
+                'pourcentage_diff': pourcentage,
+                'contours': len(aires),
+                'aire': int(sum(aires))
+            }
+        return resultats
+
+class DetecteurHistogramme(Detecteur):
+    """
+    Distance de Bhattacharyya entre histogrammes de zone (zone / référence)
+
+    Les gris sont centrés-réduits avant l'histogramme : un changement
+    de lumière uniforme (crépuscule, nuage) ne déplace pas la
+    distribution, seule sa forme compte. Insensible aussi à un petit
+    décalage de la caméra ou à une ombre fine.
+    """
+
+    methode = "Histogramme (Bhattacharyya)"
+    seuil_defaut = 37.0
+
+    def __init__(self, bins=BINS_HISTOGRAMME, cache=None):
+        super().__init__(cache)
+        self.bins = bins
+        self._source_ref = None
+        self._histos_ref = {}
+
+    def histogramme(self, gris):
+        gris = gris.astype(np.float32)
+        reduits = (gris - gris.mean()) / max(float(gris.std()), 1.0)
+        return cv2.calcHist([reduits], [0], None, [self.bins], [-ECARTS_HISTOGRAMME, ECARTS_HISTOGRAMME])
+
+    def evaluer(self, img, reference, zones, seuil):
+        zones_ref = self.cache.obtenir(reference, zones)
+        if not zones_ref:
+            return self.resultat_vide(zones)
+        if zones_ref is not self._source_ref:
+            self._histos_ref = {nom: self.histogramme(z) for nom, z in zones_ref.items()}
+            self._source_ref = zones_ref
+
+        gris = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        resultats = {}
+        for nom, (x, y, w, h) in zones.items():
+            zone = gris[y:y+h, x:x+w]
+            if zone.size == 0 or zone.shape != zones_ref[nom].shape:
+                resultats[nom] = {'occupe': False, 'pourcentage_diff': 0.0}
+                continue
+            distance = cv2.compareHist(self._histos_ref[nom], self.histogramme(zone),
+                                       cv2.HISTCMP_BHATTACHARYYA)
+            resultats[nom] = {'occupe': distance * 100 > seuil, 'pourcentage_diff': distance * 100}
+        return resultats
+
+class DetecteurModele(Detecteur):
+    """
+    Classifieur libre/occupée (ONNX via cv2.dnn), toutes les places en un lot
+
+    Le modèle reçoit les vignettes RGB redimensionnées à taille, valeurs
+    0-1, et sort (N, 2) logits [libre, occupée] ou (N, 1) probabilité
+    d'occupation. Score = probabilité × 100.
+    """
+
+    methode = "Classifieur ONNX"
+    besoin_reference = False
+    seuil_defaut = 50.0
+
+    def __init__(self, chemin=MODELE_DEFAUT, taille=TAILLE_MODELE, cache=None):
+        super().__init__(cache)
+        if not os.path.exists(chemin):
+            raise FileNotFoundError(f"Modèle introuvable: {chemin}")
+        self.reseau = cv2.dnn.readNet(chemin)
+        self.taille = tuple(taille)
+        self._lock = threading.Lock()  # un cv2.dnn.Net n'est pas réentrant
+
+    def evaluer(self, img, reference, zones, seuil):
+        # Zone hors de l'image (vignette vide) : libre, score 0, exclue du blob
+        resultats = self.resultat_vide(zones)
+        vignettes = {nom: img[max(y, 0):y+h, max(x, 0):x+w] for nom, (x, y, w, h) in zones.items()}
+        noms = sorted(nom for nom, vignette in vignettes.items() if vignette.size)
+        if not noms:
+            return resultats
+
+        blob = cv2.dnn.blobFromImages([vignettes[nom] for nom in noms], 1 / 255.0, self.taille, swapRB=True)
+        with self._lock:
+            self.reseau.setInput(blob)
+            sortie = self.reseau.forward().reshape(len(noms), -1).astype(np.float64)
+
+        if sortie.shape[1] >= 2:
+            exp = np.exp(sortie - sortie.max(axis=1, keepdims=True))
+            probabilites = exp[:, 1] / exp.sum(axis=1)
+        else:
+            probabilites = np.clip(sortie[:, 0], 0.0, 1.0)
+
+        for i, nom in enumerate(noms):
+            resultats[nom] = {'occupe': bool(probabilites[i] * 100 > seuil),
+                              'pourcentage_diff': float(probabilites[i] * 100)}
+        return resultats
+
+# ═══════════════════════════════════════════════════════════════
+# REGISTRE
+# ═══════════════════════════════════════════════════════════════
+
+_types = {}
+
+def enregistrer(nom, classe, **options):
+    """Rendre un détecteur disponible sous ce nom (options par défaut du constructeur)"""
+    _types[nom] = (classe, options)
+
+enregistrer("diff", DetecteurDifference)
+enregistrer("diff_contours", DetecteurDifference, ouverture=True, min_contour_area=MIN_CONTOUR_AREA)
+enregistrer("contours", DetecteurContours)
+enregistrer("histogramme", DetecteurHistogramme)
+enregistrer("modele", DetecteurModele)
+
+def noms_detecteurs():
+    return sorted(_types)
+
+def creer_detecteur(nom, **options):
+    """Nouveau détecteur (options passées au constructeur, en plus des défauts)"""
+    if nom not in _types:
+        raise ValueError(f"Détecteur inconnu: {nom} (disponibles: {', '.join(noms_detecteurs())})")
+    classe, defauts = _types[nom]
+    detecteur = classe(**dict(defauts, **options))
+    detecteur.nom = nom
+    return detecteur
+
+# ═══════════════════════════════════════════════════════════════
+# POOL (UN DÉTECTEUR PAR CAMÉRA)
+# ═══════════════════════════════════════════════════════════════
+
+_detecteurs = {}
+_detecteurs_lock = threading.Lock()
+
+def obtenir_detecteur(ip, port=81, nom="diff", **options):
+    """Retourner le détecteur partagé pour la caméra ip:port (recréé si nom change)"""
+    with _detecteurs_lock:
+        detecteur = _detecteurs.get((ip, port))
+        if detecteur is None or detecteur.nom != nom:
+            detecteur = creer_detecteur(nom, **options)
+            _detecteurs[(ip, port)] = detecteur
+        return detecteur
@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+DÉTECTION PARKING - OUTILS PARTAGÉS
+Cache des zones de référence en niveaux de gris
+Moteur de différence plein cadre (une passe pour toutes les places)
+Détecteur de changement global (saut des images identiques)
+Filtre d'occupation par place (hystérésis + confirmation N sur M)
+Fond adaptatif (référence qui suit la lumière, sauvegardée en .npy)
+═══════════════════════════════════════════════════════════════
+"""
+
+import cv2
+import math
+import numpy as np
+import os
+import threading
+import time
+
+# Noyau morphologique commun (créé une seule fois)
+KERNEL_MORPHO = np.ones((5, 5), np.uint8)
+
+# ═══════════════════════════════════════════════════════════════
+# CACHE RÉFÉRENCE
+# ═══════════════════════════════════════════════════════════════
+
+def signature_zones(zones):
+    """Clé identifiant un jeu de zones (change si une zone bouge)"""
+    return tuple((nom, tuple(zones[nom])) for nom in sorted(zones))
+
+class CacheReference:
+    """
+    Zones de l'image de référence pré-converties en niveaux de gris
+
+    La référence (parking vide) ne change que lors d'une recapture
+    ('r') ou d'un rechargement des zones : on convertit l'image
+    entière une fois puis on découpe chaque zone dans un tableau
+    uint8 contigu. Le cache se reconstruit automatiquement si l'objet
+    image ou les coordonnées des zones changent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._image = None
+        self._gris = None
+        self._signature = None
+        self._zones_gris = {}
+
+    def invalider(self):
+        with self._lock:
+            self._image = None
+            self._gris = None
+            self._signature = None
+            self._zones_gris = {}
+
+    def _convertir(self, image_reference):
+        """Conversion de l'image complète (appelé avec self._lock)"""
+        if image_reference is not self._image:
+            if image_reference.ndim == 3:
+                self._gris = cv2.cvtColor(image_reference, cv2.COLOR_BGR2GRAY)
+            else:
+                self._gris = np.ascontiguousarray(image_reference, dtype=np.uint8)
+            self._image = image_reference
+            self._signature = None
+        return self._gris
+
+    def gris(self, image_reference):
+        """Référence complète en niveaux de gris (None sans référence)"""
+        if image_reference is None:
+            return None
+        with self._lock:
+            return self._convertir(image_reference)
+
+    def obtenir(self, image_reference, zones):
+        """
+        Returns:
+            dict {nom_place: zone de référence grise}, vide sans référence
+        """
+        if image_reference is None:
+            return {}
+
+        signature = signature_zones(zones)
+
+        with self._lock:
+            if image_reference is self._image and signature == self._signature:
+                return self._zones_gris
+
+            gris = self._convertir(image_reference)
+
+            zones_gris = {}
+            for nom, (x, y, w, h) in zones.items():
+                zones_gris[nom] = np.ascontiguousarray(gris[y:y+h, x:x+w], dtype=np.uint8)
+
+            self._signature = signature
+            self._zones_gris = zones_gris
+            return zones_gris
+
+# ═══════════════════════════════════════════════════════════════
+# MOTEUR DIFFÉRENCE PLEIN CADRE
+# ═══════════════════════════════════════════════════════════════
+
+class GeometrieZones:
+    """Coordonnées des zones sous forme de tableaux, relatives au cadre englobant"""
+
+    def __init__(self, zones, hauteur, largeur):
+        self.noms = sorted(zones)
+        coords = np.array([zones[nom] for nom in self.noms], dtype=np.int64).reshape(-1, 4)
+
+        x, y, w, h = coords.T
+        self.surfaces = np.maximum(w * h, 1).astype(np.float64)
+
+        # Zones coupées aux bords de l'image (comme un slicing numpy)
+        x1 = np.clip(x, 0, largeur)
+        y1 = np.clip(y, 0, hauteur)
+        x2 = np.clip(x + w, 0, largeur)
+        y2 = np.clip(y + h, 0, hauteur)
+
+        # Cadre englobant toutes les zones : seule partie traitée
+        if len(self.noms):
+            self.roi = (int(x1.min()), int(y1.min()), int(x2.max()), int(y2.max()))
+        else:
+            self.roi = (0, 0, 0, 0)
+        rx, ry = self.roi[0], self.roi[1]
+
+        self.x1, self.x2 = x1 - rx, x2 - rx
+        self.y1, self.y2 = y1 - ry, y2 - ry
+
+        # Masque étiqueté : 0 = hors zone, i+1 = zone i
+        self.etiquettes = np.zeros((self.roi[3] - ry, self.roi[2] - rx), dtype=np.int32)
+        for i in range(len(self.noms)):
+            self.etiquettes[self.y1[i]:self.y2[i], self.x1[i]:self.x2[i]] = i + 1
+        self.masque_zones = (self.etiquettes > 0).astype(np.uint8)
+
+    def sommes(self, masque_binaire):
+        """Nombre de pixels non nuls par zone, via image intégrale"""
+        ii = cv2.integral(masque_binaire, sdepth=cv2.CV_32S)
+        return (ii[self.y2, self.x2] - ii[self.y1, self.x2]
+                - ii[self.y2, self.x1] + ii[self.y1, self.x1])
+
+class MoteurDifference:
+    """
+    Analyse toutes les places en une seule passe
+
+    L'image est convertie en gris une fois, comparée une fois à la
+    référence (sur le cadre englobant des zones), binarisée et nettoyée
+    une fois ; le pourcentage de chaque place est ensuite lu dans une
+    image intégrale. Le coût ne dépend presque plus du nombre de places.
+
+    Args:
+        ouverture: appliquer MORPH_OPEN après MORPH_CLOSE
+        min_contour_area: si défini, compte aussi les contours par place
+            (un seul findContours, chaque contour attribué à sa zone)
+        seuil_diff: seuil de binarisation de la différence (0-255)
+    """
+
+    def __init__(self, ouverture=False, min_contour_area=None, seuil_diff=30, cache=None):
+        self.ouverture = ouverture
+        self.min_contour_area = min_contour_area
+        self.seuil_diff = seuil_diff
+        self.cache = cache if cache is not None else CacheReference()
+
+        self._geometrie = None
+        self._cle_geometrie = None
+
+    def geometrie(self, zones, forme):
+        cle = (signature_zones(zones), forme[:2])
+        if cle != self._cle_geometrie:
+            self._geometrie = GeometrieZones(zones, forme[0], forme[1])
+            self._cle_geometrie = cle
+        return self._geometrie
+
+    def _resultat_vide(self):
+        resultat = {'occupe': False, 'pourcentage_diff': 0.0}
+        if self.min_contour_area is not None:
+            resultat.update({'contours': 0, 'aire': 0})
+        return resultat
+
+    def masque(self, img, ref_gris, geo):
+        """Masque binaire (0/1) des différences sur le cadre englobant"""
+        rx1, ry1, rx2, ry2 = geo.roi
+        gris = cv2.cvtColor(img[ry1:ry2, rx1:rx2], cv2.COLOR_BGR2GRAY)
+        diff = cv2.absdiff(ref_gris[ry1:ry2, rx1:rx2], gris)
+        _, masque = cv2.threshold(diff, self.seuil_diff, 1, cv2.THRESH_BINARY)
+
+        masque = cv2.morphologyEx(masque, cv2.MORPH_CLOSE, KERNEL_MORPHO)
+        if self.ouverture:
+            masque = cv2.morphologyEx(masque, cv2.MORPH_OPEN, KERNEL_MORPHO)
+        return masque
+
+    def analyser(self, img, image_reference, zones, seuil_occupation):
+        """
+        Returns:
+            dict {nom_place: {'occupe', 'pourcentage_diff'[, 'contours', 'aire']}}
+        """
+        ref_gris = self.cache.gris(image_reference)
+        if ref_gris is None or ref_gris.shape[:2] != img.shape[:2]:
+            return {nom: self._resultat_vide() for nom in zones}
+
+        geo = self.geometrie(zones, img.shape)
+        if not geo.noms:
+            return {}
+
+        masque = self.masque(img, ref_gris, geo)
+        return mesurer_zones(masque, geo, seuil_occupation, self.min_contour_area)
+
+def mesurer_zones(masque, geo, seuil_occupation, min_contour_area=None):
+    """
+    Pourcentage de pixels actifs par zone (+ contours) d'un masque 0/1 sur geo.roi
+
+    Returns:
+        dict {nom_place: {'occupe', 'pourcentage_diff'[, 'contours', 'aire']}}
+    """
+    pourcentages = geo.sommes(masque) / geo.surfaces * 100
+    occupes = pourcentages > seuil_occupation
+
+    resultats = {}
+    for i, nom in enumerate(geo.noms):
+        resultats[nom] = {
+            'occupe': bool(occupes[i]),
+            'pourcentage_diff': float(pourcentages[i])
+        }
+
+    if min_contour_area is not None:
+        nb_contours = np.zeros(len(geo.noms), dtype=np.int64)
+        aires = np.zeros(len(geo.noms), dtype=np.float64)
+
+        masque_zones = masque * geo.masque_zones
+        contours, _ = cv2.findContours(masque_zones, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for c in contours:
+            aire = cv2.contourArea(c)
+            if aire <= min_contour_area:
+                continue
+            bx, by, bw, bh = cv2.boundingRect(c)
+            etiquette = geo.etiquettes[by + bh // 2, bx + bw // 2]
+            if etiquette:
+                nb_contours[etiquette - 1] += 1
+                aires[etiquette - 1] += aire
+
+        for i, nom in enumerate(geo.noms):
+            resultats[nom]['contours'] = int(nb_contours[i])
+            resultats[nom]['aire'] = int(aires[i])
+
+    return resultats
+
+# ═══════════════════════════════════════════════════════════════
+# DÉTECTEUR DE CHANGEMENT GLOBAL
+# ═══════════════════════════════════════════════════════════════
+
+class DetecteurChangement:
+    """
+    Dit si la scène a changé depuis la dernière image analysée
+
+    L'image est réduite en une vignette grise (INTER_AREA, quelques
+    dizaines de µs) puis comparée par écart absolu moyen à la vignette
+    de la dernière image traitée. La comparaison se fait toujours
+    contre la dernière image traitée (pas la précédente) : une dérive
+    lente de la lumière finit donc par dépasser le seuil.
+
+    Args:
+        seuil: écart absolu moyen (0-255) au-delà duquel on analyse
+        taille: (largeur, hauteur) de la vignette
+        age_max: secondes max sans analyse complète (None = jamais forcé)
+    """
+
+    def __init__(self, seuil=2.0, taille=(64, 48), age_max=60.0):
+        self.seuil = seuil
+        self.taille = taille
+        self.age_max = age_max
+
+        self._lock = threading.Lock()
+        self._vignette = None
+        self._derniere_analyse = 0.0
+
+        # Statistiques
+        self.nb_traitees = 0
+        self.nb_sautees = 0
+        self.dernier_ecart = None
+
+    def vignette(self, img):
+        petite = cv2.resize(img, self.taille, interpolation=cv2.INTER_AREA)
+        if petite.ndim == 3:
+            petite = cv2.cvtColor(petite, cv2.COLOR_BGR2GRAY)
+        return petite
+
+    def a_change(self, img):
+        """
+        Returns:
+            True si l'image doit être analysée (et devient la nouvelle base)
+        """
+        vignette = self.vignette(img)
+        maintenant = time.monotonic()
+
+        with self._lock:
+            if self._vignette is not None and self._vignette.shape == vignette.shape:
+                self.dernier_ecart = float(cv2.absdiff(vignette, self._vignette).mean())
+                trop_vieille = self.age_max is not None and maintenant - self._derniere_analyse > self.age_max
+                if self.dernier_ecart < self.seuil and not trop_vieille:
+                    self.nb_sautees += 1
+                    return False
+
+            self._vignette = vignette
+            self._derniere_analyse = maintenant
+            self.nb_traitees += 1
+            return True
+
+    def invalider(self):
+        """Forcer l'analyse de la prochaine image (référence ou zones modifiées)"""
+        with self._lock:
+            self._vignette = None
+
+    def stats(self):
+        with self._lock:
+            total = self.nb_traitees + self.nb_sautees
+            return {
+                'traitees': self.nb_traitees,
+                'sautees': self.nb_sautees,
+                'taux_saut': round(self.nb_sautees / total, 3) if total else 0.0,
+                'dernier_ecart': self.dernier_ecart,
+                'seuil': self.seuil
+            }
+
+# ═══════════════════════════════════════════════════════════════
+# FILTRE D'OCCUPATION (HYSTÉRÉSIS + CONFIRMATION N SUR M)
+# ═══════════════════════════════════════════════════════════════
+
+class FiltreOccupation:
+    """
+    État occupé/libre confirmé de chaque place, à partir des pourcentages bruts
+
+    Une place libre ne passe occupée que si au moins n des m dernières
+    images dépassent seuil_entree ; une place occupée ne se libère que
+    si n des m dernières images sont sous seuil_sortie. Entre les deux
+    seuils une image ne vote pour rien. Un piéton ou une ombre sur une
+    seule image ne fait donc plus basculer la place.
+
+    Les votes sont deux tableaux (places × m) remplis en anneau : une
+    mise à jour est quelques opérations NumPy, quel que soit le nombre
+    de places. À la première image (ou si les places changent), l'état
+    est pris directement de l'image, sans attendre de confirmation.
+
+    Args:
+        seuil_entree: % au-dessus duquel une image vote "occupée"
+        seuil_sortie: % en dessous duquel une image vote "libre"
+        n, m: votes requis parmi les m dernières images
+    """
+
+    def __init__(self, seuil_entree=30.0, seuil_sortie=20.0, n=3, m=5):
+        self.seuil_entree = seuil_entree
+        self.seuil_sortie = seuil_sortie
+        self.n = n
+        self.m = m
+
+        self._lock = threading.Lock()
+        self._noms = None
+        self._etats = None
+        self._votes_occupe = None
+        self._votes_libre = None
+        self._colonne = 0
+        self._brut = None
+
+        # Statistiques
+        self.nb_images = 0
+        self.nb_transitions = 0
+        self.nb_bascules_brutes = 0
+
+    @classmethod
+    def autour(cls, seuil, marge, n=3, m=5):
+        """Filtre centré sur le seuil d'un détecteur (marge : fraction du seuil)"""
+        filtre = cls(n=n, m=m)
+        filtre.centrer(seuil, marge)
+        return filtre
+
+    def centrer(self, seuil, marge):
+        """Occupée au-dessus de seuil × (1 + marge), libre sous seuil × (1 - marge)"""
+        with self._lock:
+            self.seuil_entree = seuil * (1 + marge)
+            self.seuil_sortie = seuil * (1 - marge)
+
+    def _initialiser(self, noms, pourcentages):
+        self._noms = noms
+        self._etats = pourcentages > self.seuil_entree
+        self._brut = self._etats.copy()
+        self._votes_occupe = np.zeros((len(noms), self.m), dtype=bool)
+        self._votes_libre = np.zeros((len(noms), self.m), dtype=bool)
+        self._colonne = 0
+
+    def mettre_a_jour(self, noms, pourcentages):
+        """
+        Args:
+            noms: tuple des places (ordre fixe d'une image à l'autre)
+            pourcentages: np.ndarray des % de différence, même ordre
+
+        Returns:
+            np.ndarray bool des états confirmés (copie)
+        """
+        pourcentages = np.asarray(pourcentages, dtype=np.float64)
+        with self._lock:
+            self.nb_images += 1
+            if noms != self._noms:
+                self._initialiser(noms, pourcentages)
+                return self._etats.copy()
+
+            self._votes_occupe[:, self._colonne] = pourcentages > self.seuil_entree
+            self._votes_libre[:, self._colonne] = pourcentages < self.seuil_sortie
+            self._colonne = (self._colonne + 1) % self.m
+
+            entrees = ~self._etats & (self._votes_occupe.sum(axis=1) >= self.n)
+            sorties = self._etats & (self._votes_libre.sum(axis=1) >= self.n)
+            bascules = entrees | sorties
+            if bascules.any():
+                self._etats ^= bascules
+                # Repartir de zéro : n nouvelles images pour rebasculer
+                self._votes_occupe[bascules] = False
+                self._votes_libre[bascules] = False
+                self.nb_transitions += int(bascules.sum())
+
+            # Ce qu'aurait publié un seuil unique (milieu), pour les statistiques
+            brut = pourcentages > (self.seuil_entree + self.seuil_sortie) / 2
+            self.nb_bascules_brutes += int((brut != self._brut).sum())
+            self._brut = brut
+
+            return self._etats.copy()
+
+    def filtrer(self, analyses):
+        """
+        Args:
+            analyses: {nom_place: {'pourcentage_diff', ...}}
+
+        Returns:
+            {nom_place: occupé confirmé (bool)}
+        """
+        noms = tuple(sorted(analyses))
+        etats = self.mettre_a_jour(noms, [analyses[nom]['pourcentage_diff'] for nom in noms])
+        return {nom: bool(etats[i]) for i, nom in enumerate(noms)}
+
+    def en_attente(self):
+        """
+        True si la majorité des votes d'une place contredit son état
+        confirmé (confirmation en cours) ; un vote isolé déjà contredit
+        par les images suivantes ne compte plus
+        """
+        with self._lock:
+            if self._etats is None:
+                return False
+            contraires = np.where(self._etats[:, None], self._votes_libre, self._votes_occupe).sum(axis=1)
+            accords = np.where(self._etats[:, None], self._votes_occupe, self._votes_libre).sum(axis=1)
+            return bool((contraires > accords).any())
+
+    def invalider(self):
+        """Référence ou zones modifiées : reprendre l'état de la prochaine image"""
+        with self._lock:
+            self._noms = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'images': self.nb_images,
+                'transitions': self.nb_transitions,
+                'bascules_brutes': self.nb_bascules_brutes,
+                'seuil_entree': self.seuil_entree,
+                'seuil_sortie': self.seuil_sortie,
+                'confirmation': f"{self.n}/{self.m}"
+            }
+
+# ═══════════════════════════════════════════════════════════════
+# FOND ADAPTATIF
+# ═══════════════════════════════════════════════════════════════
+
+class FondAdaptatif:
+    """
+    Image de référence (parking vide) qui suit la lumière du jour
+
+    Moyenne mobile exponentielle par pixel, en niveaux de gris, mise à
+    jour uniquement sur les places libres : une voiture garée ne se
+    fond jamais dans le fond. Les places occupées suivent la variation
+    moyenne de luminosité des places libres, pour ne pas rester
+    "occupées" à la tombée de la nuit une fois la voiture partie.
+
+    Le poids d'une image dépend du temps écoulé, pas du nombre
+    d'analyses : une rafale ne fait pas dériver le fond plus vite.
+    reference() retourne un nouvel objet à chaque mise à jour (les
+    caches de référence se reconstruisent d'eux-mêmes).
+
+    Args:
+        chemin: fichier .npy de sauvegarde (uint8, ~500 Ko en 800x600)
+        constante_temps: secondes pour suivre ~63 % d'un changement de lumière
+    """
+
+    def __init__(self, chemin="fond_parking.npy", constante_temps=600.0):
+        self.chemin = chemin
+        self.constante_temps = constante_temps
+
+        self._lock = threading.Lock()
+        self._fond = None            # float32, moyenne mobile
+        self._reference = None       # uint8, image servie aux moteurs de détection
+        self._derniere_maj = None
+        self._modifie = False
+        self._arret = threading.Event()
+
+        # Statistiques
+        self.origine = None
+        self.nb_mises_a_jour = 0
+        self.nb_sauvegardes = 0
+
+    @staticmethod
+    def _gris(img):
+        if img.ndim == 3:
+            return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return np.ascontiguousarray(img, dtype=np.uint8)
+
+    def initialiser(self, img, origine='image'):
+        """Repartir d'une image du parking vide (commande 'r', reference_vide.jpg)"""
+        gris = self._gris(img)
+        with self._lock:
+            self._fond = gris.astype(np.float32)
+            self._reference = gris
+            self._derniere_maj = time.monotonic()
+            self._modifie = origine != 'npy'
+            self.origine = origine
+
+    def charger(self, image_secours=None):
+        """
+        Reprendre le fond sauvegardé, sinon partir de image_secours
+
+        Une image de secours plus récente que le .npy (référence
+        recapturée) est prioritaire.
+
+        Returns:
+            'npy', 'image' ou None si aucune référence
+        """
+        secours = image_secours if image_secours and os.path.exists(image_secours) else None
+        if os.path.exists(self.chemin) and (
+                secours is None or os.path.getmtime(self.chemin) >= os.path.getmtime(secours)):
+            try:
+                fond = np.load(self.chemin)
+                if fond.ndim == 2:
+                    self.initialiser(fond, 'npy')
+                    return 'npy'
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Fond {self.chemin} illisible: {e}")
+
+        if secours is not None:
+            img = cv2.imread(secours)
+            if img is not None:
+                self.initialiser(img, 'image')
+                return 'image'
+        return None
+
+    def reference(self):
+        """Fond courant en niveaux de gris (None sans référence)"""
+        with self._lock:
+            return self._reference
+
+    def mettre_a_jour(self, img, zones, libres):
+        """
+        Fondre l'image analysée dans le fond
+
+        Args:
+            zones: {nom_place: [x, y, w, h]}
+            libres: places libres (état confirmé ET avis de cette image)
+        """
+        with self._lock:
+            if self._fond is None:
+                return
+            gris = self._gris(img)
+            if gris.shape != self._fond.shape:
+                return
+
+            maintenant = time.monotonic()
+            alpha = 1.0 - math.exp(-(maintenant - self._derniere_maj) / self.constante_temps)
+            if not libres or alpha <= 0:
+                return
+            self._derniere_maj = maintenant
+
+            # Places libres : moyenne mobile, en mesurant la dérive de luminosité
+            derive, surface = 0.0, 0
+            for nom in libres:
+                x, y, w, h = zones[nom]
+                fond = self._fond[max(y, 0):y+h, max(x, 0):x+w]
+                ecart = gris[max(y, 0):y+h, max(x, 0):x+w] - fond
+                ecart *= alpha
+                fond += ecart
+                derive += float(ecart.sum())
+                surface += ecart.size
+
+            # Places occupées : même dérive moyenne (la voiture reste hors du fond)
+            if surface:
+                derive /= surface
+                for nom in zones:
+                    if nom not in libres:
+                        x, y, w, h = zones[nom]
+                        fond = self._fond[max(y, 0):y+h, max(x, 0):x+w]
+                        fond += derive
+                        np.clip(fond, 0, 255, out=fond)
+
+            self._reference = cv2.convertScaleAbs(self._fond)
+            self._modifie = True
+            self.nb_mises_a_jour += 1
+
+    def sauvegarder(self):
+        """Écrire le fond s'il a changé (écriture atomique) → True si écrit"""
+        with self._lock:
+            if not self._modifie or self._reference is None:
+                return False
+            reference = self._reference
+            self._modifie = False
+
+        temporaire = self.chemin + ".tmp"
+        try:
+            with open(temporaire, 'wb') as f:
+                np.save(f, reference)
+            os.replace(temporaire, self.chemin)
+        except OSError as e:
+            print(f"⚠️  Sauvegarde fond: {e}")
+            with self._lock:
+                self._modifie = True
+            return False
+        self.nb_sauvegardes += 1
+        return True
+
+    def demarrer(self, intervalle=300):
+        """Sauvegarde périodique en arrière-plan"""
+        def boucle():
+            while not self._arret.wait(intervalle):
+                self.sauvegarder()
+
+        self._arret.clear()
+        thread = threading.Thread(target=boucle, daemon=True)
+        thread.start()
+        return thread
+
+    def arreter(self):
+        self._arret.set()
+        self.sauvegarder()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'origine': self.origine,
+                'mises_a_jour': self.nb_mises_a_jour,
+                'sauvegardes': self.nb_sauvegardes,
+                'constante_temps': self.constante_temps,
+                'a_sauvegarder': self._modifie
+            }
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+DISPATCH MQTT ASYNCHRONE
+Les messages sont traités par un pool de threads, hors de la
+boucle réseau paho (keepalive jamais bloqué par Supabase)
+Limite de traitements simultanés par topic
+═══════════════════════════════════════════════════════════════
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Copie du message : paho peut réutiliser l'objet après le callback
+MessageMQTT = collections.namedtuple('MessageMQTT', ['topic', 'payload', 'qos', 'retain'])
+
+# ═══════════════════════════════════════════════════════════════
+# ROUTE
+# ═══════════════════════════════════════════════════════════════
+
+class Route:
+    """Handler d'un topic + file des messages en attente d'un créneau"""
+
+    def __init__(self, topic, handler, limite):
+        self.topic = topic
+        self.handler = handler
+        self.limite = limite
+        self.en_cours = 0
+        self.attente = collections.deque()
+
+        # Statistiques
+        self.nb_traites = 0
+        self.nb_erreurs = 0
+        self.moyenne_ms = None
+        self.max_ms = 0.0
+        self.max_attente_ms = 0.0
+
+    def stats(self):
+        return {
+            'limite': self.limite,
+            'en_cours': self.en_cours,
+            'en_attente': len(self.attente),
+            'traites': self.nb_traites,
+            'erreurs': self.nb_erreurs,
+            'moyenne_ms': self.moyenne_ms,
+            'max_ms': self.max_ms,
+            'max_attente_ms': self.max_attente_ms
+        }
+
+# ═══════════════════════════════════════════════════════════════
+# DISPATCHEUR
+# ═══════════════════════════════════════════════════════════════
+
+class DispatcheurMQTT:
+    """
+    Table de routage topic → handler exécutée dans un pool de threads
+
+    soumettre() est appelé depuis on_message et retourne immédiatement.
+    Chaque topic a sa limite de traitements simultanés : au-delà, les
+    messages attendent dans l'ordre d'arrivée (limite=1 garde l'ordre
+    strict du topic). Les handlers publient eux-mêmes leur réponse
+    (client.publish est thread-safe).
+
+    Exemple:
+        dispatcheur = DispatcheurMQTT(nb_workers=8)
+        dispatcheur.enregistrer(TOPIC_RFID, traiter_rfid, limite=4)
+        mqtt_client.on_message = dispatcheur.on_message
+    """
+
+    def __init__(self, nb_workers=8):
+        self._pool = ThreadPoolExecutor(max_workers=nb_workers, thread_name_prefix='mqtt')
+        self._lock = threading.Lock()
+        self._routes = {}
+        self.nb_ignores = 0
+
+    def enregistrer(self, topic, handler, limite=1):
+        """handler(client, message) avec message = MessageMQTT"""
+        with self._lock:
+            self._routes[topic] = Route(topic, handler, limite)
+        return self
+
+    def on_message(self, client, userdata, msg):
+        """Callback paho : ne fait que mettre le message en file"""
+        self.soumettre(client, MessageMQTT(msg.topic, bytes(msg.payload), msg.qos, msg.retain))
+
+    def soumettre(self, client, message):
+        with self._lock:
+            route = self._routes.get(message.topic)
+            if route is None:
+                self.nb_ignores += 1
+                return False
+            if route.en_cours >= route.limite:
+                route.attente.append((client, message, time.perf_counter()))
+                return True
+            route.en_cours += 1
+
+        self._pool.submit(self._executer, route, client, message, time.perf_counter())
+        return True
+
+    def _executer(self, route, client, message, recu):
+        while True:
+            debut = time.perf_counter()
+            try:
+                route.handler(client, message)
+                erreur = False
+            except Exception as e:
+                print(f"✗ Erreur message MQTT [{route.topic}]: {e}")
+                erreur = True
+            duree = (time.perf_counter() - debut) * 1000
+
+            with self._lock:
+                route.nb_traites += 1
+                route.nb_erreurs += erreur
+                route.max_ms = max(route.max_ms, duree)
+                route.max_attente_ms = max(route.max_attente_ms, (debut - recu) * 1000)
+                if route.moyenne_ms is None:
+                    route.moyenne_ms = duree
+                else:
+                    route.moyenne_ms = 0.9 * route.moyenne_ms + 0.1 * duree
+
+                # Enchaîner directement le message suivant du même topic
+                if not route.attente:
+                    route.en_cours -= 1
+                    return
+                client, message, recu = route.attente.popleft()
+
+    def arreter(self):
+        self._pool.shutdown(wait=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'routes': {topic: route.stats() for topic, route in self._routes.items()},
+                'ignores': self.nb_ignores
+            }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+FLUX TEMPS RÉEL DU STATUT (SERVER-SENT EVENTS)
+Un seul thread écrit (non bloquant) vers tous les tableaux de bord ouverts
+Envoi uniquement quand une place change d'état
+═══════════════════════════════════════════════════════════════
+"""
+
+import json
+import queue
+import threading
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+MAX_CLIENTS = 500            # connexions SSE simultanées max
+INTERVALLE_PING = 15         # secondes : commentaire keep-alive (proxies, clients morts)
+TAMPON_MAX = 64 * 1024       # octets en attente max par client (au-delà : trop lent, déconnecté)
+
+# ═══════════════════════════════════════════════════════════════
+# DELTA
+# ═══════════════════════════════════════════════════════════════
+
+def message_sse(evenement, donnees):
+    """Trame SSE encodée (une seule fois pour tous les clients)"""
+    return f"event: {evenement}\ndata: {json.dumps(donnees)}\n\n".encode('utf-8')
+
+def delta_statut(ancien, nouveau):
+    """
+    Places dont l'état occupé/libre a changé entre deux PARKING_DATA
+
+    Returns:
+        dict à envoyer (places modifiées + compteurs), None si aucun changement
+    """
+    anciennes = (ancien or {}).get('places', {})
+    places = {nom: place for nom, place in nouveau['places'].items()
+              if nom not in anciennes or anciennes[nom]['occupe'] != place['occupe']}
+    if not places:
+        return None
+    return {
+        'places': places,
+        'timestamp': nouveau['timestamp'],
+        'total': nouveau['total'],
+        'available': nouveau['available'],
+        'occupied': nouveau['occupied']
+    }
+
+# ═══════════════════════════════════════════════════════════════
+# DIFFUSEUR
+# ═══════════════════════════════════════════════════════════════
+
+class DiffuseurSSE:
+    """
+    Clients SSE détachés du serveur web, servis par un thread unique
+
+    Une fois les en-têtes envoyés, la socket est confiée au diffuseur
+    et le thread du pool HTTP est libéré : le coût d'un spectateur de
+    plus est une socket, pas un thread ni une requête toutes les 3 s.
+    Chaque message est encodé une fois puis écrit en non bloquant vers
+    toutes les sockets : ce que le noyau n'accepte pas tout de suite
+    reste dans le tampon du client, et un client dont le tampon dépasse
+    TAMPON_MAX (ou fermé) est retiré sans retarder les autres.
+    """
+
+    def __init__(self, max_clients=MAX_CLIENTS, intervalle_ping=INTERVALLE_PING):
+        self.max_clients = max_clients
+        self.intervalle_ping = intervalle_ping
+
+        self._lock = threading.Lock()
+        self._clients = {}  # socket → octets en attente (None tant que le premier message n'est pas passé)
+        self._file = queue.Queue()
+        self._actif = False
+
+        # Statistiques
+        self.nb_messages = 0
+        self.nb_connexions = 0
+        self.nb_deconnexions = 0
+        self.nb_lents = 0
+
+    def plein(self):
+        with self._lock:
+            return len(self._clients) >= self.max_clients
+
+    def ajouter(self, sock, evenement=None, donnees=None):
+        """
+        Confier une socket (en-têtes HTTP déjà envoyés)
+
+        donnees peut être une fonction : elle est appelée par le thread
+        du diffuseur, dans l'ordre de la file, si bien qu'aucun delta
+        publié entre l'inscription et l'état initial n'est perdu.
+
+        Returns:
+            False si le diffuseur est plein (la socket reste à l'appelant)
+        """
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                return False
+            sock.setblocking(False)
+            self._clients[sock] = None
+            self.nb_connexions += 1
+        self._file.put((sock, evenement, donnees))
+        return True
+
+    def publier(self, evenement, donnees):
+        """Mettre un message en file (ne bloque jamais l'appelant)"""
+        self._file.put(message_sse(evenement, donnees))
+
+    def _envoyer(self, sock, message):
+        """Écriture non bloquante ; False si le client est fermé ou trop lent"""
+        tampon = self._clients.get(sock)
+        if tampon is None:
+            return True
+        tampon += message
+        try:
+            del tampon[:sock.send(tampon)]
+        except BlockingIOError:
+            pass
+        except OSError:
+            return False
+        if len(tampon) > TAMPON_MAX:
+            self.nb_lents += 1
+            return False
+        return True
+
+    def _initialiser(self, sock, evenement, donnees):
+        """Premier message d'un client, à sa place dans la file"""
+        with self._lock:
+            if sock not in self._clients:
+                return
+            self._clients[sock] = bytearray()
+        if evenement is None:
+            return
+        if callable(donnees):
+            donnees = donnees()
+        if not self._envoyer(sock, message_sse(evenement, donnees)):
+            self._retirer([sock])
+
+    def _diffuser(self, message):
+        with self._lock:
+            clients = list(self._clients)
+
+        morts = [sock for sock in clients if not self._envoyer(sock, message)]
+        if morts:
+            self._retirer(morts)
+
+    def _retirer(self, socks):
+        with self._lock:
+            for sock in socks:
+                if sock in self._clients:
+                    del self._clients[sock]
+                    self.nb_deconnexions += 1
+        for sock in socks:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _boucle(self):
+        while self._actif:
+            try:
+                message = self._file.get(timeout=self.intervalle_ping)
+            except queue.Empty:
+                self._diffuser(b": ping\n\n")
+                continue
+            if message is None:
+                break
+            if isinstance(message, tuple):
+                self._initialiser(*message)
+                continue
+            self.nb_messages += 1
+            self._diffuser(message)
+
+    def demarrer(self):
+        self._actif = True
+        thread = threading.Thread(target=self._boucle, daemon=True)
+        thread.start()
+        return thread
+
+    def arreter(self):
+        self._actif = False
+        self._file.put(None)
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for sock in clients:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'max_clients': self.max_clients,
+                'messages': self.nb_messages,
+                'connexions': self.nb_connexions,
+                'deconnexions': self.nb_deconnexions,
+                'lents': self.nb_lents
+            }
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+JOURNAL DES ACCÈS (ASYNCHRONE, PAR LOTS)
+Les tentatives d'accès sont mises en file puis insérées par lots
+Fichier de secours local si Supabase est injoignable, rejoué ensuite
+═══════════════════════════════════════════════════════════════
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+TAILLE_LOT = 50              # entrées max par insert
+DELAI_LOT = 2.0              # secondes max avant envoi d'un lot incomplet
+INTERVALLE_REJEU = 30        # secondes entre deux tentatives de rejeu
+FICHIER_SECOURS = "access_logs_secours.jsonl"
+FICHIER_REJETS = "access_logs_rejetes.jsonl"  # lignes refusées par la base (jamais rejouées)
+CLASSES_REJET = ('22', '23', '42', 'PGRST1', 'PGRST2')  # SQLSTATE donnée / contrainte / colonne, requête PostgREST
+
+# ═══════════════════════════════════════════════════════════════
+# JOURNAL
+# ═══════════════════════════════════════════════════════════════
+
+class JournalAcces:
+    """
+    Écrivain de logs en arrière-plan
+
+    ajouter() ne fait que mettre l'entrée en file : la décision d'accès
+    (et la commande barrière) n'attend jamais Supabase. Un thread
+    regroupe les entrées et les insère en une requête multi-lignes
+    dès que TAILLE_LOT entrées sont prêtes ou que DELAI_LOT est écoulé.
+
+    Si l'insert échoue, le lot est ajouté au fichier de secours (une
+    ligne JSON par entrée, ajout seul). Ce fichier est rejoué au
+    démarrage puis toutes les INTERVALLE_REJEU secondes jusqu'à ce que
+    Supabase réponde : aucune tentative n'est perdue.
+
+    Un lot refusé par la base (contrainte, colonne inconnue) est
+    renvoyé ligne par ligne : les lignes refusées partent dans le
+    fichier de rejets et les autres sont insérées. Seule une erreur
+    réseau / serveur arrête le rejeu.
+    """
+
+    def __init__(self, supabase, table="access_logs", taille_lot=TAILLE_LOT,
+                 delai_lot=DELAI_LOT, fichier_secours=FICHIER_SECOURS, fichier_rejets=FICHIER_REJETS):
+        self.supabase = supabase
+        self.table = table
+        self.taille_lot = taille_lot
+        self.delai_lot = delai_lot
+        self.fichier_secours = fichier_secours
+        self.fichier_rejets = fichier_rejets
+
+        self._file = queue.Queue()
+        self._thread = None
+        self._actif = False
+        self._dernier_rejeu = 0.0
+
+        # Statistiques
+        self.nb_inserees = 0
+        self.nb_lots = 0
+        self.nb_secours = 0
+        self.nb_rejouees = 0
+        self.nb_rejetees = 0
+        self.derniere_erreur = None
+
+    def ajouter(self, entree):
+        """Mettre une entrée en file (retour immédiat)"""
+        self._file.put(entree)
+
+    # ───────────────────────────────────────────────────────────
+    # Envoi
+    # ───────────────────────────────────────────────────────────
+
+    def _inserer(self, lot):
+        self.supabase.table(self.table).insert(lot).execute()
+        self.nb_inserees += len(lot)
+        self.nb_lots += 1
+
+    @staticmethod
+    def _rejet_definitif(erreur):
+        """La base refuse ces lignes (pas une coupure réseau / serveur)"""
+        return str(getattr(erreur, 'code', '') or '').startswith(CLASSES_REJET)
+
+    def _inserer_ou_isoler(self, lot):
+        """
+        Insérer un lot ; s'il est refusé, isoler les lignes fautives
+
+        Raises:
+            Exception réseau / serveur (le lot n'est pas envoyé)
+        """
+        try:
+            self._inserer(lot)
+            return
+        except Exception as e:
+            if not self._rejet_definitif(e):
+                raise
+            if len(lot) == 1:
+                self._rejeter(lot, e)
+                return
+
+        for entree in lot:
+            try:
+                self._inserer([entree])
+            except Exception as e:
+                if not self._rejet_definitif(e):
+                    raise
+                self._rejeter([entree], e)
+
+    def _ecrire(self, chemin, entrees, mode="a"):
+        with open(chemin, mode, encoding="utf-8") as f:
+            for entree in entrees:
+                f.write(json.dumps(entree) + "\n")
+
+    def _rejeter(self, lot, erreur):
+        self._ecrire(self.fichier_rejets, lot)
+        self.nb_rejetees += len(lot)
+        print(f"✗ Log refusé par Supabase ({len(lot)} entrée(s) → {self.fichier_rejets}): {erreur}")
+
+    def _secours(self, lot):
+        self._ecrire(self.fichier_secours, lot)
+        self.nb_secours += len(lot)
+
+    def _envoyer(self, lot):
+        # Tant que le secours n'est pas vidé, garder l'ordre : écrire à la suite
+        if os.path.exists(self.fichier_secours):
+            self._secours(lot)
+            return
+        try:
+            self._inserer_ou_isoler(lot)
+            self.derniere_erreur = None
+        except Exception as e:
+            self.derniere_erreur = str(e)
+            print(f"✗ Erreur log ({len(lot)} entrée(s) → {self.fichier_secours}): {e}")
+            self._secours(lot)
+            self._dernier_rejeu = time.monotonic()
+
+    def _rejouer(self):
+        """Renvoyer le fichier de secours par lots (thread du journal uniquement)"""
+        self._dernier_rejeu = time.monotonic()
+        if not os.path.exists(self.fichier_secours):
+            return
+
+        entrees = []
+        with open(self.fichier_secours, "r", encoding="utf-8") as f:
+            for ligne in f:
+                try:
+                    entrees.append(json.loads(ligne))
+                except ValueError:
+                    pass  # ligne tronquée (arrêt brutal pendant l'écriture)
+
+        envoyees = 0
+        try:
+            while envoyees < len(entrees):
+                lot = entrees[envoyees:envoyees + self.taille_lot]
+                self._inserer_ou_isoler(lot)
+                envoyees += len(lot)
+        except Exception as e:
+            self.derniere_erreur = str(e)
+
+        self.nb_rejouees += envoyees
+        if envoyees == len(entrees):
+            os.remove(self.fichier_secours)
+            self.derniere_erreur = None
+            if envoyees:
+                print(f"📝 Logs rejoués: {envoyees} entrée(s)")
+        elif envoyees:
+            # Fichier temporaire puis remplacement atomique : un arrêt brutal ne perd pas le reste
+            temporaire = self.fichier_secours + ".tmp"
+            self._ecrire(temporaire, entrees[envoyees:], "w")
+            os.replace(temporaire, self.fichier_secours)
+
+    # ───────────────────────────────────────────────────────────
+    # Thread
+    # ───────────────────────────────────────────────────────────
+
+    def _boucle(self):
+        self._rejouer()
+
+        while self._actif or not self._file.empty():
+            lot = []
+            try:
+                lot.append(self._file.get(timeout=1))
+            except queue.Empty:
+                pass
+
+            if lot:
+                limite = time.monotonic() + self.delai_lot
+                while len(lot) < self.taille_lot:
+                    reste = limite - time.monotonic()
+                    if reste <= 0 or not self._actif:
+                        break
+                    try:
+                        lot.append(self._file.get(timeout=reste))
+                    except queue.Empty:
+                        break
+                # Vider sans attendre ce qui est déjà en file
+                while len(lot) < self.taille_lot:
+                    try:
+                        lot.append(self._file.get_nowait())
+                    except queue.Empty:
+                        break
+                self._envoyer(lot)
+
+            if time.monotonic() - self._dernier_rejeu >= INTERVALLE_REJEU:
+                self._rejouer()
+
+    def demarrer(self):
+        self._actif = True
+        self._thread = threading.Thread(target=self._boucle, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def arreter(self, timeout=5):
+        """Envoyer les entrées restantes puis arrêter le thread"""
+        self._actif = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'en_file': self._file.qsize(),
+            'inserees': self.nb_inserees,
+            'lots': self.nb_lots,
+            'secours': self.nb_secours,
+            'rejouees': self.nb_rejouees,
+            'rejetees': self.nb_rejetees,
+            'fichier_secours': os.path.exists(self.fichier_secours),
+            'derniere_erreur': self.derniere_erreur
+        }
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+MIROIR LOCAL SQLITE (MODE HORS-LIGNE)
+Copie locale de rfid_cards, access_codes et transactions récentes
+Synchronisation en arrière-plan + écritures différées vers Supabase
+═══════════════════════════════════════════════════════════════
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+FICHIER_MIROIR = "parking_local.db"
+INTERVALLE_SYNCHRO = 15      # secondes entre deux synchronisations
+RETENTION_HEURES = 24        # access_codes / transactions récents gardés en local
+TAILLE_PAGE = 1000
+INTERVALLE_CLES_CARTES = 300 # secondes entre deux relectures complètes des card_uid (suppressions)
+CLASSES_REJET = ('22', '23') # SQLSTATE : donnée invalide, contrainte violée (l'écriture ne passera jamais)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rfid_cards (
+    card_uid TEXT PRIMARY KEY,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS access_codes (
+    access_code TEXT PRIMARY KEY,
+    status TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    access_code TEXT,
+    status TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_code ON transactions(access_code, status);
+CREATE TABLE IF NOT EXISTS ecritures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    cle TEXT,
+    operation TEXT NOT NULL,
+    valeurs TEXT NOT NULL,
+    filtres TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ecritures_rejetees (
+    id INTEGER PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    cle TEXT,
+    operation TEXT NOT NULL,
+    valeurs TEXT NOT NULL,
+    filtres TEXT NOT NULL,
+    erreur TEXT,
+    date TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    cle TEXT PRIMARY KEY,
+    valeur TEXT
+);
+"""
+
+# ═══════════════════════════════════════════════════════════════
+# MIROIR
+# ═══════════════════════════════════════════════════════════════
+
+class MiroirLocal:
+    """
+    Base locale consultée avant Supabase pour les décisions d'accès
+
+    - Lecture : cartes, codes et transactions sont lus en local
+      (quelques µs, et disponibles sans internet). pret indique
+      qu'une première synchronisation complète a réussi.
+    - Écriture : appliquée en local immédiatement puis mise dans la
+      table ecritures ; pousser() les rejoue dans l'ordre vers Supabase
+      dès que possible (write-behind). Une écriture refusée par la
+      base (contrainte, donnée invalide) part dans ecritures_rejetees
+      au lieu de bloquer la file ; un update conditionnel qui ne touche
+      aucune ligne en amont (conflit) aussi, et la ligne locale est
+      relue depuis Supabase.
+    - Suppressions : les card_uid distants sont relus en entier toutes
+      les INTERVALLE_CLES_CARTES secondes ; une carte supprimée en
+      amont disparaît du miroir ; les caches abonnés oublient les
+      cartes modifiées ou supprimées (une seule source pour rfid_cards).
+    - Une ligne distante n'écrase jamais une ligne locale dont une
+      écriture n'a pas encore été poussée.
+    """
+
+    def __init__(self, supabase, chemin=FICHIER_MIROIR):
+        self.supabase = supabase
+        self.chemin = chemin
+
+        self._lock = threading.Lock()
+        self._lock_poussee = threading.Lock()  # un seul rejeu à la fois (thread synchro + appels directs)
+        self._db = sqlite3.connect(chemin, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._arret = threading.Event()
+        self._reveil = threading.Event()      # poussée demandée avant le prochain cycle
+        self._derniere_synchro_cles = None   # time.monotonic()
+        self._rappels_cartes = []
+
+        # Statistiques
+        self.nb_synchros = 0
+        self.nb_poussees = 0
+        self.nb_rejets = 0
+        self.nb_cartes_supprimees = 0
+        self.nb_erreurs = 0
+        self.derniere_synchro = None
+        self.derniere_erreur = None
+
+    # ───────────────────────────────────────────────────────────
+    # Méta
+    # ───────────────────────────────────────────────────────────
+
+    def _meta(self, cle, defaut=None):
+        ligne = self._db.execute("SELECT valeur FROM meta WHERE cle = ?", (cle,)).fetchone()
+        return ligne[0] if ligne else defaut
+
+    def _ecrire_meta(self, cle, valeur):
+        self._db.execute("INSERT OR REPLACE INTO meta (cle, valeur) VALUES (?, ?)", (cle, valeur))
+
+    @property
+    def pret(self):
+        """Au moins une synchronisation complète (ici ou lors d'un lancement précédent)"""
+        with self._lock:
+            return self._meta('synchro_complete') is not None
+
+    # ───────────────────────────────────────────────────────────
+    # Lectures locales
+    # ───────────────────────────────────────────────────────────
+
+    def _lire(self, requete, params):
+        with self._lock:
+            ligne = self._db.execute(requete, params).fetchone()
+        return json.loads(ligne['data']) if ligne else None
+
+    def carte(self, card_uid):
+        """Carte RFID, ou None si inconnue"""
+        return self._lire("SELECT data FROM rfid_cards WHERE card_uid = ?", (card_uid,))
+
+    def cartes(self):
+        """Toutes les cartes RFID locales"""
+        with self._lock:
+            return [json.loads(ligne['data']) for ligne in self._db.execute("SELECT data FROM rfid_cards")]
+
+    def code(self, access_code):
+        """Ligne access_codes, ou None"""
+        return self._lire("SELECT data FROM access_codes WHERE access_code = ?", (access_code,))
+
+    def transaction_payee(self, access_code):
+        """Transaction 'completed' pour ce code, ou None"""
+        return self._lire(
+            "SELECT data FROM transactions WHERE access_code = ? AND status = 'completed' LIMIT 1",
+            (access_code,))
+
+    # ───────────────────────────────────────────────────────────
+    # Écritures locales + file différée
+    # ───────────────────────────────────────────────────────────
+
+    def _differer(self, table, cle, operation, valeurs, filtres=()):
+        self._db.execute(
+            "INSERT INTO ecritures (table_name, cle, operation, valeurs, filtres) VALUES (?, ?, ?, ?, ?)",
+            (table, cle, operation, json.dumps(valeurs), json.dumps(list(filtres))))
+
+    def _stocker_code(self, ligne):
+        self._db.execute(
+            "INSERT OR REPLACE INTO access_codes (access_code, status, created_at, data) VALUES (?, ?, ?, ?)",
+            (ligne['access_code'], ligne.get('status'), ligne.get('created_at'), json.dumps(ligne)))
+
+    def inserer_code(self, ligne, differer=True):
+        """Nouveau code (différé vers Supabase si differer=True)"""
+        with self._lock:
+            self._stocker_code(ligne)
+            if differer:
+                self._differer("access_codes", ligne['access_code'], "insert", ligne)
+            self._db.commit()
+
+    def changer_statut_code(self, access_code, valeurs, statuts=None, differer=True):
+        """
+        Mettre à jour un code localement, seulement s'il a l'un des statuts donnés
+
+        Returns:
+            True si la ligne locale a été modifiée
+        """
+        with self._lock:
+            ligne = self._db.execute(
+                "SELECT data FROM access_codes WHERE access_code = ?", (access_code,)).fetchone()
+            if ligne is None:
+                return False
+            donnees = json.loads(ligne['data'])
+            if statuts is not None and donnees.get('status') not in statuts:
+                return False
+
+            donnees.update(valeurs)
+            self._stocker_code(donnees)
+            if differer:
+                filtres = [("eq", "access_code", access_code)]
+                if statuts is not None:
+                    filtres.append(("in_", "status", list(statuts)))
+                self._differer("access_codes", access_code, "update", valeurs, filtres)
+            self._db.commit()
+            return True
+
+    def enregistrer_transaction(self, transaction):
+        """Transaction vue par le webhook / surveillant (lecture seule côté local)"""
+        with self._lock:
+            self._stocker_transaction(transaction)
+            self._db.commit()
+
+    def _stocker_transaction(self, t):
+        self._db.execute(
+            "INSERT OR REPLACE INTO transactions (id, access_code, status, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+            (str(t.get('id', t.get('access_code'))), t.get('access_code'), t.get('status'),
+             t.get('timestamp'), json.dumps(t)))
+
+    # ───────────────────────────────────────────────────────────
+    # Synchronisation
+    # ───────────────────────────────────────────────────────────
+
+    def _paginer(self, construire):
+        lignes = []
+        debut = 0
+        while True:
+            response = construire().range(debut, debut + TAILLE_PAGE - 1).execute()
+            lignes.extend(response.data or [])
+            if not response.data or len(response.data) < TAILLE_PAGE:
+                return lignes
+            debut += TAILLE_PAGE
+
+    def sur_changement_cartes(self, rappel):
+        """rappel(card_uids) après chaque synchronisation qui modifie ou supprime des cartes"""
+        self._rappels_cartes.append(rappel)
+
+    @staticmethod
+    def _rejet_definitif(erreur):
+        """Erreur de la base sur cette ligne (pas une coupure réseau)"""
+        return str(getattr(erreur, 'code', '') or '')[:2] in CLASSES_REJET
+
+    def pousser(self):
+        """
+        Rejouer les écritures différées dans l'ordre
+
+        S'arrête au premier échec réseau (réessayé au cycle suivant) ;
+        une écriture rejetée définitivement est mise de côté.
+        """
+        with self._lock_poussee:
+            self._pousser()
+
+    def _pousser(self):
+        while True:
+            with self._lock:
+                ligne = self._db.execute(
+                    "SELECT * FROM ecritures ORDER BY id LIMIT 1").fetchone()
+            if ligne is None:
+                return
+
+            valeurs = json.loads(ligne['valeurs'])
+            requete = self.supabase.table(ligne['table_name'])
+            if ligne['operation'] == "insert":
+                requete = requete.insert(valeurs)
+            else:
+                requete = requete.update(valeurs)
+                for operation, colonne, valeur in json.loads(ligne['filtres']):
+                    requete = getattr(requete, operation)(colonne, valeur)
+            try:
+                response = requete.execute()
+            except Exception as e:
+                if not self._rejet_definitif(e):
+                    raise
+                self._rejeter(ligne, e)
+                continue
+
+            # Update conditionnel sans ligne touchée : l'amont a changé entre-temps
+            # (code déjà utilisé / expiré côté serveur) → conflit, ligne locale relue
+            if ligne['operation'] == "update" and not response.data:
+                self._rejeter(ligne, "conflit : aucune ligne ne correspond en amont")
+                self._reconcilier(ligne['table_name'], ligne['cle'])
+                continue
+
+            with self._lock:
+                self._db.execute("DELETE FROM ecritures WHERE id = ?", (ligne['id'],))
+                self._db.commit()
+            self.nb_poussees += 1
+
+    def _reconcilier(self, table, cle):
+        """Remplacer la ligne locale par celle de Supabase (sauf écriture encore en attente)"""
+        if table != "access_codes":
+            return
+        response = self.supabase.table("access_codes").select("*").eq("access_code", cle).execute()
+        with self._lock:
+            en_attente = self._db.execute(
+                "SELECT 1 FROM ecritures WHERE table_name = 'access_codes' AND cle = ?", (cle,)).fetchone()
+            if en_attente is None:
+                if response.data:
+                    self._stocker_code(response.data[0])
+                else:
+                    self._db.execute("DELETE FROM access_codes WHERE access_code = ?", (cle,))
+                self._db.commit()
+
+    def _rejeter(self, ligne, erreur):
+        """Déplacer une écriture refusée vers ecritures_rejetees"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO ecritures_rejetees "
+                "(id, table_name, cle, operation, valeurs, filtres, erreur, date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (ligne['id'], ligne['table_name'], ligne['cle'], ligne['operation'],
+                 ligne['valeurs'], ligne['filtres'], str(erreur), datetime.utcnow().isoformat()))
+            self._db.execute("DELETE FROM ecritures WHERE id = ?", (ligne['id'],))
+            self._db.commit()
+        self.nb_rejets += 1
+        print(f"✗ Écriture {ligne['operation']} {ligne['table_name']} {ligne['cle']} rejetée par Supabase: {erreur}")
+
+    def synchroniser(self):
+        """Relire rfid_cards (incrémental, card_uid complets périodiquement) + codes et transactions récents"""
+        with self._lock:
+            depuis_cartes = self._meta('cartes_updated_at')
+        depuis = (datetime.utcnow() - timedelta(hours=RETENTION_HEURES)).isoformat()
+
+        def requete_cartes():
+            q = self.supabase.table("rfid_cards").select("*")
+            return q.gt("updated_at", depuis_cartes) if depuis_cartes else q
+
+        cartes = self._paginer(requete_cartes)
+        cles_distantes = None
+        if (self._derniere_synchro_cles is None
+                or time.monotonic() - self._derniere_synchro_cles >= INTERVALLE_CLES_CARTES):
+            cles_distantes = {c['card_uid'] for c in self._paginer(
+                lambda: self.supabase.table("rfid_cards").select("card_uid").order("card_uid"))}
+        codes = self._paginer(lambda: self.supabase.table("access_codes")
+                              .select("*").gte("created_at", depuis))
+        transactions = self._paginer(lambda: self.supabase.table("transactions")
+                                     .select("*").eq("status", "completed").gte("timestamp", depuis))
+
+        with self._lock:
+            en_attente = {r[0] for r in self._db.execute(
+                "SELECT cle FROM ecritures WHERE table_name = 'access_codes'")}
+
+            for carte in cartes:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO rfid_cards (card_uid, updated_at, data) VALUES (?, ?, ?)",
+                    (carte['card_uid'], carte.get('updated_at'), json.dumps(carte)))
+                if carte.get('updated_at') and (depuis_cartes is None or carte['updated_at'] > depuis_cartes):
+                    depuis_cartes = carte['updated_at']
+            supprimees = []
+            if cles_distantes is not None:
+                supprimees = [r[0] for r in self._db.execute("SELECT card_uid FROM rfid_cards")
+                              if r[0] not in cles_distantes]
+                self._db.executemany("DELETE FROM rfid_cards WHERE card_uid = ?",
+                                     [(uid,) for uid in supprimees])
+            for code in codes:
+                if code['access_code'] not in en_attente:
+                    self._stocker_code(code)
+            for transaction in transactions:
+                self._stocker_transaction(transaction)
+
+            # Purge des lignes trop anciennes (hors écritures en attente)
+            self._db.execute(
+                "DELETE FROM access_codes WHERE created_at < ? AND access_code NOT IN "
+                "(SELECT cle FROM ecritures WHERE table_name = 'access_codes')", (depuis,))
+            self._db.execute("DELETE FROM transactions WHERE timestamp < ?", (depuis,))
+
+            if depuis_cartes:
+                self._ecrire_meta('cartes_updated_at', depuis_cartes)
+            self._ecrire_meta('synchro_complete', datetime.utcnow().isoformat())
+            self._db.commit()
+
+        if cles_distantes is not None:
+            self._derniere_synchro_cles = time.monotonic()
+        if supprimees:
+            self.nb_cartes_supprimees += len(supprimees)
+            print(f"🗑️  Miroir local: {len(supprimees)} carte(s) supprimée(s) en amont")
+        changees = [carte['card_uid'] for carte in cartes] + supprimees
+        if changees:
+            for rappel in self._rappels_cartes:
+                rappel(changees)
+
+        self.nb_synchros += 1
+        self.derniere_synchro = time.time()
+        return len(cartes), len(codes), len(transactions)
+
+    def cycle(self):
+        """Pousser les écritures locales puis relire l'amont (même si la poussée échoue)"""
+        erreur = None
+        for etape in (self.pousser, self.synchroniser):
+            try:
+                etape()
+            except Exception as e:
+                erreur = erreur or e
+
+        if erreur is None:
+            self.derniere_erreur = None
+            return True
+        self.nb_erreurs += 1
+        if self.derniere_erreur is None:
+            print(f"⚠️  Miroir local hors-ligne: {erreur}")
+        self.derniere_erreur = str(erreur)
+        return False
+
+    def demander_poussee(self):
+        """Réveiller le thread de synchronisation pour pousser sans attendre (ne bloque pas)"""
+        self._reveil.set()
+
+    def demarrer(self, intervalle=INTERVALLE_SYNCHRO):
+        def boucle():
+            while True:
+                reveille = self._reveil.wait(intervalle)
+                self._reveil.clear()
+                if self._arret.is_set():
+                    return
+                if not reveille:
+                    self.cycle()
+                    continue
+                try:
+                    self.pousser()
+                except Exception as e:
+                    self.nb_erreurs += 1
+                    self.derniere_erreur = str(e)
+
+        self._arret.clear()
+        thread = threading.Thread(target=boucle, daemon=True)
+        thread.start()
+        return thread
+
+    def arreter(self):
+        self._arret.set()
+        self._reveil.set()
+
+    def stats(self):
+        with self._lock:
+            compter = lambda table: self._db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            return {
+                'pret': self._meta('synchro_complete') is not None,
+                'cartes': compter('rfid_cards'),
+                'codes': compter('access_codes'),
+                'transactions': compter('transactions'),
+                'ecritures_en_attente': compter('ecritures'),
+                'ecritures_rejetees': compter('ecritures_rejetees'),
+                'synchros': self.nb_synchros,
+                'poussees': self.nb_poussees,
+                'rejets': self.nb_rejets,
+                'cartes_supprimees': self.nb_cartes_supprimees,
+                'erreurs': self.nb_erreurs,
+                'derniere_synchro': self.derniere_synchro,
+                'derniere_erreur': self.derniere_erreur
+            }
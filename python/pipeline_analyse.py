@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+PIPELINE D'ANALYSE PARKING
+capture → décodage → analyse → publication/annotation
+Files bornées (l'élément le plus ancien est abandonné si plein)
+Cycles déclenchés par le planificateur (périodique / capteur / manuel)
+═══════════════════════════════════════════════════════════════
+"""
+
+import collections
+import threading
+import time
+from planificateur import chainer, terminer
+
+# ═══════════════════════════════════════════════════════════════
+# FILE BORNÉE
+# ═══════════════════════════════════════════════════════════════
+
+class FileBornee:
+    """
+    File FIFO de taille fixe
+
+    Quand elle est pleine, put() remplace l'élément le plus ancien au
+    lieu de bloquer : une étape lente ne ralentit jamais l'étape qui
+    la précède, elle ne traite simplement que les données les plus
+    récentes.
+    """
+
+    def __init__(self, taille=1):
+        self._elements = collections.deque()
+        self._taille = taille
+        self._cond = threading.Condition()
+        self.nb_abandonnes = 0
+
+    def put(self, element):
+        """Ajouter un élément, retourne l'élément abandonné (ou None)"""
+        abandonne = None
+        with self._cond:
+            if len(self._elements) >= self._taille:
+                abandonne = self._elements.popleft()
+                self.nb_abandonnes += 1
+            self._elements.append(element)
+            self._cond.notify()
+        return abandonne
+
+    def get(self, timeout=None):
+        """Retourne l'élément suivant, ou None après timeout"""
+        with self._cond:
+            if not self._elements:
+                self._cond.wait(timeout)
+            if not self._elements:
+                return None
+            return self._elements.popleft()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._elements)
+
+# ═══════════════════════════════════════════════════════════════
+# ÉTAPE
+# ═══════════════════════════════════════════════════════════════
+
+class Etape:
+    """
+    Une étape du pipeline, exécutée dans son propre thread
+
+    La fonction reçoit l'élément de la file d'entrée et retourne
+    l'élément à transmettre (None = fin du cycle).
+    """
+
+    def __init__(self, nom, fonction, entree, sortie=None, resultat=False):
+        self.nom = nom
+        self.fonction = fonction
+        self.entree = entree
+        self.sortie = sortie
+        self.resultat = resultat
+
+        self.nb_traites = 0
+        self.nb_erreurs = 0
+        self.derniere_ms = None
+        self.moyenne_ms = None
+        self.max_ms = 0.0
+
+    def executer(self, element):
+        debut = time.perf_counter()
+        try:
+            resultat = self.fonction(element)
+        except Exception as e:
+            self.nb_erreurs += 1
+            print(f"\n✗ Pipeline [{self.nom}]: {e}")
+            resultat = None
+        duree = (time.perf_counter() - debut) * 1000
+
+        self.nb_traites += 1
+        self.derniere_ms = duree
+        self.max_ms = max(self.max_ms, duree)
+        if self.moyenne_ms is None:
+            self.moyenne_ms = duree
+        else:
+            self.moyenne_ms = 0.9 * self.moyenne_ms + 0.1 * duree
+
+        return resultat
+
+    def stats(self):
+        return {
+            'traites': self.nb_traites,
+            'erreurs': self.nb_erreurs,
+            'abandonnes': self.entree.nb_abandonnes if self.entree else 0,
+            'en_attente': len(self.entree) if self.entree else 0,
+            'derniere_ms': self.derniere_ms,
+            'moyenne_ms': self.moyenne_ms,
+            'max_ms': self.max_ms
+        }
+
+# ═══════════════════════════════════════════════════════════════
+# PIPELINE
+# ═══════════════════════════════════════════════════════════════
+
+class PipelineAnalyse:
+    """
+    Enchaîne une source et des étapes reliées par des files
+
+    La source (capture) est lancée à chaque cycle accordé par le
+    planificateur : échéances périodiques à cadence fixe, mais aussi
+    demandes capteur ou manuelles, toutes fusionnées. Le Future du cycle
+    suit l'image dans le pipeline et est résolu par l'étape marquée
+    resultat=True (ou la dernière). Si une file abandonne une image plus
+    ancienne, ses demandeurs reçoivent le résultat de l'image plus récente.
+
+    Exemple:
+        planificateur = PlanificateurAnalyse(INTERVALLE_ANALYSE)
+        pipeline = PipelineAnalyse("capture", capturer, planificateur)
+        pipeline.ajouter_etape("decodage", decoder)
+        pipeline.ajouter_etape("analyse", analyser, resultat=True)
+        pipeline.ajouter_etape("publication", publier)
+        pipeline.demarrer()
+        planificateur.demander("manuel").result()  # → sortie de "analyse"
+    """
+
+    def __init__(self, nom_source, source, planificateur, taille_files=1):
+        self.planificateur = planificateur
+        self.taille_files = taille_files
+        self.source = Etape(nom_source, lambda _: source(), None)
+        self.etapes = []
+        self._threads = []
+        self._actif = threading.Event()
+
+    def ajouter_etape(self, nom, fonction, resultat=False):
+        entree = FileBornee(self.taille_files)
+        precedente = self.etapes[-1] if self.etapes else self.source
+        precedente.sortie = entree
+        self.etapes.append(Etape(nom, fonction, entree, resultat=resultat))
+        return self
+
+    def _transmettre(self, etape, future, resultat):
+        if resultat is None or etape.sortie is None:
+            terminer(future, resultat)
+            return
+
+        if etape.resultat:
+            terminer(future, resultat)
+
+        abandonne = etape.sortie.put((future, resultat))
+        if abandonne is not None:
+            chainer(future, abandonne[0])
+
+    def _boucle_source(self):
+        while self._actif.is_set():
+            future = self.planificateur.prochaine_demande(timeout=0.5)
+            if future is None:
+                continue
+            self._transmettre(self.source, future, self.source.executer(None))
+
+    def _boucle_etape(self, etape):
+        while self._actif.is_set():
+            element = etape.entree.get(timeout=0.5)
+            if element is not None:
+                future, donnees = element
+                self._transmettre(etape, future, etape.executer(donnees))
+
+    def demarrer(self):
+        self._actif.set()
+        self._threads = [threading.Thread(target=self._boucle_source, daemon=True)]
+        for etape in self.etapes:
+            self._threads.append(threading.Thread(target=self._boucle_etape, args=(etape,), daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def arreter(self):
+        self._actif.clear()
+        self.planificateur.arreter()
+
+    def stats(self):
+        stats = {self.source.nom: self.source.stats()}
+        for etape in self.etapes:
+            stats[etape.nom] = etape.stats()
+        stats['planificateur'] = self.planificateur.stats()
+        return stats
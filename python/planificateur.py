@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+PLANIFICATEUR D'ANALYSE (SINGLE-FLIGHT)
+Regroupe les déclenchements : périodique, capteur, manuel
+Une seule analyse à la fois, résultat partagé entre demandeurs
+Mode adaptatif : cadence lente au repos, rafale après un événement
+═══════════════════════════════════════════════════════════════
+"""
+
+import collections
+import threading
+import time
+from concurrent.futures import Future
+
+# ═══════════════════════════════════════════════════════════════
+# OUTILS
+# ═══════════════════════════════════════════════════════════════
+
+def chainer(source, cible):
+    """Propager le résultat d'un Future vers un autre une fois terminé"""
+    def _copier(f):
+        if f.cancelled():
+            terminer(cible)
+        else:
+            terminer(cible, f.result() if f.exception() is None else None, f.exception())
+    source.add_done_callback(_copier)
+
+def terminer(future, resultat=None, erreur=None):
+    """Résoudre un Future de cycle (sans erreur s'il l'est déjà)"""
+    if future is None or future.done():
+        return
+    if erreur is not None:
+        future.set_exception(erreur)
+    else:
+        future.set_result(resultat)
+
+# ═══════════════════════════════════════════════════════════════
+# PLANIFICATEUR
+# ═══════════════════════════════════════════════════════════════
+
+class PlanificateurAnalyse:
+    """
+    Fusionne toutes les demandes d'analyse en cycles uniques
+
+    - demander() ne bloque jamais : il retourne un Future partagé par
+      toutes les demandes arrivées avant le début du prochain cycle.
+    - Une demande reçue pendant un cycle en cours ne le relance pas
+      en parallèle : elle est regroupée dans UN cycle suivant.
+    - Avec un intervalle, une demande "periodique" est émise à cadence
+      fixe (les échéances manquées sont sautées, pas rattrapées).
+    - Avec intervalle_rafale, rafale() passe à cette cadence rapide
+      pendant duree_rafale secondes (véhicule détecté, barrière
+      ouverte), puis le planificateur revient à l'intervalle de repos.
+
+    Le cycle lui-même est exécuté soit par demarrer(fonction), soit par
+    un consommateur externe (PipelineAnalyse) via prochaine_demande().
+    """
+
+    def __init__(self, intervalle=None, intervalle_rafale=None, duree_rafale=0.0):
+        self.intervalle = intervalle
+        self.intervalle_rafale = intervalle_rafale
+        self.duree_rafale = duree_rafale
+        self._cond = threading.Condition()
+        self._attente = None
+        self._actif = True
+        self._prochaine_echeance = time.monotonic() if intervalle else None
+        self._fin_rafale = 0.0
+
+        # Statistiques
+        self.demandes_par_source = collections.Counter()
+        self.nb_cycles = 0
+        self.nb_fusionnees = 0
+        self.nb_echeances_sautees = 0
+        self.nb_rafales = 0
+
+    def _intervalle_courant(self, maintenant):
+        """Cadence rapide pendant une rafale, sinon intervalle de repos"""
+        if self.intervalle_rafale and maintenant < self._fin_rafale:
+            return self.intervalle_rafale
+        return self.intervalle
+
+    def demander(self, source='manuel', delai=0.0):
+        """
+        Demander une analyse
+
+        Args:
+            source: origine de la demande (statistiques)
+            delai: secondes avant prise en compte (ex. laisser le véhicule s'arrêter)
+
+        Returns:
+            Future résolu avec le résultat du cycle
+        """
+        if delai > 0:
+            future = Future()
+            timer = threading.Timer(delai, lambda: chainer(self.demander(source), future))
+            timer.daemon = True
+            timer.start()
+            return future
+
+        with self._cond:
+            self.demandes_par_source[source] += 1
+            if self._attente is None:
+                self._attente = Future()
+            else:
+                self.nb_fusionnees += 1
+            self._cond.notify_all()
+            return self._attente
+
+    def rafale(self, source='capteur'):
+        """
+        Analyser tout de suite puis à cadence rapide pendant duree_rafale
+
+        Sans intervalle_rafale configuré, équivaut à demander(source).
+        Un nouvel événement pendant une rafale la prolonge.
+        """
+        if self.intervalle_rafale:
+            with self._cond:
+                maintenant = time.monotonic()
+                if maintenant >= self._fin_rafale:
+                    self.nb_rafales += 1
+                self._fin_rafale = maintenant + self.duree_rafale
+                prochaine = maintenant + self.intervalle_rafale
+                if self._prochaine_echeance is None or self._prochaine_echeance > prochaine:
+                    self._prochaine_echeance = prochaine
+                self._cond.notify_all()
+        return self.demander(source)
+
+    def prochaine_demande(self, timeout=None):
+        """
+        Attendre le prochain cycle à exécuter (demande ou échéance périodique)
+
+        Returns:
+            Future du cycle (à résoudre avec terminer()), ou None si
+            timeout / planificateur arrêté
+        """
+        limite = time.monotonic() + timeout if timeout is not None else None
+
+        with self._cond:
+            while self._actif and self._attente is None:
+                maintenant = time.monotonic()
+
+                if self._prochaine_echeance is not None and maintenant >= self._prochaine_echeance:
+                    self.demandes_par_source['periodique'] += 1
+                    self._attente = Future()
+                    break
+
+                attente = None
+                if self._prochaine_echeance is not None:
+                    attente = self._prochaine_echeance - maintenant
+                if limite is not None:
+                    if maintenant >= limite:
+                        return None
+                    attente = limite - maintenant if attente is None else min(attente, limite - maintenant)
+                self._cond.wait(attente)
+
+            if not self._actif:
+                return None
+
+            future = self._attente
+            self._attente = None
+            self.nb_cycles += 1
+
+            # Cadence fixe : l'échéance suivante ne dépend pas de la durée du cycle
+            maintenant = time.monotonic()
+            if self._prochaine_echeance is not None and maintenant >= self._prochaine_echeance:
+                pas = self._intervalle_courant(maintenant)
+                if pas is None:
+                    self._prochaine_echeance = None
+                else:
+                    self._prochaine_echeance += pas
+                    if maintenant > self._prochaine_echeance:
+                        sautees = int((maintenant - self._prochaine_echeance) // pas) + 1
+                        self.nb_echeances_sautees += sautees
+                        self._prochaine_echeance += sautees * pas
+
+        future.set_running_or_notify_cancel()
+        return future
+
+    def demarrer(self, fonction):
+        """Exécuter fonction() dans un thread dédié à chaque cycle"""
+        def boucle():
+            while self._actif:
+                future = self.prochaine_demande()
+                if future is None:
+                    continue
+                try:
+                    terminer(future, fonction())
+                except Exception as e:
+                    print(f"\n✗ Analyse: {e}")
+                    terminer(future, erreur=e)
+
+        thread = threading.Thread(target=boucle, daemon=True)
+        thread.start()
+        return thread
+
+    def arreter(self):
+        with self._cond:
+            self._actif = False
+            if self._attente is not None:
+                terminer(self._attente)
+                self._attente = None
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            en_rafale = bool(self.intervalle_rafale) and time.monotonic() < self._fin_rafale
+            return {
+                'intervalle': self.intervalle_rafale if en_rafale else self.intervalle,
+                'mode': 'rafale' if en_rafale else 'repos',
+                'rafales': self.nb_rafales,
+                'cycles': self.nb_cycles,
+                'fusionnees': self.nb_fusionnees,
+                'echeances_sautees': self.nb_echeances_sautees,
+                'demandes': dict(self.demandes_par_source)
+            }
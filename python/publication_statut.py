@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+PUBLICATION MQTT DU STATUT PAR DELTAS
+Un message par place qui change d'état (sous-topic par place)
+Compteurs compacts quand ils changent, instantané complet rare
+═══════════════════════════════════════════════════════════════
+"""
+
+import threading
+import time
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+INTERVALLE_SNAPSHOT = 300    # secondes min entre deux statuts complets (retenus)
+INTERVALLE_VERIFICATION = 5  # secondes : envoi d'un instantané en attente
+
+# ═══════════════════════════════════════════════════════════════
+# PUBLICATEUR
+# ═══════════════════════════════════════════════════════════════
+
+class PublicateurStatut:
+    """
+    Garde le dernier état publié et n'envoie que les différences
+
+    Topics (tous retenus, un abonné arrivant reçoit l'état courant) :
+        {topic}/places/{nom}  {"occupe": bool}           à chaque bascule
+        {topic}/disponibles   {"available", "total"}     si les compteurs changent
+        {topic}               statut complet (ancien format), au plus
+                              toutes les intervalle_snapshot secondes
+
+    Args:
+        publier: publier(topic, data, qos, retain) → True si envoyé
+    """
+
+    def __init__(self, publier, topic, intervalle_snapshot=INTERVALLE_SNAPSHOT):
+        self.publier = publier
+        self.topic = topic
+        self.intervalle_snapshot = intervalle_snapshot
+
+        self._lock = threading.Lock()
+        self._places = {}            # nom → occupé (dernier état publié)
+        self._compteurs = None
+        self._donnees = None         # dernier PARKING_DATA reçu
+        self._snapshot_en_attente = False
+        self._dernier_snapshot = None   # time.monotonic() du dernier statut complet
+        self._arret = threading.Event()
+
+        # Statistiques
+        self.nb_mises_a_jour = 0
+        self.nb_deltas = 0
+        self.nb_compteurs = 0
+        self.nb_snapshots = 0
+
+    @staticmethod
+    def statut_complet(donnees):
+        return {
+            'timestamp': donnees['timestamp'],
+            'total': donnees['total'],
+            'available': donnees['available'],
+            'occupied': donnees['occupied'],
+            'places': {nom: p['occupe'] for nom, p in donnees['places'].items()}
+        }
+
+    def publier_statut(self, donnees):
+        """Nouveau PARKING_DATA : publier les places modifiées (appelé à chaque cycle)"""
+        with self._lock:
+            self.nb_mises_a_jour += 1
+            self._donnees = donnees
+            self._publier()
+
+    def _publier(self):
+        """Différences entre self._donnees et le dernier état publié (avec self._lock)"""
+        donnees = self._donnees
+        for nom, place in donnees['places'].items():
+            if self._places.get(nom) == place['occupe']:
+                continue
+            if self.publier(f"{self.topic}/places/{nom}", {'occupe': place['occupe']}, 1, True):
+                self._places[nom] = place['occupe']
+                self.nb_deltas += 1
+                self._snapshot_en_attente = True
+
+        compteurs = (donnees['available'], donnees['total'])
+        if compteurs != self._compteurs:
+            if self.publier(f"{self.topic}/disponibles",
+                            {'available': compteurs[0], 'total': compteurs[1]}, 1, True):
+                self._compteurs = compteurs
+                self.nb_compteurs += 1
+
+        self._publier_snapshot_si_du()
+
+    def _publier_snapshot_si_du(self):
+        """Statut complet si des changements l'attendent et l'intervalle est écoulé (avec self._lock)"""
+        if not self._snapshot_en_attente:
+            return
+        if self._dernier_snapshot is not None and time.monotonic() - self._dernier_snapshot < self.intervalle_snapshot:
+            return
+        if self.publier(self.topic, self.statut_complet(self._donnees), 1, True):
+            self._snapshot_en_attente = False
+            self._dernier_snapshot = time.monotonic()
+            self.nb_snapshots += 1
+
+    def invalider(self):
+        """Broker (re)connecté : tout republier au prochain cycle / vérification"""
+        with self._lock:
+            self._places = {}
+            self._compteurs = None
+            self._snapshot_en_attente = True
+            self._dernier_snapshot = None
+
+    def demarrer(self):
+        """Thread léger : instantané en attente, ou tout republier après invalider()"""
+        def boucle():
+            while not self._arret.wait(INTERVALLE_VERIFICATION):
+                with self._lock:
+                    if self._donnees is not None and self._snapshot_en_attente:
+                        self._publier()
+
+        self._arret.clear()
+        thread = threading.Thread(target=boucle, daemon=True)
+        thread.start()
+        return thread
+
+    def arreter(self):
+        self._arret.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mises_a_jour': self.nb_mises_a_jour,
+                'deltas': self.nb_deltas,
+                'compteurs': self.nb_compteurs,
+                'snapshots': self.nb_snapshots,
+                'snapshot_en_attente': self._snapshot_en_attente
+            }
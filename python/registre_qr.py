@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+REGISTRE DES QR CODES EN ATTENTE DE PAIEMENT
+Thread-safe, taille bornée, recherche O(1)
+Expiration O(log n) par tas d'échéances
+═══════════════════════════════════════════════════════════════
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+# ═══════════════════════════════════════════════════════════════
+# ENTRÉE
+# ═══════════════════════════════════════════════════════════════
+
+class EntreeQR:
+    """État d'un QR code en attente (enregistrement compact)"""
+
+    __slots__ = ('code', 'debut', 'echeance', 'places')
+
+    def __init__(self, code, debut, echeance, places=None):
+        self.code = code
+        self.debut = debut          # time.monotonic() à la génération
+        self.echeance = echeance    # time.monotonic() d'expiration
+        self.places = places        # places disponibles à la génération
+
+    def ecoule(self, maintenant=None):
+        return (maintenant if maintenant is not None else time.monotonic()) - self.debut
+
+    def restant(self, maintenant=None):
+        return self.echeance - (maintenant if maintenant is not None else time.monotonic())
+
+# ═══════════════════════════════════════════════════════════════
+# REGISTRE
+# ═══════════════════════════════════════════════════════════════
+
+class RegistreQR:
+    """
+    Codes en attente, partagés entre MQTT, surveillance paiement et affichage
+
+    Toutes les opérations prennent un verrou ; instantane() retourne
+    une copie, on peut donc l'itérer pendant que d'autres threads
+    retirent des codes. Le registre refuse les nouveaux codes au-delà
+    de taille_max (borne en cas de flood de l'ESP32).
+
+    Le tas peut contenir des entrées périmées (code payé ou regénéré) :
+    elles sont ignorées à la sortie et le tas est reconstruit quand il
+    devient trop grand par rapport au registre.
+    """
+
+    def __init__(self, ttl, taille_max=500):
+        self.ttl = ttl
+        self.taille_max = taille_max
+
+        self._lock = threading.Lock()
+        self._entrees = {}
+        self._tas = []               # (échéance, n°, entrée)
+        self._compteur = itertools.count()
+
+        self.nb_refuses = 0
+
+    def ajouter(self, code, places=None):
+        """
+        Returns:
+            EntreeQR, ou None si le registre est plein
+        """
+        with self._lock:
+            if code not in self._entrees and len(self._entrees) >= self.taille_max:
+                self.nb_refuses += 1
+                return None
+
+            debut = time.monotonic()
+            entree = EntreeQR(code, debut, debut + self.ttl, places)
+            self._entrees[code] = entree
+            heapq.heappush(self._tas, (entree.echeance, next(self._compteur), entree))
+            self._compacter()
+            return entree
+
+    def retirer(self, code):
+        """Retourne l'entrée retirée, ou None si absente"""
+        with self._lock:
+            return self._entrees.pop(code, None)
+
+    def obtenir(self, code):
+        with self._lock:
+            return self._entrees.get(code)
+
+    def plein(self):
+        with self._lock:
+            return len(self._entrees) >= self.taille_max
+
+    def sortir_expires(self, maintenant=None):
+        """Retirer et retourner les entrées dont l'échéance est passée"""
+        maintenant = maintenant if maintenant is not None else time.monotonic()
+        expires = []
+        with self._lock:
+            while self._tas and self._tas[0][0] <= maintenant:
+                _, _, entree = heapq.heappop(self._tas)
+                if self._entrees.get(entree.code) is entree:
+                    del self._entrees[entree.code]
+                    expires.append(entree)
+        return expires
+
+    def prochaine_echeance(self):
+        """Échéance la plus proche (peut être périmée), None si tas vide"""
+        with self._lock:
+            return self._tas[0][0] if self._tas else None
+
+    def _compacter(self):
+        """Reconstruire le tas s'il contient trop d'entrées périmées (avec self._lock)"""
+        if len(self._tas) > 2 * len(self._entrees) + 64:
+            self._tas = [(e.echeance, next(self._compteur), e) for e in self._entrees.values()]
+            heapq.heapify(self._tas)
+
+    def codes(self):
+        with self._lock:
+            return list(self._entrees)
+
+    def instantane(self):
+        """Copie des entrées (itérable sans verrou)"""
+        with self._lock:
+            return list(self._entrees.values())
+
+    def vider(self):
+        with self._lock:
+            self._entrees.clear()
+            self._tas.clear()
+
+    def __contains__(self, code):
+        with self._lock:
+            return code in self._entrees
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entrees)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'en_attente': len(self._entrees),
+                'taille_max': self.taille_max,
+                'refuses': self.nb_refuses,
+                'tas': len(self._tas)
+            }
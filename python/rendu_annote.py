@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+IMAGE ANNOTÉE RENDUE À LA DEMANDE
+Annotation + encodage JPEG seulement à la première requête
+après un changement d'état, résultat gardé en mémoire (ETag)
+═══════════════════════════════════════════════════════════════
+"""
+
+import hashlib
+import threading
+import time
+
+import cv2
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+QUALITE_JPEG = 85
+
+# ═══════════════════════════════════════════════════════════════
+# RENDU PARESSEUX
+# ═══════════════════════════════════════════════════════════════
+
+class RenduParesseux:
+    """
+    Dernière image analysée + ses résultats, annotée uniquement si demandée
+
+    mettre_a_jour() ne fait que garder les références (aucun dessin,
+    aucun encodage). obtenir() dessine et encode une seule fois par
+    état ; les requêtes suivantes reçoivent les mêmes octets. Sans
+    tableau de bord ouvert, une période calme ne coûte aucun encodage.
+
+    Args:
+        dessiner: dessiner(img, donnees) → nouvelle image BGR annotée
+    """
+
+    def __init__(self, dessiner, qualite=QUALITE_JPEG):
+        self.dessiner = dessiner
+        self.qualite = qualite
+
+        self._lock = threading.Lock()
+        self._img = None
+        self._donnees = None
+        self._jpeg = None
+        self._etag = None
+        self._date = None
+
+        # Statistiques
+        self.nb_mises_a_jour = 0
+        self.nb_rendus = 0
+        self.nb_hits = 0
+
+    def mettre_a_jour(self, img, donnees):
+        """Nouvel état (l'image n'est plus modifiée par l'appelant)"""
+        with self._lock:
+            self._img = img
+            self._donnees = donnees
+            self._jpeg = None
+            self._etag = None
+            self._date = time.time()
+            self.nb_mises_a_jour += 1
+
+    def obtenir(self):
+        """
+        Returns:
+            (jpeg bytes, etag, date de l'état) ou (None, None, None) sans image
+        """
+        with self._lock:
+            if self._jpeg is not None:
+                self.nb_hits += 1
+                return self._jpeg, self._etag, self._date
+            if self._img is None:
+                return None, None, None
+
+            # Rendu sous verrou : des requêtes simultanées attendent un seul encodage
+            annotee = self.dessiner(self._img, self._donnees)
+            ok, tampon = cv2.imencode('.jpg', annotee, [cv2.IMWRITE_JPEG_QUALITY, self.qualite])
+            if not ok:
+                return None, None, None
+
+            self._jpeg = tampon.tobytes()
+            self._etag = '"' + hashlib.sha1(self._jpeg).hexdigest()[:20] + '"'
+            self.nb_rendus += 1
+            return self._jpeg, self._etag, self._date
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mises_a_jour': self.nb_mises_a_jour,
+                'rendus': self.nb_rendus,
+                'hits': self.nb_hits,
+                'en_cache': self._jpeg is not None,
+                'taille': len(self._jpeg) if self._jpeg else 0
+            }
@@ -7,14 +7,19 @@ Version Finale - Tous les bugs corrigés
 """
 
 import cv2
-import numpy as np
 import json
 import urllib.request
-import os
 from datetime import datetime
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from serveur_web import ServeurHTTPConcurrent, GestionnaireWeb
+from flux_sse import DiffuseurSSE, delta_statut
+from publication_statut import PublicateurStatut
 import threading
 import time
+from detection_zones import CacheReference, DetecteurChangement, FiltreOccupation, FondAdaptatif
+from detecteurs import obtenir_detecteur, creer_detecteur
+from planificateur import PlanificateurAnalyse
+from rendu_annote import RenduParesseux
 
 try:
     import paho.mqtt.client as mqtt
@@ -34,9 +39,20 @@ ESP32_CAM_PORT = 81
 WEB_PORT = 8888
 
 # Paramètres détection
-SEUIL_OCCUPATION = 25.0            # % de différence pour détecter obstacle
+SEUIL_OCCUPATION = None            # None : seuil calibré du DETECTEUR (seuil_defaut), sinon seuil imposé
 MIN_CONTOUR_AREA = 800             # Aire minimale contour (pixels²)
+DETECTEUR = "diff_contours"        # Avec référence : diff, diff_contours, histogramme, modele (detecteurs.py)
+DETECTEUR_SANS_REFERENCE = "contours"  # Avant la première capture 'r' : aire des contours (son propre seuil)
 NB_PLACES = 8                      # Nombre total de places
+SEUIL_CHANGEMENT = 2.0             # Écart moyen (0-255) sur vignette : en dessous, scène inchangée
+AGE_MAX_ANALYSE = 60               # Secondes max sans analyse complète
+MARGE_HYSTERESIS = 0.2             # Fraction du seuil : occupée au-dessus de seuil × 1.2, libre sous seuil × 0.8
+CONFIRMATION_N = 3                 # Images concordantes requises pour changer l'état d'une place...
+CONFIRMATION_M = 5                 # ...parmi les M dernières
+DELAI_CONFIRMATION = 0.5           # Secondes entre deux images de confirmation (même cycle)
+FICHIER_FOND = "fond_parking.npy"  # Fond adaptatif (repris au redémarrage)
+CONSTANTE_TEMPS_FOND = 600         # Secondes : vitesse à laquelle le fond suit la lumière
+INTERVALLE_SAUVEGARDE_FOND = 300   # Secondes entre deux sauvegardes du fond
 
 # ═══════════════════════════════════════════════════════════════
 # ZONES DES 8 PLACES (À CALIBRER SELON VOTRE MAQUETTE)
@@ -70,9 +86,23 @@ PARKING_DATA = {
     'occupied': 0
 }
 
-image_reference = None
+fond_parking = FondAdaptatif(FICHIER_FOND, CONSTANTE_TEMPS_FOND)  # référence qui suit la lumière
+cache_reference = CacheReference()  # zones de référence en gris (recalculées si la référence change)
+moteur_detection = obtenir_detecteur(ESP32_CAM_IP, ESP32_CAM_PORT, DETECTEUR, cache=cache_reference)
+detecteur_sans_reference = creer_detecteur(DETECTEUR_SANS_REFERENCE, min_contour_area=MIN_CONTOUR_AREA,
+                                           cache=cache_reference)
+detecteur_changement = DetecteurChangement(SEUIL_CHANGEMENT, age_max=AGE_MAX_ANALYSE)
+seuil_occupation = moteur_detection.seuil(SEUIL_OCCUPATION)  # à l'échelle du détecteur choisi
+filtre_occupation = FiltreOccupation.autour(seuil_occupation, MARGE_HYSTERESIS,
+                                            CONFIRMATION_N, CONFIRMATION_M)  # états confirmés par place
+filtre_sans_reference = FiltreOccupation.autour(detecteur_sans_reference.seuil_defaut, MARGE_HYSTERESIS,
+                                                CONFIRMATION_N, CONFIRMATION_M)  # à l'échelle du repli sans référence
+flux_statut = DiffuseurSSE()  # tableaux de bord ouverts (/api/stream)
+publicateur_statut = PublicateurStatut(lambda *args: mqtt_publish(*args), "parking/status")  # deltas MQTT par place
+image_annotee = RenduParesseux(lambda img, donnees: annoter_image(img, donnees))  # JPEG annoté rendu à la demande
 mqtt_client = None
 mqtt_connected = False
+planificateur = PlanificateurAnalyse()  # une seule analyse à la fois (capteur + manuel)
 
 # ═══════════════════════════════════════════════════════════════
 # MQTT
@@ -85,6 +115,7 @@ def on_connect(client, userdata, flags, rc, properties=None):
         mqtt_connected = True
         client.subscribe("parking/sensor/vehicle")
         print("✓ Abonné à parking/sensor/vehicle")
+        publicateur_statut.invalider()
     else:
         print(f"✗ MQTT erreur code: {rc}")
 
@@ -96,17 +127,20 @@ def on_message(client, userdata, msg):
         if msg.topic == "parking/sensor/vehicle" and data.get("detected"):
             print(f"🚗 VÉHICULE DÉTECTÉ ! Distance: {data.get('distance_cm')}cm")
             print("⏳ Analyse automatique dans 1 seconde...")
-            time.sleep(1)  # Petite pause pour stabiliser
-            analyser_parking()
+            # Petite pause pour stabiliser, sans bloquer la boucle MQTT
+            analyser_parking("capteur", delai=1)
     except Exception as e:
         print(f"✗ Erreur message MQTT: {e}")
 
-def mqtt_publish(topic, data):
-    if mqtt_connected:
-        try:
-            mqtt_client.publish(topic, json.dumps(data), qos=1, retain=True)
-        except Exception as e:
-            print(f"✗ Erreur publication MQTT: {e}")
+def mqtt_publish(topic, data, qos=1, retain=True):
+    """Publication JSON, False si non envoyée"""
+    if not mqtt_connected:
+        return False
+    try:
+        return mqtt_client.publish(topic, json.dumps(data), qos=qos, retain=retain).rc == 0
+    except Exception as e:
+        print(f"✗ Erreur publication MQTT: {e}")
+        return False
 
 # ═══════════════════════════════════════════════════════════════
 # CAPTURE IMAGE ESP32-CAM
@@ -138,148 +172,54 @@ def capturer_image():
 # DÉTECTION OBSTACLES PAR OPENCV
 # ═══════════════════════════════════════════════════════════════
 
-def analyser_zone(img_current, zone_coords, nom_place):
+def analyser_places(img):
     """
-    Analyse une zone pour détecter un obstacle (voiture)
+    Analyser toutes les places en une seule passe plein cadre
     
-    Méthode 1 (avec référence) : Compare avec image parking vide
-    Méthode 2 (sans référence) : Détecte contours/obstacles
+    Méthode 1 (avec référence) : différence avec le parking vide (DETECTEUR)
+    Méthode 2 (sans référence) : aire des contours (DETECTEUR_SANS_REFERENCE)
     
     Returns:
-        dict avec 'occupe', 'pourcentage_diff', 'contours', 'aire'
+        dict {nom_place: {'occupe', 'pourcentage_diff', 'contours', 'aire', 'methode'}}
     """
-    global image_reference
-    
-    x, y, w, h = zone_coords
-    zone_current = img_current[y:y+h, x:x+w]
-    
-    resultat = {
-        'occupe': False,
-        'pourcentage_diff': 0.0,
-        'contours': 0,
-        'aire': 0,
-        'methode': 'Aucune'
-    }
-    
-    # ═════ MÉTHODE 1 : AVEC IMAGE DE RÉFÉRENCE ═════
-    if image_reference is not None:
-        try:
-            zone_ref = image_reference[y:y+h, x:x+w]
-            
-            # Conversion niveaux de gris
-            gray_current = cv2.cvtColor(zone_current, cv2.COLOR_BGR2GRAY)
-            gray_ref = cv2.cvtColor(zone_ref, cv2.COLOR_BGR2GRAY)
-            
-            # Différence absolue
-            diff = cv2.absdiff(gray_ref, gray_current)
-            
-            # Binarisation avec seuil adaptatif
-            _, thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)
-            
-            # Morphologie pour nettoyer le bruit
-            kernel = np.ones((5,5), np.uint8)
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-            
-            # Calculer pourcentage de pixels différents
-            pixels_diff = cv2.countNonZero(thresh)
-            total_pixels = w * h
-            pourcentage = (pixels_diff / total_pixels) * 100
-            
-            # Détection de contours
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Filtrer contours trop petits
-            contours_valides = [c for c in contours if cv2.contourArea(c) > MIN_CONTOUR_AREA]
-            
-            # Aire totale des obstacles détectés
-            aire_totale = sum(cv2.contourArea(c) for c in contours_valides)
-            
-            resultat = {
-                'occupe': pourcentage > SEUIL_OCCUPATION,
-                'pourcentage_diff': pourcentage,
-                'contours': len(contours_valides),
-                'aire': int(aire_totale),
-                'methode': 'Différence avec référence'
-            }
-            
-        except Exception as e:
-            print(f"✗ Erreur analyse {nom_place}: {e}")
-    
-    # ═════ MÉTHODE 2 : SANS RÉFÉRENCE (DÉTECTION CONTOURS) ═════
-    else:
-        try:
-            # Conversion niveaux de gris
-            gray = cv2.cvtColor(zone_current, cv2.COLOR_BGR2GRAY)
-            
-            # Flou pour réduire bruit
-            blur = cv2.GaussianBlur(gray, (5, 5), 0)
-            
-            # Détection de bords (Canny)
-            edges = cv2.Canny(blur, 50, 150)
-            
-            # Détection de contours
-            contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            # Filtrer contours
-            contours_valides = [c for c in contours if cv2.contourArea(c) > MIN_CONTOUR_AREA]
-            
-            # Aire totale
-            aire_totale = sum(cv2.contourArea(c) for c in contours_valides)
-            
-            # Heuristique : si aire > 20% de la zone = obstacle présent
-            seuil_aire = (w * h) * 0.20
-            
-            resultat = {
-                'occupe': aire_totale > seuil_aire,
-                'pourcentage_diff': (aire_totale / (w * h)) * 100,
-                'contours': len(contours_valides),
-                'aire': int(aire_totale),
-                'methode': 'Détection contours (sans référence)'
-            }
-            
-        except Exception as e:
-            print(f"✗ Erreur analyse {nom_place}: {e}")
-    
-    return resultat
+    reference = fond_parking.reference()
+    try:
+        if sans_reference():
+            return detecteur_sans_reference.analyser(img, None, zones_parking)
+        return moteur_detection.analyser(img, reference, zones_parking, seuil_occupation)
+    except Exception as e:
+        print(f"✗ Analyse zones: {e}")
+        return {nom: {'occupe': False, 'pourcentage_diff': 0.0, 'contours': 0, 'aire': 0, 'methode': 'Aucune'}
+                for nom in zones_parking}
+
+def sans_reference():
+    """Pas encore de parking vide capturé : repli DETECTEUR_SANS_REFERENCE"""
+    return fond_parking.reference() is None and moteur_detection.besoin_reference
+
+def filtre_actif():
+    """Filtre d'occupation à l'échelle du détecteur utilisé"""
+    return filtre_sans_reference if sans_reference() else filtre_occupation
 
 # ═══════════════════════════════════════════════════════════════
 # ANALYSE COMPLÈTE DU PARKING
 # ═══════════════════════════════════════════════════════════════
 
-def analyser_parking():
-    global PARKING_DATA
-    
-    # Capture image
-    img = capturer_image()
-    if img is None:
-        print("✗ Impossible d'analyser sans image")
-        return
-    
-    # Image pour annotation
+def analyser_parking(source='manuel', delai=0.0):
+    """
+    Demander une analyse (ne bloque jamais)
+
+    Les demandes reçues pendant une analyse en cours sont regroupées
+    en une seule analyse suivante ; le Future retourné donne PARKING_DATA.
+    """
+    return planificateur.demander(source, delai)
+
+def annoter_image(img, donnees):
+    """Dessiner les 8 places sur une copie de l'image (appelé par le rendu à la demande)"""
     img_result = img.copy()
-    resultats = {}
     
-    print("\n" + "="*80)
-    print("📊 ANALYSE DU PARKING (8 PLACES)")
-    print("="*80)
-    
-    # Analyser chaque place
-    for nom_place in sorted(zones_parking.keys()):
-        zone_coords = zones_parking[nom_place]
-        x, y, w, h = zone_coords
-        
-        # Analyser la zone
-        analyse = analyser_zone(img, zone_coords, nom_place)
-        
-        # Déterminer occupation
-        est_occupe = analyse['occupe']
-        
-        # Stocker résultat
-        resultats[nom_place] = {
-            'occupe': est_occupe,
-            'details': analyse
-        }
+    for nom_place, place in donnees['places'].items():
+        x, y, w, h = zones_parking[nom_place]
+        est_occupe = place['occupe']
         
         # Couleur selon statut
         couleur = (0, 0, 255) if est_occupe else (0, 255, 0)  # Rouge/Vert
@@ -297,21 +237,78 @@ def analyser_parking():
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, couleur, 2)
         
         # Pourcentage
-        cv2.putText(img_result, f"{analyse['pourcentage_diff']:.1f}%", 
+        cv2.putText(img_result, f"{place['details']['pourcentage_diff']:.1f}%", 
                    (x+10, y+h-10),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, couleur, 1)
+    
+    return img_result
+
+def executer_analyse():
+    """Un cycle d'analyse (exécuté uniquement par le thread du planificateur)"""
+    global PARKING_DATA
+    
+    # Capture image
+    img = capturer_image()
+    if img is None:
+        print("✗ Impossible d'analyser sans image")
+        return None
+    
+    # Avant la capture du parking vide, le repli a sa propre échelle de score
+    filtre = filtre_actif()
+    
+    # Scène identique à la dernière analyse : résultats, image annotée et statut inchangés
+    # (sauf si une place attend encore la confirmation de son nouvel état)
+    # La décision barrière est tout de même republiée (véhicule à l'entrée)
+    if PARKING_DATA['places'] and not filtre.en_attente() and not detecteur_changement.a_change(img):
+        publier_commande_barriere(PARKING_DATA['available'])
+        return PARKING_DATA
+    
+    resultats = {}
+    
+    print("\n" + "="*80)
+    print("📊 ANALYSE DU PARKING (8 PLACES)")
+    print("="*80)
+    
+    # Analyser chaque place
+    analyses = analyser_places(img)
+    
+    # Déterminer occupation : hystérésis + confirmation sur plusieurs images
+    # (images supplémentaires dans ce cycle : une seule décision barrière)
+    etats = filtre.filtrer(analyses)
+    for _ in range(CONFIRMATION_M - 1):
+        if not filtre.en_attente():
+            break
+        time.sleep(DELAI_CONFIRMATION)
+        img_suivante = capturer_image()
+        if img_suivante is None:
+            break
+        img = img_suivante
+        analyses = analyser_places(img)
+        etats = filtre.filtrer(analyses)
+    
+    for nom_place in sorted(zones_parking.keys()):
+        analyse = analyses[nom_place]
+        est_occupe = etats[nom_place]
+        
+        # Stocker résultat
+        resultats[nom_place] = {
+            'occupe': est_occupe,
+            'details': analyse
+        }
         
         # Affichage console
         statut_text = "OCCUPÉE ✗" if est_occupe else "LIBRE ✓  "
         print(f"   {nom_place}: {statut_text:12} | "
               f"Diff: {analyse['pourcentage_diff']:5.1f}% | "
-              f"Contours: {analyse['contours']:2} | "
-              f"Aire: {analyse['aire']:6} px²")
+              f"Contours: {analyse.get('contours', 0):2} | "
+              f"Aire: {analyse.get('aire', 0):6} px²"
+              f"{' | à confirmer' if analyse['occupe'] != est_occupe else ''}")
     
-    # Sauvegarder image annotée
-    cv2.imwrite("parking_annotated.jpg", img_result)
     print("="*80)
-    print(f"✓ Image annotée sauvegardée: parking_annotated.jpg")
+    
+    # Fond : seulement les places libres (confirmées et sur cette image)
+    fond_parking.mettre_a_jour(img, zones_parking, [nom for nom, p in resultats.items()
+                                                    if not p['occupe'] and not p['details']['occupe']])
     
     # Calculer statistiques
     disponibles = sum(1 for p in resultats.values() if not p['occupe'])
@@ -327,6 +324,7 @@ def analyser_parking():
     print("="*80)
     
     # Mise à jour données web
+    ancien = PARKING_DATA
     PARKING_DATA = {
         'places': resultats,
         'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
@@ -335,47 +333,61 @@ def analyser_parking():
         'occupied': occupees
     }
     
-    # Publication MQTT
+    # Annotation + JPEG seulement si le tableau de bord demande l'image
+    image_annotee.mettre_a_jour(img, PARKING_DATA)
+    
+    # Tableaux de bord : seulement les places qui ont changé d'état
+    delta = delta_statut(ancien, PARKING_DATA)
+    if delta is not None:
+        flux_statut.publier('delta', delta)
+    
+    # Publication MQTT : seulement les places qui ont basculé
+    publicateur_statut.publier_statut(PARKING_DATA)
+    
     if mqtt_connected:
-        # Statut parking
-        status_msg = {
-            'timestamp': PARKING_DATA['timestamp'],
-            'total': total,
-            'available': disponibles,
-            'occupied': occupees,
-            'places': {nom: p['occupe'] for nom, p in resultats.items()}
-        }
-        mqtt_publish("parking/status", status_msg)
-        print("✓ Statut publié sur MQTT: parking/status")
-        
-        # Commande barrière
-        if disponibles > 0:
-            print(f"\n🟢 BARRIÈRE: OUVERTURE ({disponibles} place(s) disponible(s))")
-            commande = {"action": "open", "available": disponibles}
-        else:
-            print("\n🔴 BARRIÈRE: RESTE FERMÉE (Parking complet)")
-            commande = {"action": "stay_closed"}
-        
-        mqtt_publish("parking/barrier/command", commande)
-        print("✓ Commande barrière publiée sur MQTT: parking/barrier/command")
+        if delta is not None:
+            print(f"✓ Statut publié sur MQTT: {len(delta['places'])} place(s) modifiée(s) sur parking/status/places")
+    
+    # Commande barrière
+    publier_commande_barriere(disponibles)
     
     print()
+    return PARKING_DATA
+
+def publier_commande_barriere(disponibles):
+    """Ouvrir la barrière s'il reste des places, sinon la laisser fermée"""
+    if not mqtt_connected:
+        return
+    
+    if disponibles > 0:
+        print(f"\n🟢 BARRIÈRE: OUVERTURE ({disponibles} place(s) disponible(s))")
+        commande = {"action": "open", "available": disponibles}
+    else:
+        print("\n🔴 BARRIÈRE: RESTE FERMÉE (Parking complet)")
+        commande = {"action": "stay_closed"}
+    
+    mqtt_publish("parking/barrier/command", commande)
+    print("✓ Commande barrière publiée sur MQTT: parking/barrier/command")
 
 # ═══════════════════════════════════════════════════════════════
 # SERVEUR WEB 3D
 # ═══════════════════════════════════════════════════════════════
 
-class WebHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        pass
-    
+class WebHandler(GestionnaireWeb):
     def do_GET(self):
-        if self.path == '/':
+        chemin = urlsplit(self.path).path  # ignorer ?query (ex. anti-cache)
+        if chemin == '/':
             self.send_html()
-        elif self.path == '/api/status':
+        elif chemin == '/api/status':
             self.send_json(PARKING_DATA)
-        elif self.path == '/image/parking_annotated.jpg':
-            self.send_image('parking_annotated.jpg')
+        elif chemin == '/api/stream':
+            self.ouvrir_flux(flux_statut, 'status', lambda: PARKING_DATA)
+        elif chemin == '/api/changement':
+            self.send_json(dict(detecteur_changement.stats(), detecteur=moteur_detection.nom, filtre=filtre_occupation.stats(), fond=fond_parking.stats(),
+                                rendu=image_annotee.stats(),
+                                flux=flux_statut.stats(), mqtt=publicateur_statut.stats()))
+        elif chemin == '/image/parking_annotated.jpg':
+            self.envoyer_rendu(image_annotee)
         else:
             self.send_error(404)
     
@@ -578,15 +590,40 @@ button:hover { transform: translateY(-2px); box-shadow: 0 8px 25px rgba(37,99,23
 
 <script>
 const API_URL = '/api/status';
-const REFRESH_INTERVAL = 3000; // 3 secondes
+const STREAM_URL = '/api/stream';
+const REFRESH_INTERVAL = 3000; // 3 secondes (navigateurs sans EventSource)
 
 let autoRefreshInterval;
+let stream = null;
+let etat = {places: {}};
 
 function startAutoRefresh() {
-    autoRefreshInterval = setInterval(refreshData, REFRESH_INTERVAL);
+    if (window.EventSource) {
+        // Statut poussé par le serveur : complet à la connexion, puis places modifiées
+        stream = new EventSource(STREAM_URL);
+        stream.addEventListener('status', e => {
+            etat = JSON.parse(e.data);
+            updateUI(etat);
+        });
+        stream.addEventListener('delta', e => {
+            const delta = JSON.parse(e.data);
+            Object.assign(etat.places, delta.places);
+            etat.timestamp = delta.timestamp;
+            etat.total = delta.total;
+            etat.available = delta.available;
+            etat.occupied = delta.occupied;
+            updateUI(etat);
+        });
+    } else {
+        autoRefreshInterval = setInterval(refreshData, REFRESH_INTERVAL);
+    }
 }
 
 function stopAutoRefresh() {
+    if (stream) {
+        stream.close();
+        stream = null;
+    }
     clearInterval(autoRefreshInterval);
 }
 
@@ -649,14 +686,28 @@ function updateUI(data) {
     });
     
     // Rafraîchir image
-    document.getElementById('camera-image').src = 
-        '/image/parking_annotated.jpg?' + Date.now();
+    refreshImage();
+}
+
+// Image : revalidation ETag (304 si inchangée), remplacée seulement si elle a changé
+let imageEtag = null;
+async function refreshImage() {
+    const response = await fetch('/image/parking_annotated.jpg', {cache: 'no-cache'});
+    if (!response.ok) return;
+    const etag = response.headers.get('ETag');
+    if (etag && etag === imageEtag) return;
+    imageEtag = etag;
+    
+    const img = document.getElementById('camera-image');
+    const ancienne = img.src;
+    img.src = URL.createObjectURL(await response.blob());
+    if (ancienne.startsWith('blob:')) URL.revokeObjectURL(ancienne);
 }
 
 // Initialisation
 window.addEventListener('load', () => {
-    refreshData();
     startAutoRefresh();
+    if (!window.EventSource) refreshData();
 });
 
 // Pause auto-refresh quand page cachée
@@ -670,31 +721,14 @@ document.addEventListener('visibilitychange', () => {
 </script>
 </body>
 </html>'''
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
+        self.envoyer(html, 'text/html; charset=utf-8')
     
     def send_json(self, data):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
-    
-    def send_image(self, filename):
-        if os.path.exists(filename):
-            self.send_response(200)
-            self.send_header('Content-type', 'image/jpeg')
-            self.end_headers()
-            with open(filename, 'rb') as f:
-                self.wfile.write(f.read())
-        else:
-            self.send_error(404)
+        self.envoyer_json(data, entetes={'Access-Control-Allow-Origin': '*'})
 
 def start_web():
     try:
-        server = HTTPServer(('0.0.0.0', WEB_PORT), WebHandler)
+        server = ServeurHTTPConcurrent(('0.0.0.0', WEB_PORT), WebHandler)
         print(f"✓ Serveur web: http://localhost:{WEB_PORT}")
         print(f"  Accès réseau: http://{MQTT_BROKER}:{WEB_PORT}")
         threading.Thread(target=server.serve_forever, daemon=True).start()
@@ -706,7 +740,7 @@ def start_web():
 # ═══════════════════════════════════════════════════════════════
 
 def main():
-    global mqtt_client, image_reference
+    global mqtt_client
     
     print("\n" + "╔" + "="*78 + "╗")
     print("║" + " "*78 + "║")
@@ -718,11 +752,24 @@ def main():
     print(f"\n📋 Configuration:")
     print(f"   MQTT Broker:  {MQTT_BROKER}:{MQTT_PORT}")
     print(f"   ESP32-CAM:    http://{ESP32_CAM_IP}:{ESP32_CAM_PORT}")
-    print(f"   Seuil détect: {SEUIL_OCCUPATION}%")
+    print(f"   Seuil détect: {seuil_occupation} ({moteur_detection.nom})")
     print(f"   Places:       {NB_PLACES}")
     print(f"   Web Server:   http://localhost:{WEB_PORT}")
     print("="*80)
     
+    # Référence : fond adaptatif sauvegardé, sinon parking vide capturé ('r')
+    origine = fond_parking.charger("reference_vide.jpg")
+    if origine == 'npy':
+        print(f"✓ Fond adaptatif repris: {FICHIER_FOND}")
+    elif origine == 'image':
+        print("✓ Référence chargée: reference_vide.jpg")
+    else:
+        print("⚠️  Pas de référence : commande 'r' avec le parking vide")
+    fond_parking.demarrer(INTERVALLE_SAUVEGARDE_FOND)
+    
+    # Planificateur d'analyse (avant MQTT : les événements capteur l'alimentent)
+    planificateur.demarrer(executer_analyse)
+    
     # Connexion MQTT
     if MQTT_OK:
         try:
@@ -736,7 +783,9 @@ def main():
     else:
         print("⚠️  MQTT désactivé (paho-mqtt non installé)")
     
-    # Démarrer serveur web
+    # Démarrer serveur web (+ flux temps réel des tableaux de bord)
+    flux_statut.demarrer()
+    publicateur_statut.demarrer()
     start_web()
     
     print("\n✓ Serveur démarré avec succès !")
@@ -766,7 +815,7 @@ def main():
                 break
             
             elif commande == 'a':
-                analyser_parking()
+                analyser_parking().result()
             
             elif commande == 'r':
                 print("\n📷 CAPTURE IMAGE DE RÉFÉRENCE")
@@ -775,8 +824,12 @@ def main():
                 if confirm in ['o', 'oui', 'y', 'yes']:
                     img = capturer_image()
                     if img is not None:
-                        image_reference = img.copy()
+                        fond_parking.initialiser(img)
+                        cache_reference.invalider()
+                        detecteur_changement.invalider()
+                        filtre_occupation.invalider()
                         cv2.imwrite("reference_vide.jpg", img)
+                        fond_parking.sauvegarder()
                         print("✓ Image de référence sauvegardée: reference_vide.jpg")
                 else:
                     print("   Annulé")
@@ -788,7 +841,8 @@ def main():
                 try:
                     valeur = float(input("   Nouveau seuil (0-100): "))
                     if 0 <= valeur <= 100:
-                        globals()['SEUIL_OCCUPATION'] = valeur
+                        globals()['seuil_occupation'] = valeur
+                        filtre_occupation.centrer(valeur, MARGE_HYSTERESIS)
                         print(f"✓ Seuil changé: {valeur}%")
                     else:
                         print("✗ Le seuil doit être entre 0 et 100")
@@ -819,6 +873,10 @@ def main():
             print(f"\n✗ Erreur: {e}")
     
     # Arrêt propre
+    planificateur.arreter()
+    flux_statut.arreter()
+    publicateur_statut.arreter()
+    fond_parking.arreter()
     if mqtt_client and mqtt_connected:
         mqtt_client.loop_stop()
         mqtt_client.disconnect()
@@ -9,15 +9,21 @@ Barrière automatique
 """
 
 import cv2
-import numpy as np
 import json
-import urllib.request
-import os
 from datetime import datetime
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from serveur_web import ServeurHTTPConcurrent, GestionnaireWeb
+from flux_sse import DiffuseurSSE, delta_statut
+from publication_statut import PublicateurStatut
 import threading
 import time
 import socket
+from camera_esp32 import obtenir_camera, fermer_cameras, decoder_jpeg
+from detection_zones import CacheReference, DetecteurChangement, FiltreOccupation, FondAdaptatif
+from rendu_annote import RenduParesseux
+from detecteurs import obtenir_detecteur
+from pipeline_analyse import PipelineAnalyse
+from planificateur import PlanificateurAnalyse
 
 try:
     import paho.mqtt.client as mqtt
@@ -48,10 +54,22 @@ ESP32_CAM_PORT = 81
 WEB_PORT = 8888
 
 # Paramètres détection
-SEUIL_OCCUPATION = 25.0
-MIN_CONTOUR_AREA = 800
+SEUIL_OCCUPATION = None     # None : seuil calibré du DETECTEUR (seuil_defaut), sinon seuil imposé
+DETECTEUR = "diff_contours" # diff, diff_contours, contours, histogramme, modele (detecteurs.py)
 NB_PLACES = 8
-INTERVALLE_ANALYSE = 2  # secondes
+INTERVALLE_ANALYSE = 30     # secondes, au repos (aucun véhicule signalé)
+INTERVALLE_RAFALE = 0.5     # secondes, juste après un événement véhicule
+DUREE_RAFALE = 10           # secondes de cadence rapide par événement
+ECHANTILLON_DEBUG_CAPTURE = 0  # copie disque parking_current.jpg : 1 capture sur N (0 = jamais)
+SEUIL_CHANGEMENT = 2.0      # écart moyen (0-255) sur vignette 64x48 : en dessous, scène inchangée
+AGE_MAX_ANALYSE = 60        # secondes max sans analyse complète, même scène inchangée
+MARGE_HYSTERESIS = 0.2      # fraction du seuil : occupée au-dessus de seuil × 1.2, libre sous seuil × 0.8
+CONFIRMATION_N = 3          # images concordantes requises pour changer l'état d'une place...
+CONFIRMATION_M = 5          # ...parmi les M dernières
+DELAI_CONFIRMATION = 1.0    # secondes entre deux images tant qu'une place attend confirmation
+FICHIER_FOND = "fond_parking.npy"  # fond adaptatif (repris au redémarrage)
+CONSTANTE_TEMPS_FOND = 600  # secondes : vitesse à laquelle le fond suit la lumière
+INTERVALLE_SAUVEGARDE_FOND = 300  # secondes entre deux sauvegardes du fond
 
 # ═══════════════════════════════════════════════════════════════
 # ZONES PARKING
@@ -83,11 +101,22 @@ PARKING_DATA = {
     'occupied': 0
 }
 
-image_reference = None
+fond_parking = FondAdaptatif(FICHIER_FOND, CONSTANTE_TEMPS_FOND)  # référence qui suit la lumière
+cache_reference = CacheReference()  # zones de référence en gris (recalculées si la référence change)
+moteur_detection = obtenir_detecteur(ESP32_CAM_IP, ESP32_CAM_PORT, DETECTEUR, cache=cache_reference)
 mqtt_client = None
 mqtt_connected = False
-analyse_en_cours = False
 doit_continuer = True
+detecteur_changement = DetecteurChangement(SEUIL_CHANGEMENT, age_max=AGE_MAX_ANALYSE)
+seuil_occupation = moteur_detection.seuil(SEUIL_OCCUPATION)  # à l'échelle du détecteur choisi
+filtre_occupation = FiltreOccupation.autour(seuil_occupation, MARGE_HYSTERESIS,
+                                            CONFIRMATION_N, CONFIRMATION_M)  # états confirmés par place
+derniere_publication = None  # PARKING_DATA déjà publié
+flux_statut = DiffuseurSSE()  # tableaux de bord ouverts (/api/stream)
+publicateur_statut = PublicateurStatut(lambda *args: mqtt_publish(*args), "parking/status")  # deltas MQTT par place
+image_annotee = RenduParesseux(lambda img, donnees: annoter_image(img, donnees))  # JPEG annoté rendu à la demande
+planificateur = PlanificateurAnalyse(INTERVALLE_ANALYSE, INTERVALLE_RAFALE, DUREE_RAFALE)  # repos / rafale + manuel
+pipeline = None
 
 # ═══════════════════════════════════════════════════════════════
 # MQTT
@@ -98,122 +127,137 @@ def on_connect(client, userdata, flags, rc, properties=None):
     if rc == 0:
         print("✓ MQTT Connecté")
         mqtt_connected = True
+        client.subscribe("parking/sensor/vehicle")
+        print("✓ Abonné à parking/sensor/vehicle")
+        publicateur_statut.invalider()
     else:
         print(f"✗ MQTT erreur: {rc}")
 
-def mqtt_publish(topic, data):
-    if mqtt_connected:
-        try:
-            mqtt_client.publish(topic, json.dumps(data), qos=1, retain=True)
-        except Exception as e:
-            print(f"✗ MQTT: {e}")
+def on_message(client, userdata, msg):
+    try:
+        # Le capteur publie en retained : ignorer l'ancien état rejoué à la connexion
+        if msg.topic == "parking/sensor/vehicle" and not msg.retain:
+            data = json.loads(msg.payload.decode())
+            etat = "détecté" if data.get("detected") else "parti"
+            print(f"\n🚗 Véhicule {etat} → analyse toutes les {INTERVALLE_RAFALE}s pendant {DUREE_RAFALE}s")
+            planificateur.rafale("capteur")
+    except Exception as e:
+        print(f"✗ MQTT: {e}")
+
+def mqtt_publish(topic, data, qos=1, retain=True):
+    """Publication JSON, False si non envoyée"""
+    if not mqtt_connected:
+        return False
+    try:
+        return mqtt_client.publish(topic, json.dumps(data), qos=qos, retain=retain).rc == 0
+    except Exception as e:
+        print(f"✗ MQTT: {e}")
+        return False
 
 # ═══════════════════════════════════════════════════════════════
 # CAPTURE IMAGE
 # ═══════════════════════════════════════════════════════════════
 
+def capturer_jpeg():
+    camera = obtenir_camera(ESP32_CAM_IP, ESP32_CAM_PORT)
+    jpeg = camera.capturer("parking_current.jpg", ECHANTILLON_DEBUG_CAPTURE)
+    if jpeg is None and camera.derniere_erreur:
+        print(f"✗ Capture: {camera.derniere_erreur}")
+    return jpeg
+
 def capturer_image():
-    url = f"http://{ESP32_CAM_IP}:{ESP32_CAM_PORT}/capture"
-    try:
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'SmartParking/1.0')
-        response = urllib.request.urlopen(req, timeout=5)
-        
-        with open("parking_current.jpg", "wb") as f:
-            f.write(response.read())
-        
-        img = cv2.imread("parking_current.jpg")
-        if img is None:
-            return None
-        
-        return img
-        
-    except Exception as e:
-        print(f"✗ Capture: {e}")
+    camera = obtenir_camera(ESP32_CAM_IP, ESP32_CAM_PORT)
+    img = camera.capturer_frame("parking_current.jpg", ECHANTILLON_DEBUG_CAPTURE)
+    if img is None:
+        if camera.derniere_erreur:
+            print(f"✗ Capture: {camera.derniere_erreur}")
         return None
+    
+    return img
 
 # ═══════════════════════════════════════════════════════════════
 # DÉTECTION OBSTACLES
 # ═══════════════════════════════════════════════════════════════
 
-def analyser_zone(img_current, zone_coords, nom_place):
-    global image_reference
-    
-    x, y, w, h = zone_coords
-    zone_current = img_current[y:y+h, x:x+w]
+def analyser_zones(img):
+    """
+    Analyser toutes les places en une seule passe plein cadre
     
-    resultat = {
-        'occupe': False,
-        'pourcentage_diff': 0.0,
-        'contours': 0,
-        'aire': 0
-    }
-    
-    if image_reference is not None:
-        try:
-            zone_ref = image_reference[y:y+h, x:x+w]
-            
-            gray_current = cv2.cvtColor(zone_current, cv2.COLOR_BGR2GRAY)
-            gray_ref = cv2.cvtColor(zone_ref, cv2.COLOR_BGR2GRAY)
-            
-            diff = cv2.absdiff(gray_ref, gray_current)
-            _, thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)
-            
-            kernel = np.ones((5,5), np.uint8)
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-            
-            pixels_diff = cv2.countNonZero(thresh)
-            total_pixels = w * h
-            pourcentage = (pixels_diff / total_pixels) * 100
-            
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            contours_valides = [c for c in contours if cv2.contourArea(c) > MIN_CONTOUR_AREA]
-            aire_totale = sum(cv2.contourArea(c) for c in contours_valides)
-            
-            resultat = {
-                'occupe': pourcentage > SEUIL_OCCUPATION,
-                'pourcentage_diff': pourcentage,
-                'contours': len(contours_valides),
-                'aire': int(aire_totale)
-            }
-            
-        except Exception as e:
-            print(f"✗ Zone {nom_place}: {e}")
-    
-    return resultat
+    Returns:
+        dict {nom_place: {'occupe', 'pourcentage_diff', 'contours', 'aire'}}
+    """
+    try:
+        return moteur_detection.analyser(img, fond_parking.reference(), zones_parking, seuil_occupation)
+    except Exception as e:
+        print(f"✗ Analyse zones: {e}")
+        return {nom: {'occupe': False, 'pourcentage_diff': 0.0, 'contours': 0, 'aire': 0}
+                for nom in zones_parking}
 
 # ═══════════════════════════════════════════════════════════════
 # ANALYSE COMPLÈTE
 # ═══════════════════════════════════════════════════════════════
 
-def analyser_parking():
-    global PARKING_DATA, analyse_en_cours
-    
-    if analyse_en_cours:
-        return
-    
-    analyse_en_cours = True
-    
-    img = capturer_image()
+def decoder_image(jpeg):
+    img = decoder_jpeg(jpeg)
     if img is None:
-        analyse_en_cours = False
-        return
+        print("✗ Capture: JPEG invalide")
+    return img
+
+def analyser_image(img):
+    """Analyser une image décodée et mettre à jour PARKING_DATA"""
+    global PARKING_DATA
+    
+    # Scène identique à la dernière analyse : mêmes résultats (même objet),
+    # sauf si une place attend encore la confirmation de son nouvel état
+    if PARKING_DATA['places'] and not filtre_occupation.en_attente() and not detecteur_changement.a_change(img):
+        return img, PARKING_DATA
     
-    img_result = img.copy()
     resultats = {}
     
+    analyses = analyser_zones(img)
+    etats = filtre_occupation.filtrer(analyses)  # hystérésis + N sur M (details garde l'avis brut)
+    
     for nom_place in sorted(zones_parking.keys()):
-        zone_coords = zones_parking[nom_place]
-        x, y, w, h = zone_coords
-        
-        analyse = analyser_zone(img, zone_coords, nom_place)
-        est_occupe = analyse['occupe']
-        
+        analyse = analyses[nom_place]
         resultats[nom_place] = {
-            'occupe': est_occupe,
+            'occupe': etats[nom_place],
             'details': analyse
         }
+    
+    disponibles = sum(1 for p in resultats.values() if not p['occupe'])
+    total = len(resultats)
+    occupees = total - disponibles
+    
+    PARKING_DATA = {
+        'places': resultats,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'total': total,
+        'available': disponibles,
+        'occupied': occupees
+    }
+    
+    latence = obtenir_camera(ESP32_CAM_IP, ESP32_CAM_PORT).derniere_latence_ms or 0
+    print(f"\r[{PARKING_DATA['timestamp']}] Libres: {disponibles}/{total} | Cam: {latence:.0f}ms ", end="", flush=True)
+    
+    # Fond : seulement les places libres (confirmées et sur cette image)
+    fond_parking.mettre_a_jour(img, zones_parking, [nom for nom, p in resultats.items()
+                                                    if not p['occupe'] and not p['details']['occupe']])
+    
+    # Confirmation en cours : image suivante sans attendre l'intervalle de repos
+    if filtre_occupation.en_attente():
+        analyser_parking("confirmation", DELAI_CONFIRMATION)
+    
+    return img, PARKING_DATA
+
+def annoter_image(img, donnees):
+    """Dessiner les places sur une copie de l'image (appelé par le rendu à la demande)"""
+    resultats = donnees['places']
+    
+    img_result = img.copy()
+    
+    for nom_place, place in resultats.items():
+        x, y, w, h = zones_parking[nom_place]
+        est_occupe = place['occupe']
         
         couleur = (0, 0, 255) if est_occupe else (0, 255, 0)
         cv2.rectangle(img_result, (x, y), (x+w, y+h), couleur, 3)
@@ -225,36 +269,20 @@ def analyser_parking():
         cv2.putText(img_result, texte_statut, 
                    (x+10, y+50), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, couleur, 2)
-        cv2.putText(img_result, f"{analyse['pourcentage_diff']:.1f}%", 
+        cv2.putText(img_result, f"{place['details']['pourcentage_diff']:.1f}%", 
                    (x+10, y+h-10),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, couleur, 1)
     
-    cv2.imwrite("parking_annotated.jpg", img_result)
-    
-    disponibles = sum(1 for p in resultats.values() if not p['occupe'])
-    total = len(resultats)
-    occupees = total - disponibles
-    
-    PARKING_DATA = {
-        'places': resultats,
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'total': total,
-        'available': disponibles,
-        'occupied': occupees
-    }
-    
-    print(f"\r[{PARKING_DATA['timestamp']}] Libres: {disponibles}/{total} ", end="", flush=True)
+    return img_result
+
+def publier_resultats(analyse):
+    """Mémoriser l'image pour le rendu à la demande et publier le statut MQTT"""
+    global derniere_publication
+    img, donnees = analyse
     
+    # Commande barrière à chaque analyse, même si la scène n'a pas changé
     if mqtt_connected:
-        status_msg = {
-            'timestamp': PARKING_DATA['timestamp'],
-            'total': total,
-            'available': disponibles,
-            'occupied': occupees,
-            'places': {nom: p['occupe'] for nom, p in resultats.items()}
-        }
-        mqtt_publish("parking/status", status_msg)
-        
+        disponibles = donnees['available']
         if disponibles > 0:
             mqtt_publish("parking/barrier/command", {
                 "action": "open",
@@ -267,37 +295,75 @@ def analyser_parking():
                 "message": "PARKING COMPLET"
             })
     
-    analyse_en_cours = False
+    # Scène inchangée : image annotée et statut déjà à jour
+    if donnees is derniere_publication:
+        return
+    delta = delta_statut(derniere_publication, donnees)
+    derniere_publication = donnees
+    
+    # Annotation + JPEG seulement si le tableau de bord demande l'image
+    image_annotee.mettre_a_jour(img, donnees)
+    
+    # Tableaux de bord : seulement les places qui ont changé d'état
+    if delta is not None:
+        flux_statut.publier('delta', delta)
+    
+    # MQTT : seulement les places qui ont basculé (+ compteurs, statut complet rare)
+    publicateur_statut.publier_statut(donnees)
+
+def analyser_parking(source='manuel', delai=0.0):
+    """
+    Demander une analyse au planificateur (ne bloque jamais)
+
+    Les demandes simultanées partagent le même cycle ; appeler
+    .result() sur le Future retourné pour attendre (img, PARKING_DATA).
+    """
+    return planificateur.demander(source, delai)
 
 # ═══════════════════════════════════════════════════════════════
-# THREAD AUTOMATIQUE
+# PIPELINE AUTOMATIQUE
 # ═══════════════════════════════════════════════════════════════
 
-def thread_analyse_automatique():
-    global doit_continuer
+def demarrer_pipeline_analyse():
+    """
+    Capture à chaque cycle du planificateur : toutes les
+    INTERVALLE_ANALYSE secondes au repos, toutes les INTERVALLE_RAFALE
+    secondes pendant DUREE_RAFALE après un événement véhicule ;
+    décodage, analyse et publication tournent chacun dans leur thread,
+    reliés par des files d'un élément (la donnée la plus récente gagne).
+    """
+    global pipeline
     
-    print(f"\n🔄 Analyse auto {INTERVALLE_ANALYSE}s")
+    print(f"\n🔄 Analyse auto {INTERVALLE_ANALYSE}s (rafale {INTERVALLE_RAFALE}s après un véhicule)")
     print("   Ctrl+C pour arrêter\n")
     
-    while doit_continuer:
-        analyser_parking()
-        time.sleep(INTERVALLE_ANALYSE)
+    pipeline = PipelineAnalyse("capture", capturer_jpeg, planificateur)
+    pipeline.ajouter_etape("decodage", decoder_image)
+    pipeline.ajouter_etape("analyse", analyser_image, resultat=True)
+    pipeline.ajouter_etape("publication", publier_resultats)
+    pipeline.demarrer()
 
 # ═══════════════════════════════════════════════════════════════
 # WEB SERVER
 # ═══════════════════════════════════════════════════════════════
 
-class WebHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        pass
-    
+class WebHandler(GestionnaireWeb):
     def do_GET(self):
-        if self.path == '/':
+        chemin = urlsplit(self.path).path  # ignorer ?query (ex. anti-cache)
+        if chemin == '/':
             self.send_html()
-        elif self.path == '/api/status':
+        elif chemin == '/api/status':
             self.send_json(PARKING_DATA)
-        elif self.path == '/image/parking_annotated.jpg':
-            self.send_image('parking_annotated.jpg')
+        elif chemin == '/api/stream':
+            self.ouvrir_flux(flux_statut, 'status', lambda: PARKING_DATA)
+        elif chemin == '/api/pipeline':
+            self.send_json(dict(pipeline.stats() if pipeline else {}, changement=detecteur_changement.stats(),
+                                detecteur=moteur_detection.nom,
+                                filtre=filtre_occupation.stats(), fond=fond_parking.stats(),
+                                rendu=image_annotee.stats(), flux=flux_statut.stats(),
+                                mqtt=publicateur_statut.stats()))
+        elif chemin == '/image/parking_annotated.jpg':
+            self.envoyer_rendu(image_annotee)
         else:
             self.send_error(404)
     
@@ -377,10 +443,9 @@ MàJ: <span id="timestamp">...</span>
 </div>
 </div>
 <script>
-setInterval(async()=>{
-try{
-const r=await fetch('/api/status');
-const d=await r.json();
+// Statut poussé par le serveur (SSE) : complet à la connexion, puis places modifiées
+let etat={places:{}};
+function afficher(d){
 document.getElementById('total').textContent=d.total||8;
 document.getElementById('libres').textContent=d.available||0;
 document.getElementById('occupees').textContent=d.occupied||0;
@@ -398,37 +463,49 @@ div.className='parking-spot '+(o?'occupe':'libre');
 div.innerHTML=`<div class="spot-name">${nom}</div><div class="spot-icon">${o?'🚗':'✅'}</div><div class="spot-status">${o?'OCCUPÉE':'LIBRE'}</div><div class="spot-details">Diff: ${(dt.pourcentage_diff||0).toFixed(1)}%<br>Contours: ${dt.contours||0}</div>`;
 g.appendChild(div);
 });
-document.getElementById('camera-image').src='/image/parking_annotated.jpg?'+Date.now();
-}catch(e){}
-},2000);
+rafraichirImage().catch(()=>{});
+}
+function fusionner(d){
+Object.assign(etat.places,d.places);
+etat.timestamp=d.timestamp;etat.total=d.total;etat.available=d.available;etat.occupied=d.occupied;
+afficher(etat);
+}
+let flux=null;
+function ouvrirFlux(){
+flux=new EventSource('/api/stream');
+flux.addEventListener('status',e=>{etat=JSON.parse(e.data);afficher(etat);});
+flux.addEventListener('delta',e=>fusionner(JSON.parse(e.data)));
+}
+if(window.EventSource){
+ouvrirFlux();
+document.addEventListener('visibilitychange',()=>{if(document.hidden){flux.close();}else{ouvrirFlux();}});
+}else{
+setInterval(async()=>{try{const r=await fetch('/api/status');afficher(await r.json());}catch(e){}},2000);
+}
+// Image : revalidation ETag (304 si inchangée), remplacée seulement si elle a changé
+let etagImage=null;
+async function rafraichirImage(){
+const r=await fetch('/image/parking_annotated.jpg',{cache:'no-cache'});
+if(!r.ok)return;
+const e=r.headers.get('ETag');
+if(e&&e===etagImage)return;
+etagImage=e;
+const img=document.getElementById('camera-image');
+const ancienne=img.src;
+img.src=URL.createObjectURL(await r.blob());
+if(ancienne.startsWith('blob:'))URL.revokeObjectURL(ancienne);
+}
 </script>
 </body>
 </html>'''
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
+        self.envoyer(html, 'text/html; charset=utf-8')
     
     def send_json(self, data):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps(data).encode('utf-8'))
-    
-    def send_image(self, filename):
-        if os.path.exists(filename):
-            self.send_response(200)
-            self.send_header('Content-type', 'image/jpeg')
-            self.end_headers()
-            with open(filename, 'rb') as f:
-                self.wfile.write(f.read())
-        else:
-            self.send_error(404)
+        self.envoyer_json(data, entetes={'Access-Control-Allow-Origin': '*'})
 
 def start_web():
     try:
-        server = HTTPServer(('0.0.0.0', WEB_PORT), WebHandler)
+        server = ServeurHTTPConcurrent(('0.0.0.0', WEB_PORT), WebHandler)
         print(f"✓ Web: http://localhost:{WEB_PORT}")
         threading.Thread(target=server.serve_forever, daemon=True).start()
     except Exception as e:
@@ -439,7 +516,7 @@ def start_web():
 # ═══════════════════════════════════════════════════════════════
 
 def main():
-    global mqtt_client, image_reference
+    global mqtt_client
     
     print("\n" + "╔" + "="*68 + "╗")
     print("║" + " "*68 + "║")
@@ -451,15 +528,15 @@ def main():
     if not charger_zones():
         return
     
-    if os.path.exists("reference_vide.jpg"):
-        image_reference = cv2.imread("reference_vide.jpg")
-        if image_reference is not None:
-            print("✓ Référence chargée")
-        else:
-            print("⚠️  Référence invalide")
+    origine = fond_parking.charger("reference_vide.jpg")
+    if origine == 'npy':
+        print(f"✓ Fond adaptatif repris: {FICHIER_FOND}")
+    elif origine == 'image':
+        print("✓ Référence chargée")
     else:
         print("⚠️  Pas de référence")
         print("   Créez reference_vide.jpg (parking vide)")
+    fond_parking.demarrer(INTERVALLE_SAUVEGARDE_FOND)
     
     print(f"\n📋 Config:")
     print(f"   IP:        {MQTT_BROKER}")
@@ -472,17 +549,19 @@ def main():
         try:
             mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
             mqtt_client.on_connect = on_connect
+            mqtt_client.on_message = on_message
             mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
             mqtt_client.loop_start()
         except Exception as e:
             print(f"⚠️  MQTT: {e}")
     
+    flux_statut.demarrer()
+    publicateur_statut.demarrer()
     start_web()
     
     print("\n✓ Serveur démarré !")
     
-    thread_analyse = threading.Thread(target=thread_analyse_automatique, daemon=True)
-    thread_analyse.start()
+    demarrer_pipeline_analyse()
     
     try:
         while True:
@@ -490,6 +569,11 @@ def main():
     except KeyboardInterrupt:
         print("\n\n⏹  Arrêt...")
         doit_continuer = False
+        pipeline.arreter()
+        flux_statut.arreter()
+        publicateur_statut.arreter()
+        fond_parking.arreter()
+        fermer_cameras()
         if mqtt_client and mqtt_connected:
             mqtt_client.loop_stop()
             mqtt_client.disconnect()
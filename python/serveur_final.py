@@ -1,11 +1,11 @@
 import cv2
-import numpy as np
 import json
 import urllib.request
 import os
 from datetime import datetime
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import threading
+from detecteurs import creer_detecteur
 
 try:
     import paho.mqtt.client as mqtt
@@ -91,47 +91,14 @@ def capturer_image():
 # DÉTECTION
 # ═══════════════════════════════════════════════════════════════
 
-def analyser_zone(img_current, zone, nom):
-    global image_reference
-    x, y, w, h = zone
-    zone_current = img_current[y:y+h, x:x+w]
-    resultat = {'occupe': False, 'pourcentage_diff': 0.0, 'contours': 0, 'aire': 0}
-    
+detecteur_reference = creer_detecteur("diff_contours", min_contour_area=MIN_CONTOUR_AREA)
+detecteur_sans_reference = creer_detecteur("contours", min_contour_area=MIN_CONTOUR_AREA)
+
+def analyser_zones(img_current):
+    """Toutes les places : différence si référence, sinon aire des contours Canny (> 20 % de la zone)"""
     if image_reference is not None:
-        zone_ref = image_reference[y:y+h, x:x+w]
-        gray_current = cv2.cvtColor(zone_current, cv2.COLOR_BGR2GRAY)
-        gray_ref = cv2.cvtColor(zone_ref, cv2.COLOR_BGR2GRAY)
-        diff = cv2.absdiff(gray_ref, gray_current)
-        _, thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)
-        kernel = np.ones((5,5), np.uint8)
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-        thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-        pixels_diff = cv2.countNonZero(thresh)
-        pourcentage = (pixels_diff / (w * h)) * 100
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours_valides = [c for c in contours if cv2.contourArea(c) > MIN_CONTOUR_AREA]
-        aire = sum(cv2.contourArea(c) for c in contours_valides)
-        resultat = {
-            'occupe': pourcentage > SEUIL_OCCUPATION,
-            'pourcentage_diff': pourcentage,
-            'contours': len(contours_valides),
-            'aire': int(aire)
-        }
-    else:
-        gray = cv2.cvtColor(zone_current, cv2.COLOR_BGR2GRAY)
-        blur = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blur, 50, 150)
-        contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours_valides = [c for c in contours if cv2.contourArea(c) > MIN_CONTOUR_AREA]
-        aire = sum(cv2.contourArea(c) for c in contours_valides)
-        seuil_aire = (w * h) * 0.20
-        resultat = {
-            'occupe': aire > seuil_aire,
-            'pourcentage_diff': (aire / (w * h)) * 100,
-            'contours': len(contours_valides),
-            'aire': int(aire)
-        }
-    return resultat
+        return detecteur_reference.analyser(img_current, image_reference, zones_parking, SEUIL_OCCUPATION)
+    return detecteur_sans_reference.analyser(img_current, None, zones_parking)
 
 def analyser_parking():
     global PARKING_DATA
@@ -146,9 +113,11 @@ def analyser_parking():
     print("📊 ANALYSE PARKING")
     print("="*70)
     
+    analyses = analyser_zones(img)
+    
     for nom, zone in zones_parking.items():
         x, y, w, h = zone
-        analyse = analyser_zone(img, zone, nom)
+        analyse = analyses[nom]
         occupe = analyse['occupe']
         resultats[nom] = {'occupe': occupe, 'details': analyse}
         
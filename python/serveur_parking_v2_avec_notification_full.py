@@ -8,17 +8,30 @@ Version: 2.0 - Ajout notification parking complet vers ESP32/Mega
 """
 
 import cv2
-import numpy as np
 import json
-import urllib.request
 import os
+import hmac
 from datetime import datetime, timedelta
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from serveur_web import ServeurHTTPConcurrent, GestionnaireWeb
 import threading
 import time
 import socket
 import paho.mqtt.client as mqtt
 from supabase import create_client, Client
+from camera_esp32 import obtenir_camera, fermer_cameras, decoder_jpeg
+from detection_zones import CacheReference, DetecteurChangement, FiltreOccupation, FondAdaptatif
+from rendu_annote import RenduParesseux
+from detecteurs import obtenir_detecteur
+from pipeline_analyse import PipelineAnalyse
+from planificateur import PlanificateurAnalyse
+from dispatch_mqtt import DispatcheurMQTT
+from cache_rfid import CacheCartesRFID
+from journal_acces import JournalAcces
+from surveillance_paiement import SurveillantPaiements
+from registre_qr import RegistreQR
+from miroir_local import MiroirLocal
+from publication_statut import PublicateurStatut
 
 # ═══════════════════════════════════════════════════════════════
 # CONFIGURATION SUPABASE
@@ -43,8 +56,14 @@ TOPIC_STATUS = f"{UNIQUE_ID}/parking/status"
 TOPIC_BARRIER = f"{UNIQUE_ID}/parking/barrier/command"
 TOPIC_RFID_RESPONSE = f"{UNIQUE_ID}/parking/rfid_response"
 TOPIC_QR_RESPONSE = f"{UNIQUE_ID}/parking/qr_response"
+TOPIC_VEHICLE = f"{UNIQUE_ID}/parking/sensor/vehicle"  # capteur ultrason (esp32_publisher)
 TOPIC_PARKING_FULL = f"{UNIQUE_ID}/parking/full_notification"  # ← NOUVEAU TOPIC
 
+# Traitement des messages hors de la boucle réseau paho
+MQTT_WORKERS = 8            # threads de traitement (requêtes Supabase)
+LIMITE_RFID = 4             # scans RFID traités en parallèle (plusieurs bornes)
+LIMITE_QR = 4               # messages QR traités en parallèle
+
 # ═══════════════════════════════════════════════════════════════
 # CONFIGURATION DÉTECTION
 # ═══════════════════════════════════════════════════════════════
@@ -53,15 +72,37 @@ ESP32_CAM_IP = "192.168.7.20"
 ESP32_CAM_PORT = 81
 WEB_PORT = 8888
 
-SEUIL_OCCUPATION = 25.0
+SEUIL_OCCUPATION = None     # None : seuil calibré du DETECTEUR (seuil_defaut), sinon seuil imposé
 MIN_CONTOUR_AREA = 800
+DETECTEUR = "diff"          # diff, diff_contours, contours, histogramme, modele (detecteurs.py)
 NB_PLACES = 8
-INTERVALLE_ANALYSE = 2
+INTERVALLE_ANALYSE = 30     # secondes, au repos (aucun événement)
+INTERVALLE_RAFALE = 0.5     # secondes, après véhicule détecté / barrière ouverte
+DUREE_RAFALE = 10           # secondes de cadence rapide par événement
+ECHANTILLON_DEBUG_CAPTURE = 0  # copie disque parking_current.jpg : 1 capture sur N (0 = jamais)
+SEUIL_CHANGEMENT = 2.0      # écart moyen (0-255) sur vignette 64x48 : en dessous, scène inchangée
+AGE_MAX_ANALYSE = 60        # secondes max sans analyse complète, même scène inchangée
+MARGE_HYSTERESIS = 0.2      # fraction du seuil : occupée au-dessus de seuil × 1.2, libre sous seuil × 0.8
+CONFIRMATION_N = 3          # images concordantes requises pour changer l'état d'une place...
+CONFIRMATION_M = 5          # ...parmi les M dernières
+DELAI_CONFIRMATION = 1.0    # secondes entre deux images tant qu'une place attend confirmation
+FICHIER_FOND = "fond_parking.npy"  # fond adaptatif (repris au redémarrage)
+CONSTANTE_TEMPS_FOND = 600  # secondes : vitesse à laquelle le fond suit la lumière
+INTERVALLE_SAUVEGARDE_FOND = 300  # secondes entre deux sauvegardes du fond
 
 # Paramètres monitoring paiement
 TIMEOUT_PAIEMENT = 300  # 5 minutes max pour payer
+MAX_QR_EN_ATTENTE = 500  # au-delà, les nouveaux QR sont refusés (flood ESP32)
 CHECK_INTERVAL_PAYMENT = 3  # Vérifier toutes les 3 secondes
 
+# Webhook paiement (POST /api/paiement) : le polling devient une réconciliation lente
+WEBHOOK_SECRET = os.environ.get("PARKING_WEBHOOK_SECRET", "")  # vide = webhook désactivé
+CHECK_INTERVAL_RECONCILIATION = 30  # secondes entre deux vérifications si webhook actif
+
+# Mode hors-ligne : décisions d'accès sur une copie SQLite locale
+FICHIER_MIROIR = "parking_local.db"
+INTERVALLE_SYNCHRO = 15     # secondes entre deux synchronisations Supabase ↔ local
+
 # ═══════════════════════════════════════════════════════════════
 # DONNÉES GLOBALES
 # ═══════════════════════════════════════════════════════════════
@@ -75,14 +116,33 @@ PARKING_DATA = {
 }
 
 zones_parking = {}
-image_reference = None
+fond_parking = FondAdaptatif(FICHIER_FOND, CONSTANTE_TEMPS_FOND)  # référence qui suit la lumière
+cache_reference = CacheReference()  # zones de référence en gris (recalculées si la référence change)
+moteur_detection = obtenir_detecteur(ESP32_CAM_IP, ESP32_CAM_PORT, DETECTEUR, cache=cache_reference)
 mqtt_client = None
 mqtt_connected = False
-analyse_en_cours = False
 doit_continuer = True
+detecteur_changement = DetecteurChangement(SEUIL_CHANGEMENT, age_max=AGE_MAX_ANALYSE)
+seuil_occupation = moteur_detection.seuil(SEUIL_OCCUPATION)  # à l'échelle du détecteur choisi
+filtre_occupation = FiltreOccupation.autour(seuil_occupation, MARGE_HYSTERESIS,
+                                            CONFIRMATION_N, CONFIRMATION_M)  # états confirmés par place
+derniere_publication = None  # PARKING_DATA déjà publié
+image_annotee = RenduParesseux(lambda img, donnees: annoter_image(img, donnees))  # JPEG annoté rendu à la demande
+planificateur = PlanificateurAnalyse(INTERVALLE_ANALYSE, INTERVALLE_RAFALE, DUREE_RAFALE)  # repos / rafale + manuel
+pipeline = None
+dispatcheur = DispatcheurMQTT(MQTT_WORKERS)
+publicateur_statut = PublicateurStatut(lambda *args: publier_mqtt(*args), TOPIC_STATUS)  # deltas par place
+miroir = MiroirLocal(supabase, FICHIER_MIROIR)  # rfid_cards / access_codes / transactions en SQLite
+cache_rfid = CacheCartesRFID(supabase, miroir=miroir)  # rfid_cards en mémoire (préchargé dans main)
+journal_acces = JournalAcces(supabase)  # access_logs insérés par lots en arrière-plan
+
+# Registre des codes QR en attente (thread-safe, borné, expiration par tas)
+pending_qr_codes = RegistreQR(TIMEOUT_PAIEMENT, MAX_QR_EN_ATTENTE)
 
-# Dictionnaire pour tracer les codes QR en attente
-pending_qr_codes = {}  # {code: {'timestamp': datetime, 'thread': Thread}}
+# Codes déjà connus payés (webhook / surveillant) → scan en une seule requête
+codes_payes = {}  # {code: transaction}
+codes_payes_lock = threading.Lock()  # webhook / surveillant / scans MQTT
+MAX_CODES_PAYES = 1000
 
 # Variable pour éviter spam notifications
 last_parking_full_notification = 0
@@ -93,15 +153,11 @@ PARKING_FULL_NOTIFICATION_COOLDOWN = 30  # 30 secondes entre notifications
 # ═══════════════════════════════════════════════════════════════
 
 def verify_rfid_card(card_uid):
-    """Vérifier carte RFID dans Supabase"""
+    """Vérifier carte RFID (cache mémoire, puis miroir local, Supabase en dernier recours)"""
     try:
-        response = supabase.table("rfid_cards")\
-            .select("*")\
-            .eq("card_uid", card_uid)\
-            .execute()
+        card = cache_rfid.obtenir(card_uid)
         
-        if response.data and len(response.data) > 0:
-            card = response.data[0]
+        if card is not None:
             is_active = card.get('is_active', False)
             owner_name = card.get('owner_name', 'Unknown')
             
@@ -150,155 +206,199 @@ def verify_rfid_card(card_uid):
         }
 
 def log_access_attempt(identifier, access_type, status, owner_name=None):
-    """Logger les tentatives d'accès"""
-    try:
-        data = {
-            "identifier": identifier,
-            "access_type": access_type,
-            "status": status,
-            "owner_name": owner_name,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        supabase.table("access_logs").insert(data).execute()
-        print(f"📝 Accès loggé: {access_type} - {status}")
-    except Exception as e:
-        print(f"✗ Erreur log: {e}")
+    """Logger les tentatives d'accès (mis en file, jamais bloquant)"""
+    data = {
+        "identifier": identifier,
+        "access_type": access_type,
+        "status": status,
+        "owner_name": owner_name,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    journal_acces.ajouter(data)
+    print(f"📝 Accès loggé: {access_type} - {status}")
 
 # ═══════════════════════════════════════════════════════════════
 # FONCTIONS SUPABASE - QR CODE AVEC MONITORING PAIEMENT
 # ═══════════════════════════════════════════════════════════════
 
 def insert_access_code_to_supabase(access_code):
-    """Insérer nouveau QR code"""
+    """Insérer nouveau QR code (local immédiat, Supabase dès que joignable)"""
     try:
         data = {
             "access_code": access_code,
             "created_at": datetime.utcnow().isoformat(),
             "status": "active"
         }
-        supabase.table("access_codes").insert(data).execute()
-        print(f"✓ QR {access_code} inséré dans Supabase")
-        return True
+        miroir.inserer_code(data)
     except Exception as e:
         print(f"✗ Erreur insertion QR: {e}")
         return False
+    
+    # Le backend paiement doit voir le code : poussée immédiate par le thread du miroir
+    miroir.demander_poussee()
+    print(f"✓ QR {access_code} enregistré (envoi Supabase en arrière-plan)")
+    return True
+
+def paiement_expire(access_code):
+    """Aucun paiement reçu avant TIMEOUT_PAIEMENT (thread du surveillant)"""
+    print(f"\n⏱️  TIMEOUT: QR {access_code}")
+    print(f"   Aucun paiement reçu en {TIMEOUT_PAIEMENT//60} minutes")
+    
+    # Marquer comme expiré
+    try:
+        changer_statut_code(access_code, {"status": "expired"}, ["active"])
+        print(f"🗑️  QR {access_code} marqué comme expiré")
+    except Exception as e:
+        print(f"✗ Erreur expiration: {e}")
+
+def paiement_recu(access_code, transaction, elapsed):
+    """Transaction complétée trouvée pour ce QR (thread du surveillant)"""
+    print(f"\n{'='*60}")
+    print(f"💰 PAIEMENT REÇU !")
+    print(f"{'='*60}")
+    print(f"   QR Code: {access_code}")
+    print(f"   Transaction ID: {transaction.get('id')}")
+    print(f"   User ID: {transaction.get('user_id')}")
+    print(f"   Montant: {transaction.get('amount')} TND")
+    print(f"   Type: {transaction.get('transaction_type')}")
+    print(f"   Timestamp: {transaction.get('timestamp')}")
+    print(f"   Temps écoulé: {elapsed:.0f}s")
+    print(f"{'='*60}\n")
+    
+    # Marquer comme payé
+    try:
+        miroir.enregistrer_transaction(transaction)
+        changer_statut_code(access_code, {"status": "paid"}, ["active"])
+        print(f"✅ QR {access_code} marqué comme PAYÉ")
+    except Exception as e:
+        print(f"✗ Erreur update: {e}")
+    
+    # Logger l'accès
+    log_access_attempt(
+        access_code, 
+        "qr", 
+        "paid_waiting_scan", 
+        transaction.get('user_id')
+    )
+    
+    # Mémoriser pour le scan (déjà retiré du registre par le surveillant)
+    with codes_payes_lock:
+        codes_payes[access_code] = transaction
+        while len(codes_payes) > MAX_CODES_PAYES:
+            codes_payes.pop(next(iter(codes_payes)), None)
+    
+    # Notification MQTT (optionnel)
+    if mqtt_connected:
+        notification = {
+            "code": access_code,
+            "status": "paid",
+            "message": "Paiement reçu ! Scannez le QR pour accéder."
+        }
+        mqtt_client.publish(TOPIC_QR_RESPONSE, json.dumps(notification))
+
+# Un seul thread pour tous les QR en attente (une requête .in_() par tick)
+surveillant_paiements = SurveillantPaiements(
+    supabase,
+    CHECK_INTERVAL_RECONCILIATION if WEBHOOK_SECRET else CHECK_INTERVAL_PAYMENT,
+    pending_qr_codes,
+    on_paye=paiement_recu, on_expire=paiement_expire
+)
+
+def changer_statut_code(access_code, valeurs, statuts):
+    """
+    Mise à jour conditionnelle d'un code (seulement s'il a l'un des statuts)
+
+    Si le code est dans le miroir local, la décision est prise en local
+    (verrou SQLite : deux scanners ne peuvent pas consommer le même code)
+    et Supabase est mis à jour en différé. Sinon, une requête
+    conditionnelle renvoyant la ligne fait la même chose côté Supabase.
+
+    Returns:
+        True si la mise à jour a été appliquée
+    """
+    if miroir.code(access_code) is not None:
+        return miroir.changer_statut_code(access_code, valeurs, statuts)
+    
+    response = supabase.table("access_codes")\
+        .update(valeurs)\
+        .eq("access_code", access_code)\
+        .in_("status", statuts)\
+        .execute()
+    return bool(response.data)
+
+def consommer_code(access_code, statuts):
+    """
+    Passer un code à 'used' seulement s'il a l'un des statuts donnés
+
+    Returns:
+        True si ce scan a consommé le code
+    """
+    return changer_statut_code(
+        access_code, {"status": "used", "used_at": datetime.utcnow().isoformat()}, statuts)
 
-def check_payment_for_qr(access_code):
-    """Vérifier si un paiement existe pour ce QR code"""
+def lire_code(access_code):
+    """Ligne access_codes : miroir local d'abord, Supabase si absente"""
+    code_data = miroir.code(access_code)
+    if code_data is not None:
+        return code_data
+    
+    response = supabase.table("access_codes")\
+        .select("*")\
+        .eq("access_code", access_code)\
+        .execute()
+    if not response.data:
+        return None
+    miroir.inserer_code(response.data[0], differer=False)
+    return response.data[0]
+
+def lire_transaction_payee(access_code):
+    """
+    Transaction complétée : miroir local d'abord
+
+    Absente en local, elle peut être arrivée depuis la dernière
+    synchronisation : Supabase est interrogé. Hors-ligne, le code
+    est considéré non payé.
+    """
+    transaction = miroir.transaction_payee(access_code)
+    if transaction is not None:
+        return transaction
+    
     try:
         response = supabase.table("transactions")\
             .select("*")\
             .eq("access_code", access_code)\
             .eq("status", "completed")\
             .execute()
-        
-        if response.data and len(response.data) > 0:
-            transaction = response.data[0]
-            return {
-                "paid": True,
-                "transaction": transaction
-            }
-        else:
-            return {"paid": False}
-            
     except Exception as e:
-        print(f"✗ Erreur vérification paiement: {e}")
-        return {"paid": False, "error": str(e)}
+        print(f"⚠️  Transactions injoignables, code considéré non payé ({e})")
+        return None
+    if not response.data:
+        return None
+    miroir.enregistrer_transaction(response.data[0])
+    return response.data[0]
 
-def monitor_payment_realtime(access_code):
-    """
-    Monitorer en temps réel le paiement d'un QR code
-    Cette fonction tourne dans un thread séparé
-    """
-    print(f"\n🔍 MONITORING PAIEMENT: {access_code}")
-    print(f"   Timeout: {TIMEOUT_PAIEMENT}s ({TIMEOUT_PAIEMENT//60} minutes)")
+def acces_qr_accorde(access_code, transaction):
+    """Code payé et consommé : log + réponse d'accès"""
+    print(f"\n{'='*60}")
+    print(f"🔢 QR Code: {access_code}")
+    print(f"✅ PAYÉ - ACCÈS AUTORISÉ")
+    print(f"   Transaction ID: {transaction.get('id')}")
+    print(f"   User ID: {transaction.get('user_id')}")
+    print(f"   Montant: {transaction.get('amount')} TND")
+    print(f"{'='*60}\n")
     
-    start_time = datetime.utcnow()
-    check_count = 0
+    log_access_attempt(access_code, "qr", "granted_paid", transaction.get('user_id'))
     
-    while True:
-        elapsed = (datetime.utcnow() - start_time).total_seconds()
-        
-        # Timeout atteint
-        if elapsed > TIMEOUT_PAIEMENT:
-            print(f"\n⏱️  TIMEOUT: QR {access_code}")
-            print(f"   Aucun paiement reçu en {TIMEOUT_PAIEMENT//60} minutes")
-            
-            # Marquer comme expiré
-            try:
-                supabase.table("access_codes")\
-                    .update({"status": "expired"})\
-                    .eq("access_code", access_code)\
-                    .execute()
-                print(f"🗑️  QR {access_code} marqué comme expiré")
-            except Exception as e:
-                print(f"✗ Erreur expiration: {e}")
-            
-            # Retirer de la liste d'attente
-            if access_code in pending_qr_codes:
-                del pending_qr_codes[access_code]
-            
-            break
-        
-        # Vérifier le paiement
-        check_count += 1
-        result = check_payment_for_qr(access_code)
-        
-        if result.get("paid"):
-            transaction = result.get("transaction")
-            
-            print(f"\n{'='*60}")
-            print(f"💰 PAIEMENT REÇU !")
-            print(f"{'='*60}")
-            print(f"   QR Code: {access_code}")
-            print(f"   Transaction ID: {transaction.get('id')}")
-            print(f"   User ID: {transaction.get('user_id')}")
-            print(f"   Montant: {transaction.get('amount')} TND")
-            print(f"   Type: {transaction.get('transaction_type')}")
-            print(f"   Timestamp: {transaction.get('timestamp')}")
-            print(f"   Temps écoulé: {elapsed:.0f}s")
-            print(f"{'='*60}\n")
-            
-            # Marquer comme payé
-            try:
-                supabase.table("access_codes")\
-                    .update({"status": "paid"})\
-                    .eq("access_code", access_code)\
-                    .execute()
-                print(f"✅ QR {access_code} marqué comme PAYÉ")
-            except Exception as e:
-                print(f"✗ Erreur update: {e}")
-            
-            # Logger l'accès
-            log_access_attempt(
-                access_code, 
-                "qr", 
-                "paid_waiting_scan", 
-                transaction.get('user_id')
-            )
-            
-            # Retirer de la liste d'attente
-            if access_code in pending_qr_codes:
-                del pending_qr_codes[access_code]
-            
-            # Notification MQTT (optionnel)
-            if mqtt_connected:
-                notification = {
-                    "code": access_code,
-                    "status": "paid",
-                    "message": "Paiement reçu ! Scannez le QR pour accéder."
-                }
-                mqtt_client.publish(TOPIC_QR_RESPONSE, json.dumps(notification))
-            
-            break
-        
-        # Afficher progression toutes les 10 vérifications
-        if check_count % 10 == 0:
-            remaining = TIMEOUT_PAIEMENT - elapsed
-            print(f"⏳ QR {access_code}: En attente... ({remaining:.0f}s restant)")
-        
-        # Attendre avant prochaine vérification
-        time.sleep(CHECK_INTERVAL_PAYMENT)
+    # Payé puis scanné avant le prochain tick : plus rien à surveiller
+    surveillant_paiements.retirer(access_code)
+    
+    return {
+        "status": "granted", 
+        "paid": True, 
+        "valid": True,
+        "transaction": transaction,
+        "user_id": transaction.get('user_id')
+    }
 
 def verify_qr_code_for_access(access_code):
     """
@@ -306,13 +406,16 @@ def verify_qr_code_for_access(access_code):
     (après que l'utilisateur ait potentiellement payé)
     """
     try:
-        # Vérifier dans access_codes
-        response = supabase.table("access_codes")\
-            .select("*")\
-            .eq("access_code", access_code)\
-            .execute()
+        # Chemin rapide : paiement déjà vu → une seule requête (paid → used)
+        with codes_payes_lock:
+            transaction = codes_payes.pop(access_code, None)
+        if transaction is not None and consommer_code(access_code, ["paid"]):
+            return acces_qr_accorde(access_code, transaction)
+        
+        # Vérifier dans access_codes (local d'abord)
+        code_data = lire_code(access_code)
         
-        if not response.data or len(response.data) == 0:
+        if code_data is None:
             print(f"\n{'='*60}")
             print(f"🔢 QR Code: {access_code}")
             print(f"❌ ACCÈS REFUSÉ (Code invalide ou expiré)")
@@ -325,7 +428,6 @@ def verify_qr_code_for_access(access_code):
                 "valid": False
             }
         
-        code_data = response.data[0]
         code_status = code_data.get("status")
         
         # Vérifier le statut
@@ -355,39 +457,26 @@ def verify_qr_code_for_access(access_code):
                 "valid": False
             }
         
-        # Vérifier transaction
-        tx_response = supabase.table("transactions")\
-            .select("*")\
-            .eq("access_code", access_code)\
-            .eq("status", "completed")\
-            .execute()
+        # Vérifier transaction (local d'abord)
+        transaction = lire_transaction_payee(access_code)
         
-        if tx_response.data and len(tx_response.data) > 0:
-            transaction = tx_response.data[0]
+        if transaction is not None:
             
-            print(f"\n{'='*60}")
-            print(f"🔢 QR Code: {access_code}")
-            print(f"✅ PAYÉ - ACCÈS AUTORISÉ")
-            print(f"   Transaction ID: {transaction.get('id')}")
-            print(f"   User ID: {transaction.get('user_id')}")
-            print(f"   Montant: {transaction.get('amount')} TND")
-            print(f"{'='*60}\n")
-            
-            log_access_attempt(access_code, "qr", "granted_paid", transaction.get('user_id'))
-            
-            # Marquer comme utilisé
-            supabase.table("access_codes")\
-                .update({"status": "used", "used_at": datetime.utcnow().isoformat()})\
-                .eq("access_code", access_code)\
-                .execute()
+            # Consommation conditionnelle : un autre scanner a pu passer entre-temps
+            if not consommer_code(access_code, ["active", "paid"]):
+                print(f"\n{'='*60}")
+                print(f"🔢 QR Code: {access_code}")
+                print(f"❌ ACCÈS REFUSÉ (Code déjà utilisé)")
+                print(f"{'='*60}\n")
+                
+                log_access_attempt(access_code, "qr", "denied_already_used", None)
+                return {
+                    "status": "denied", 
+                    "reason": "already_used", 
+                    "valid": False
+                }
             
-            return {
-                "status": "granted", 
-                "paid": True, 
-                "valid": True,
-                "transaction": transaction,
-                "user_id": transaction.get('user_id')
-            }
+            return acces_qr_accorde(access_code, transaction)
         else:
             print(f"\n{'='*60}")
             print(f"🔢 QR Code: {access_code}")
@@ -395,9 +484,9 @@ def verify_qr_code_for_access(access_code):
             
             # Vérifier si toujours en attente
             if code_status == "active":
-                if access_code in pending_qr_codes:
-                    remaining_time = TIMEOUT_PAIEMENT - (datetime.utcnow() - pending_qr_codes[access_code]['timestamp']).total_seconds()
-                    print(f"⏳ Paiement en attente ({remaining_time:.0f}s restant)")
+                entree = pending_qr_codes.obtenir(access_code)
+                if entree is not None:
+                    print(f"⏳ Paiement en attente ({entree.restant():.0f}s restant)")
                 else:
                     print(f"⏳ Paiement en attente")
             
@@ -460,21 +549,21 @@ def display_pending_codes_status():
     while doit_continuer:
         time.sleep(30)  # Toutes les 30 secondes
         
-        if pending_qr_codes:
+        if len(pending_qr_codes):
             print(f"\n{'─'*60}")
             print(f"📊 CODES QR EN ATTENTE DE PAIEMENT: {len(pending_qr_codes)}")
             print(f"{'─'*60}")
             
-            for code, info in pending_qr_codes.items():
-                elapsed = (datetime.utcnow() - info['timestamp']).total_seconds()
-                remaining = TIMEOUT_PAIEMENT - elapsed
+            # Copie : les autres threads peuvent retirer des codes pendant l'affichage
+            for entree in pending_qr_codes.instantane():
+                remaining = entree.restant()
                 
                 if remaining > 0:
                     minutes = int(remaining // 60)
                     seconds = int(remaining % 60)
-                    print(f"   🔢 {code}: {minutes}m {seconds}s restant")
+                    print(f"   🔢 {entree.code}: {minutes}m {seconds}s restant")
                 else:
-                    print(f"   ⏱️  {code}: EXPIRÉ")
+                    print(f"   ⏱️  {entree.code}: EXPIRÉ")
             
             print(f"{'─'*60}\n")
 
@@ -490,138 +579,160 @@ def on_connect(client, userdata, flags, rc, properties=None):
         
         client.subscribe(TOPIC_RFID)
         client.subscribe(TOPIC_QR)
+        client.subscribe(TOPIC_VEHICLE)
         
         print(f"✓ Abonné à:")
         print(f"  - {TOPIC_RFID}")
         print(f"  - {TOPIC_QR}")
+        print(f"  - {TOPIC_VEHICLE}")
+        
+        # Session neuve : republier l'état complet (retenu) au prochain cycle
+        publicateur_statut.invalider()
     else:
         print(f"✗ MQTT erreur: {rc}")
 
-def on_message(client, userdata, msg):
-    """Callback réception messages MQTT"""
+def publier_mqtt(topic, data, qos=0, retain=False):
+    """Publication JSON, False si non envoyée (hors ligne, file pleine)"""
+    if not mqtt_connected:
+        return False
     try:
-        message = msg.payload.decode('utf-8').strip()
-        topic = msg.topic
+        return mqtt_client.publish(topic, json.dumps(data), qos=qos, retain=retain).rc == mqtt.MQTT_ERR_SUCCESS
+    except Exception as e:
+        print(f"✗ MQTT: {e}")
+        return False
+
+def on_vehicule(client, msg):
+    """Capteur ultrason : passer l'analyse en cadence rapide"""
+    # Le capteur publie en retained : ignorer l'ancien état rejoué à la connexion
+    if msg.retain:
+        return
+    data = json.loads(msg.payload.decode('utf-8'))
+    etat = "détecté" if data.get("detected") else "parti"
+    print(f"\n🚗 Véhicule {etat} → analyse toutes les {INTERVALLE_RAFALE}s pendant {DUREE_RAFALE}s")
+    planificateur.rafale("capteur")
+
+def traiter_rfid(client, msg):
+    """Carte RFID scannée à la borne"""
+    message = msg.payload.decode('utf-8').strip()
+    print(f"\n📨 RFID reçu: {message}")
+    
+    result = verify_rfid_card(message)
+    
+    # Envoyer réponse ESP32
+    client.publish(TOPIC_RFID_RESPONSE, json.dumps(result))
+    
+    # Si valide ET places disponibles → Ouvrir barrière
+    if result.get('valid') and PARKING_DATA['available'] > 0:
+        ouvrir_barriere("RFID", result.get('owner', 'Utilisateur'))
+    elif result.get('valid') and PARKING_DATA['available'] == 0:
+        refuser_acces("PARKING COMPLET")
+        notify_parking_full()  # ← NOTIFICATION PARKING COMPLET
+    else:
+        refuser_acces("CARTE INVALIDE")
+
+def traiter_qr(client, msg):
+    """QR code : nouveau code généré par la borne, ou code scanné pour entrer"""
+    message = msg.payload.decode('utf-8').strip()
+    print(f"\n📨 QR Code reçu: {message}")
+    
+    # Distinguer: nouveau code généré VS scan code existant
+    if message.isdigit() and len(message) == 6:
+        # ═══════════════════════════════════════════════════
+        # NOUVEAU CODE GÉNÉRÉ PAR ESP32
+        # ═══════════════════════════════════════════════════
         
-        # ============ RFID CARD ============
-        if topic == TOPIC_RFID:
-            print(f"\n📨 RFID reçu: {message}")
+        # ✅ VÉRIFIER PLACES DISPONIBLES AVANT GÉNÉRATION
+        if PARKING_DATA['available'] <= 0:
+            print(f"\n{'='*60}")
+            print(f"🔴 GÉNÉRATION QR REFUSÉE")
+            print(f"   Raison: PARKING COMPLET (0/{PARKING_DATA['total']})")
+            print(f"   QR Code: {message}")
+            print(f"{'='*60}\n")
             
-            result = verify_rfid_card(message)
+            # Réponse ESP32 - REFUS
+            response = {
+                "status": "rejected",
+                "code": message,
+                "reason": "parking_full",
+                "available": 0,
+                "total": PARKING_DATA['total'],
+                "message": "PARKING COMPLET - Génération QR impossible"
+            }
+            client.publish(TOPIC_QR_RESPONSE, json.dumps(response))
             
-            # Envoyer réponse ESP32
-            client.publish(TOPIC_RFID_RESPONSE, json.dumps(result))
+            # 🚨 ENVOYER NOTIFICATION PARKING COMPLET
+            notify_parking_full()
             
-            # Si valide ET places disponibles → Ouvrir barrière
-            if result.get('valid') and PARKING_DATA['available'] > 0:
-                ouvrir_barriere("RFID", result.get('owner', 'Utilisateur'))
-            elif result.get('valid') and PARKING_DATA['available'] == 0:
-                refuser_acces("PARKING COMPLET")
-                notify_parking_full()  # ← NOTIFICATION PARKING COMPLET
-            else:
-                refuser_acces("CARTE INVALIDE")
+            # Ne PAS insérer dans Supabase
+            # Ne PAS démarrer monitoring
+            return
         
-        # ============ QR CODE ============
-        elif topic == TOPIC_QR:
-            print(f"\n📨 QR Code reçu: {message}")
+        # ✅ REGISTRE D'ATTENTE D'ABORD (réserve la place dans le registre ;
+        #    un code déjà enregistré passe même si le registre est plein)
+        if not surveillant_paiements.surveiller(message, places=PARKING_DATA['available']):
+            print(f"🔴 GÉNÉRATION QR REFUSÉE: {len(pending_qr_codes)} codes déjà en attente")
+            client.publish(TOPIC_QR_RESPONSE, json.dumps({
+                "status": "rejected",
+                "code": message,
+                "reason": "too_many_pending",
+                "message": "Trop de QR en attente - Réessayez plus tard"
+            }))
+            return
+        
+        # ✅ PLACES DISPONIBLES - GÉNÉRER QR
+        if not insert_access_code_to_supabase(message):
+            # Code non enregistré en base : ne pas le surveiller pour rien
+            surveillant_paiements.retirer(message)
+        else:
+            # Réponse ESP32 - SUCCÈS
+            response = {
+                "status": "received",
+                "code": message,
+                "available": PARKING_DATA['available'],
+                "total": PARKING_DATA['total'],
+                "message": f"QR {message} généré - {PARKING_DATA['available']} places disponibles"
+            }
+            client.publish(TOPIC_QR_RESPONSE, json.dumps(response))
             
-            # Distinguer: nouveau code généré VS scan code existant
-            if message.isdigit() and len(message) == 6:
-                # ═══════════════════════════════════════════════════
-                # NOUVEAU CODE GÉNÉRÉ PAR ESP32
-                # ═══════════════════════════════════════════════════
-                
-                # ✅ VÉRIFIER PLACES DISPONIBLES AVANT GÉNÉRATION
-                if PARKING_DATA['available'] <= 0:
-                    print(f"\n{'='*60}")
-                    print(f"🔴 GÉNÉRATION QR REFUSÉE")
-                    print(f"   Raison: PARKING COMPLET (0/{PARKING_DATA['total']})")
-                    print(f"   QR Code: {message}")
-                    print(f"{'='*60}\n")
-                    
-                    # Réponse ESP32 - REFUS
-                    response = {
-                        "status": "rejected",
-                        "code": message,
-                        "reason": "parking_full",
-                        "available": 0,
-                        "total": PARKING_DATA['total'],
-                        "message": "PARKING COMPLET - Génération QR impossible"
-                    }
-                    client.publish(TOPIC_QR_RESPONSE, json.dumps(response))
-                    
-                    # 🚨 ENVOYER NOTIFICATION PARKING COMPLET
-                    notify_parking_full()
-                    
-                    # Ne PAS insérer dans Supabase
-                    # Ne PAS démarrer monitoring
-                    return
-                
-                # ✅ PLACES DISPONIBLES - GÉNÉRER QR
-                if insert_access_code_to_supabase(message):
-                    # Ajouter à la liste d'attente
-                    pending_qr_codes[message] = {
-                        'timestamp': datetime.utcnow(),
-                        'thread': None,
-                        'places_at_generation': PARKING_DATA['available']
-                    }
-                    
-                    # Démarrer monitoring paiement dans thread séparé
-                    monitor_thread = threading.Thread(
-                        target=monitor_payment_realtime, 
-                        args=(message,),
-                        daemon=True
-                    )
-                    monitor_thread.start()
-                    pending_qr_codes[message]['thread'] = monitor_thread
-                    
-                    # Réponse ESP32 - SUCCÈS
-                    response = {
-                        "status": "received",
-                        "code": message,
-                        "available": PARKING_DATA['available'],
-                        "total": PARKING_DATA['total'],
-                        "message": f"QR {message} généré - {PARKING_DATA['available']} places disponibles"
-                    }
-                    client.publish(TOPIC_QR_RESPONSE, json.dumps(response))
-                    
-                    print(f"\n{'='*60}")
-                    print(f"✅ QR CODE GÉNÉRÉ")
-                    print(f"   Code: {message}")
-                    print(f"   Places disponibles: {PARKING_DATA['available']}/{PARKING_DATA['total']}")
-                    print(f"   Timeout paiement: {TIMEOUT_PAIEMENT//60} minutes")
-                    print(f"{'='*60}\n")
-                    
-                    print(f"🔄 Monitoring démarré pour QR {message}")
-                    print(f"📱 L'utilisateur a {TIMEOUT_PAIEMENT//60} minutes pour payer")
+            print(f"\n{'='*60}")
+            print(f"✅ QR CODE GÉNÉRÉ")
+            print(f"   Code: {message}")
+            print(f"   Places disponibles: {PARKING_DATA['available']}/{PARKING_DATA['total']}")
+            print(f"   Timeout paiement: {TIMEOUT_PAIEMENT//60} minutes")
+            print(f"{'='*60}\n")
             
-            else:
-                # ═══════════════════════════════════════════════════
-                # CODE SCANNÉ POUR ACCÈS
-                # ═══════════════════════════════════════════════════
-                result = verify_qr_code_for_access(message)
-                
-                client.publish(TOPIC_QR_RESPONSE, json.dumps(result))
-                
-                if result.get('valid') and PARKING_DATA['available'] > 0:
-                    user_id = result.get('user_id', f'QR-{message}')
-                    ouvrir_barriere("QR", user_id)
-                elif result.get('valid') and PARKING_DATA['available'] == 0:
-                    refuser_acces("PARKING COMPLET")
-                    notify_parking_full()  # ← NOTIFICATION PARKING COMPLET
-                else:
-                    reason = result.get('reason', 'invalide')
-                    if reason == "unpaid":
-                        refuser_acces("PAIEMENT REQUIS")
-                    elif reason == "expired":
-                        refuser_acces("CODE EXPIRÉ")
-                    elif reason == "already_used":
-                        refuser_acces("CODE UTILISÉ")
-                    else:
-                        refuser_acces("CODE INVALIDE")
+            print(f"🔄 Monitoring démarré pour QR {message}")
+            print(f"📱 L'utilisateur a {TIMEOUT_PAIEMENT//60} minutes pour payer")
+    
+    else:
+        # ═══════════════════════════════════════════════════
+        # CODE SCANNÉ POUR ACCÈS
+        # ═══════════════════════════════════════════════════
+        result = verify_qr_code_for_access(message)
         
-    except Exception as e:
-        print(f"✗ Erreur message MQTT: {e}")
+        client.publish(TOPIC_QR_RESPONSE, json.dumps(result))
+        
+        if result.get('valid') and PARKING_DATA['available'] > 0:
+            user_id = result.get('user_id', f'QR-{message}')
+            ouvrir_barriere("QR", user_id)
+        elif result.get('valid') and PARKING_DATA['available'] == 0:
+            refuser_acces("PARKING COMPLET")
+            notify_parking_full()  # ← NOTIFICATION PARKING COMPLET
+        else:
+            reason = result.get('reason', 'invalide')
+            if reason == "unpaid":
+                refuser_acces("PAIEMENT REQUIS")
+            elif reason == "expired":
+                refuser_acces("CODE EXPIRÉ")
+            elif reason == "already_used":
+                refuser_acces("CODE UTILISÉ")
+            else:
+                refuser_acces("CODE INVALIDE")
+
+# Routage topic → handler (exécuté dans le pool du dispatcheur)
+dispatcheur.enregistrer(TOPIC_RFID, traiter_rfid, limite=LIMITE_RFID)
+dispatcheur.enregistrer(TOPIC_QR, traiter_qr, limite=LIMITE_QR)
+dispatcheur.enregistrer(TOPIC_VEHICLE, on_vehicule)
 
 def ouvrir_barriere(methode, utilisateur):
     """Envoyer commande ouverture barrière"""
@@ -635,6 +746,9 @@ def ouvrir_barriere(methode, utilisateur):
         }
         mqtt_client.publish(TOPIC_BARRIER, json.dumps(commande))
         print(f"🟢 BARRIÈRE OUVERTE - {methode} - {utilisateur}")
+        
+        # Un véhicule va entrer : suivre la place qu'il occupe
+        planificateur.rafale("barriere")
 
 def refuser_acces(raison):
     """Envoyer commande refus"""
@@ -662,85 +776,37 @@ def charger_zones():
         print("✗ zones_parking.json introuvable")
         return False
 
+def capturer_jpeg():
+    camera = obtenir_camera(ESP32_CAM_IP, ESP32_CAM_PORT)
+    return camera.capturer("parking_current.jpg", ECHANTILLON_DEBUG_CAPTURE)
+
 def capturer_image():
-    url = f"http://{ESP32_CAM_IP}:{ESP32_CAM_PORT}/capture"
-    try:
-        req = urllib.request.Request(url)
-        req.add_header('User-Agent', 'SmartParking/1.0')
-        response = urllib.request.urlopen(req, timeout=5)
-        
-        with open("parking_current.jpg", "wb") as f:
-            f.write(response.read())
-        
-        img = cv2.imread("parking_current.jpg")
-        return img
-    except Exception as e:
-        return None
+    camera = obtenir_camera(ESP32_CAM_IP, ESP32_CAM_PORT)
+    return camera.capturer_frame("parking_current.jpg", ECHANTILLON_DEBUG_CAPTURE)
 
-def analyser_zone(img_current, zone_coords, nom_place):
-    global image_reference
-    
-    x, y, w, h = zone_coords
-    zone_current = img_current[y:y+h, x:x+w]
-    
-    resultat = {'occupe': False, 'pourcentage_diff': 0.0}
-    
-    if image_reference is not None:
-        try:
-            zone_ref = image_reference[y:y+h, x:x+w]
-            
-            gray_current = cv2.cvtColor(zone_current, cv2.COLOR_BGR2GRAY)
-            gray_ref = cv2.cvtColor(zone_ref, cv2.COLOR_BGR2GRAY)
-            
-            diff = cv2.absdiff(gray_ref, gray_current)
-            _, thresh = cv2.threshold(diff, 30, 255, cv2.THRESH_BINARY)
-            
-            kernel = np.ones((5,5), np.uint8)
-            thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            
-            pixels_diff = cv2.countNonZero(thresh)
-            pourcentage = (pixels_diff / (w * h)) * 100
-            
-            resultat = {
-                'occupe': pourcentage > SEUIL_OCCUPATION,
-                'pourcentage_diff': pourcentage
-            }
-        except:
-            pass
-    
-    return resultat
+def analyser_zones(img):
+    """Analyser toutes les places en une seule passe plein cadre"""
+    try:
+        return moteur_detection.analyser(img, fond_parking.reference(), zones_parking, seuil_occupation)
+    except Exception:
+        return {nom: {'occupe': False, 'pourcentage_diff': 0.0} for nom in zones_parking}
 
-def analyser_parking():
-    global PARKING_DATA, analyse_en_cours
-    
-    if analyse_en_cours:
-        return
+def analyser_image(img):
+    """Analyser une image décodée et mettre à jour PARKING_DATA"""
+    global PARKING_DATA
     
-    analyse_en_cours = True
+    # Scène identique à la dernière analyse : mêmes résultats (même objet),
+    # sauf si une place attend encore la confirmation de son nouvel état
+    if PARKING_DATA['places'] and not filtre_occupation.en_attente() and not detecteur_changement.a_change(img):
+        return img, PARKING_DATA
     
-    img = capturer_image()
-    if img is None:
-        analyse_en_cours = False
-        return
-    
-    img_result = img.copy()
+    analyses = analyser_zones(img)
+    etats = filtre_occupation.filtrer(analyses)  # hystérésis + N sur M (details garde l'avis brut)
     resultats = {}
     
     for nom_place in sorted(zones_parking.keys()):
-        zone_coords = zones_parking[nom_place]
-        x, y, w, h = zone_coords
-        
-        analyse = analyser_zone(img, zone_coords, nom_place)
-        est_occupe = analyse['occupe']
-        
-        resultats[nom_place] = {'occupe': est_occupe, 'details': analyse}
-        
-        couleur = (0, 0, 255) if est_occupe else (0, 255, 0)
-        cv2.rectangle(img_result, (x, y), (x+w, y+h), couleur, 3)
-        cv2.putText(img_result, f"{nom_place}", (x+10, y+25), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, couleur, 2)
-    
-    cv2.imwrite("parking_annotated.jpg", img_result)
+        analyse = analyses[nom_place]
+        resultats[nom_place] = {'occupe': etats[nom_place], 'details': analyse}
     
     disponibles = sum(1 for p in resultats.values() if not p['occupe'])
     
@@ -762,50 +828,143 @@ def analyser_parking():
         print(f"{'⚠️'*30}\n")
         notify_parking_full()
     
-    print(f"\r[{PARKING_DATA['timestamp']}] Libres: {disponibles}/{len(resultats)} ", end="", flush=True)
+    latence = obtenir_camera(ESP32_CAM_IP, ESP32_CAM_PORT).derniere_latence_ms or 0
+    print(f"\r[{PARKING_DATA['timestamp']}] Libres: {disponibles}/{len(resultats)} | Cam: {latence:.0f}ms ", end="", flush=True)
     
-    if mqtt_connected:
-        status_msg = {
-            'timestamp': PARKING_DATA['timestamp'],
-            'total': PARKING_DATA['total'],
-            'available': disponibles,
-            'occupied': PARKING_DATA['occupied'],
-            'places': {nom: p['occupe'] for nom, p in resultats.items()}
-        }
-        mqtt_client.publish(TOPIC_STATUS, json.dumps(status_msg))
+    # Fond : seulement les places libres (confirmées et sur cette image)
+    fond_parking.mettre_a_jour(img, zones_parking, [nom for nom, p in resultats.items()
+                                                    if not p['occupe'] and not p['details']['occupe']])
+    
+    # Confirmation en cours : image suivante sans attendre l'intervalle de repos
+    if filtre_occupation.en_attente():
+        analyser_parking("confirmation", DELAI_CONFIRMATION)
     
-    analyse_en_cours = False
+    return img, PARKING_DATA
 
-def thread_analyse_automatique():
-    global doit_continuer
-    print(f"\n🔄 Analyse parking auto {INTERVALLE_ANALYSE}s\n")
-    while doit_continuer:
-        analyser_parking()
-        time.sleep(INTERVALLE_ANALYSE)
+def annoter_image(img, donnees):
+    """Dessiner les places sur une copie de l'image (appelé par le rendu à la demande)"""
+    resultats = donnees['places']
+    
+    img_result = img.copy()
+    
+    for nom_place, place in resultats.items():
+        x, y, w, h = zones_parking[nom_place]
+        couleur = (0, 0, 255) if place['occupe'] else (0, 255, 0)
+        cv2.rectangle(img_result, (x, y), (x+w, y+h), couleur, 3)
+        cv2.putText(img_result, f"{nom_place}", (x+10, y+25), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, couleur, 2)
+    
+    return img_result
+
+def publier_resultats(analyse):
+    """Mémoriser l'image pour le rendu à la demande et publier le statut MQTT"""
+    global derniere_publication
+    img, donnees = analyse
+    
+    # Scène inchangée : image annotée et statut déjà à jour
+    if donnees is derniere_publication:
+        return
+    derniere_publication = donnees
+    
+    # Annotation + JPEG seulement si le tableau de bord demande l'image
+    image_annotee.mettre_a_jour(img, donnees)
+    
+    # Seulement les places qui ont basculé (+ compteurs, statut complet rare)
+    publicateur_statut.publier_statut(donnees)
+
+def analyser_parking(source='manuel', delai=0.0):
+    """
+    Demander une analyse au planificateur (ne bloque jamais)
+
+    Les demandes simultanées partagent le même cycle ; appeler
+    .result() sur le Future retourné pour attendre (img, PARKING_DATA).
+    """
+    return planificateur.demander(source, delai)
+
+def demarrer_pipeline_analyse():
+    """Capture à chaque cycle du planificateur (repos / rafale), décodage/analyse/publication dans des threads séparés"""
+    global pipeline
+    print(f"\n🔄 Analyse parking auto {INTERVALLE_ANALYSE}s (rafale {INTERVALLE_RAFALE}s après un événement)\n")
+    pipeline = PipelineAnalyse("capture", capturer_jpeg, planificateur)
+    pipeline.ajouter_etape("decodage", decoder_jpeg)
+    pipeline.ajouter_etape("analyse", analyser_image, resultat=True)
+    pipeline.ajouter_etape("publication", publier_resultats)
+    pipeline.demarrer()
 
 # ═══════════════════════════════════════════════════════════════
 # SERVEUR WEB (code existant maintenu)
 # ═══════════════════════════════════════════════════════════════
 
-class WebHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        pass
-    
+class WebHandler(GestionnaireWeb):
     def do_GET(self):
-        if self.path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write(b"Smart Parking Web Interface")
-        elif self.path == '/api/status':
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(PARKING_DATA).encode())
+        chemin = urlsplit(self.path).path  # ignorer ?query (ex. anti-cache)
+        if chemin == '/':
+            self.envoyer("Smart Parking Web Interface", 'text/html')
+        elif chemin == '/api/status':
+            self.send_json(PARKING_DATA)
+        elif chemin == '/image/parking_annotated.jpg':
+            self.envoyer_rendu(image_annotee)
+        elif chemin == '/api/pipeline':
+            self.send_json(dict(pipeline.stats() if pipeline else {}, changement=detecteur_changement.stats(),
+                                detecteur=moteur_detection.nom,
+                                filtre=filtre_occupation.stats(), fond=fond_parking.stats(),
+                                rendu=image_annotee.stats()))
+        elif chemin == '/api/mqtt':
+            self.send_json(dict(dispatcheur.stats(), statut=publicateur_statut.stats()))
+        elif chemin == '/api/rfid':
+            self.send_json(cache_rfid.stats())
+        elif chemin == '/api/logs':
+            self.send_json(journal_acces.stats())
+        elif chemin == '/api/miroir':
+            self.send_json(miroir.stats())
+        elif chemin == '/api/paiements':
+            self.send_json(dict(surveillant_paiements.stats(), registre=pending_qr_codes.stats()))
+        else:
+            self.send_error(404)
+    
+    def do_POST(self):
+        if urlsplit(self.path).path == '/api/paiement':  # ignorer ?query (ex. signature)
+            self.recevoir_paiement()
+        else:
+            self.send_error(404)
+    
+    def recevoir_paiement(self):
+        """
+        Webhook paiement : transaction complétée poussée par le backend
+
+        Accepte une transaction brute {"access_code", "status", ...} ou
+        le format webhook base de données Supabase {"type", "record": {...}}.
+        Authentifié par l'en-tête X-Webhook-Secret.
+        """
+        secret = self.headers.get('X-Webhook-Secret', '')
+        if not WEBHOOK_SECRET or not hmac.compare_digest(secret.encode(), WEBHOOK_SECRET.encode()):
+            self.close_connection = True  # corps non lu : ne pas réutiliser la connexion
+            self.send_json({'ok': False, 'error': 'unauthorized'}, 401)
+            return
+        
+        try:
+            longueur = int(self.headers.get('Content-Length', 0))
+            donnees = json.loads(self.rfile.read(longueur) or b'{}')
+            transaction = donnees.get('record', donnees)
+            access_code = str(transaction['access_code'])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_json({'ok': False, 'error': 'invalid_payload'}, 400)
+            return
+        
+        if transaction.get('status') != 'completed':
+            self.send_json({'ok': True, 'code': access_code, 'confirme': False})
+            return
+        
+        print(f"\n📥 Webhook paiement: QR {access_code}")
+        confirme = surveillant_paiements.confirmer(access_code, transaction)
+        self.send_json({'ok': True, 'code': access_code, 'confirme': confirme})
+    
+    def send_json(self, data, code=200):
+        self.envoyer_json(data, code)
 
 def start_web():
     try:
-        server = HTTPServer(('0.0.0.0', WEB_PORT), WebHandler)
+        server = ServeurHTTPConcurrent(('0.0.0.0', WEB_PORT), WebHandler)
         print(f"✓ Web: http://localhost:{WEB_PORT}")
         threading.Thread(target=server.serve_forever, daemon=True).start()
     except Exception as e:
@@ -816,7 +975,7 @@ def start_web():
 # ═══════════════════════════════════════════════════════════════
 
 def main():
-    global mqtt_client, image_reference
+    global mqtt_client
     
     print("\n" + "╔" + "="*68 + "╗")
     print("║  🚗 SMART PARKING V2 - NOTIFICATION PARKING COMPLET".center(70) + "║")
@@ -825,17 +984,37 @@ def main():
     if not charger_zones():
         print("⚠️  Lancez: python calibration_8_places.py")
     
-    if os.path.exists("reference_vide.jpg"):
-        image_reference = cv2.imread("reference_vide.jpg")
+    origine = fond_parking.charger("reference_vide.jpg")
+    if origine == 'npy':
+        print(f"✓ Fond adaptatif repris: {FICHIER_FOND}")
+    elif origine == 'image':
         print("✓ Référence parking chargée")
+    fond_parking.demarrer(INTERVALLE_SAUVEGARDE_FOND)
     
     print(f"\n📋 Configuration:")
     print(f"   MQTT: {MQTT_BROKER}:{MQTT_PORT}")
     print(f"   ESP32-CAM: http://{ESP32_CAM_IP}:{ESP32_CAM_PORT}")
     print(f"   Web: http://localhost:{WEB_PORT}")
     print(f"   Supabase: Connecté")
+    if miroir.cycle():
+        stats_miroir = miroir.stats()
+        print(f"   Miroir local: {stats_miroir['cartes']} cartes, {stats_miroir['codes']} codes récents")
+    elif miroir.pret:
+        print(f"   Miroir local: Supabase injoignable, décisions sur la copie locale")
+    miroir.demarrer(INTERVALLE_SYNCHRO)
+    try:
+        print(f"   Cartes RFID: {cache_rfid.precharger()} en cache")
+    except Exception as e:
+        print(f"   Cartes RFID: préchargement impossible ({e})")
+    cache_rfid.demarrer()
+    journal_acces.demarrer()
+    surveillant_paiements.demarrer()
+    publicateur_statut.demarrer()
     print(f"   Timeout paiement: {TIMEOUT_PAIEMENT//60} minutes")
-    print(f"   Check interval: {CHECK_INTERVAL_PAYMENT}s")
+    if WEBHOOK_SECRET:
+        print(f"   Paiements: webhook POST /api/paiement + réconciliation {CHECK_INTERVAL_RECONCILIATION}s")
+    else:
+        print(f"   Check interval: {CHECK_INTERVAL_PAYMENT}s")
     print(f"   🆕 Notification parking complet: ACTIVÉE")
     print("="*70)
     
@@ -843,7 +1022,7 @@ def main():
     try:
         mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         mqtt_client.on_connect = on_connect
-        mqtt_client.on_message = on_message
+        mqtt_client.on_message = dispatcheur.on_message
         mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
         mqtt_client.loop_start()
     except Exception as e:
@@ -862,8 +1041,7 @@ def main():
     
     # Analyse parking auto
     if zones_parking:
-        thread_analyse = threading.Thread(target=thread_analyse_automatique, daemon=True)
-        thread_analyse.start()
+        demarrer_pipeline_analyse()
     
     try:
         while True:
@@ -871,6 +1049,20 @@ def main():
     except KeyboardInterrupt:
         print("\n\n⏹  Arrêt...")
         doit_continuer = False
+        if pipeline:
+            pipeline.arreter()
+        dispatcheur.arreter()
+        publicateur_statut.arreter()
+        cache_rfid.arreter()
+        surveillant_paiements.arreter()
+        journal_acces.arreter()
+        miroir.arreter()
+        try:
+            miroir.pousser()
+        except Exception as e:
+            print(f"⚠️  Écritures locales non envoyées (reprises au démarrage): {e}")
+        fond_parking.arreter()
+        fermer_cameras()
         if mqtt_client:
             mqtt_client.loop_stop()
             mqtt_client.disconnect()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+SERVEUR WEB CONCURRENT (TABLEAU DE BORD + API)
+Pool de threads borné, keep-alive HTTP/1.1, gzip JSON / HTML
+═══════════════════════════════════════════════════════════════
+"""
+
+import gzip
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+TAILLE_POOL = 64             # connexions servies en parallèle (au-delà : file d'attente)
+DELAI_INACTIVITE = 5         # secondes avant de fermer une connexion keep-alive inactive
+TAILLE_MIN_GZIP = 512        # octets : en dessous, gzip ne gagne rien
+TYPES_COMPRESSIBLES = ('application/json', 'text/html', 'text/plain')
+
+# ═══════════════════════════════════════════════════════════════
+# SERVEUR
+# ═══════════════════════════════════════════════════════════════
+
+class ServeurHTTPConcurrent(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer dont les connexions passent par un pool borné
+
+    Un client lent (JPEG sur connexion mobile) n'occupe qu'un thread
+    du pool : /api/status reste servi pour les autres. Avec keep-alive
+    une connexion garde son thread jusqu'à DELAI_INACTIVITE sans
+    requête, d'où un pool plus grand que le nombre de cœurs.
+
+    Une connexion détachée (flux SSE confié à un DiffuseurSSE) n'est
+    pas fermée à la fin de la requête : son thread retourne au pool.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, adresse, handler, nb_threads=TAILLE_POOL):
+        super().__init__(adresse, handler)
+        self._pool = ThreadPoolExecutor(max_workers=nb_threads, thread_name_prefix="web")
+        self._lock_detachees = threading.Lock()
+        self._detachees = set()
+
+    def detacher(self, request):
+        """La socket appartient désormais à l'appelant (ne pas la fermer)"""
+        with self._lock_detachees:
+            self._detachees.add(request)
+
+    def shutdown_request(self, request):
+        with self._lock_detachees:
+            if request in self._detachees:
+                self._detachees.discard(request)
+                return
+        super().shutdown_request(request)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+# ═══════════════════════════════════════════════════════════════
+# HANDLER DE BASE
+# ═══════════════════════════════════════════════════════════════
+
+class GestionnaireWeb(BaseHTTPRequestHandler):
+    """
+    Réponses avec Content-Length (obligatoire en keep-alive) et gzip
+    si le client l'accepte. Toutes les réponses à corps doivent passer
+    par envoyer() / envoyer_json().
+    """
+
+    protocol_version = "HTTP/1.1"
+    timeout = DELAI_INACTIVITE
+    disable_nagle_algorithm = True  # en-têtes et corps écrits séparément : éviter 40 ms d'ACK retardé
+
+    def log_message(self, format, *args):
+        pass
+
+    def accepte_gzip(self):
+        return 'gzip' in self.headers.get('Accept-Encoding', '')
+
+    def envoyer(self, corps, type_contenu, code=200, entetes=None):
+        if isinstance(corps, str):
+            corps = corps.encode('utf-8')
+
+        compresse = (len(corps) >= TAILLE_MIN_GZIP
+                     and type_contenu.split(';')[0] in TYPES_COMPRESSIBLES
+                     and self.accepte_gzip())
+        if compresse:
+            corps = gzip.compress(corps, compresslevel=5)
+
+        self.send_response(code)
+        self.send_header('Content-type', type_contenu)
+        self.send_header('Content-Length', str(len(corps)))
+        if compresse:
+            self.send_header('Content-Encoding', 'gzip')
+        if type_contenu.split(';')[0] in TYPES_COMPRESSIBLES:
+            self.send_header('Vary', 'Accept-Encoding')
+        for nom, valeur in (entetes or {}).items():
+            self.send_header(nom, valeur)
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def envoyer_json(self, data, code=200, entetes=None):
+        self.envoyer(json.dumps(data), 'application/json', code, entetes)
+
+    def envoyer_rendu(self, rendu):
+        """
+        JPEG d'un RenduParesseux (rendu à la première demande)
+
+        ETag = hash du contenu : un navigateur qui a déjà cette image
+        reçoit 304 sans corps.
+        """
+        jpeg, etag, date = rendu.obtenir()
+        if jpeg is None:
+            self.send_error(404)
+            return
+
+        entetes = {
+            'ETag': etag,
+            'Last-Modified': formatdate(date, usegmt=True),
+            'Cache-Control': 'no-cache'
+        }
+        if etag in [e.strip() for e in self.headers.get('If-None-Match', '').split(',')]:
+            self.send_response(304)
+            for nom, valeur in entetes.items():
+                self.send_header(nom, valeur)
+            self.end_headers()
+            return
+
+        self.envoyer(jpeg, 'image/jpeg', entetes=entetes)
+
+    def ouvrir_flux(self, diffuseur, evenement=None, donnees=None):
+        """Répondre en text/event-stream puis confier la socket au diffuseur"""
+        if diffuseur.plein():
+            self.send_error(503)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+        self.close_connection = True
+
+        if diffuseur.ajouter(self.request, evenement, donnees):
+            self.server.detacher(self.request)
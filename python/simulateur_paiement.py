@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+SIMULATEUR WEBHOOK PAIEMENT
+Envoie une fausse transaction complétée au serveur parking
+(remplace le backend de paiement pour les tests en local)
+═══════════════════════════════════════════════════════════════
+
+Usage:
+    export PARKING_WEBHOOK_SECRET=monsecret   (même valeur que le serveur)
+    python simulateur_paiement.py 123456
+    python simulateur_paiement.py 123456 --url http://192.168.1.10:8888 --montant 5
+"""
+
+import argparse
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+
+def envoyer_paiement(url, secret, access_code, montant, format_supabase=False):
+    transaction = {
+        "id": str(uuid.uuid4()),
+        "access_code": access_code,
+        "status": "completed",
+        "amount": montant,
+        "transaction_type": "parking",
+        "user_id": "simulateur",
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    if format_supabase:
+        corps = {"type": "INSERT", "table": "transactions", "record": transaction}
+    else:
+        corps = transaction
+
+    requete = urllib.request.Request(
+        f"{url}/api/paiement",
+        data=json.dumps(corps).encode(),
+        headers={'Content-Type': 'application/json', 'X-Webhook-Secret': secret},
+        method='POST'
+    )
+
+    debut = time.perf_counter()
+    try:
+        with urllib.request.urlopen(requete, timeout=5) as response:
+            resultat = json.loads(response.read())
+            statut = response.status
+    except urllib.error.HTTPError as e:
+        statut = e.code
+        resultat = e.read().decode(errors='replace')
+    duree = (time.perf_counter() - debut) * 1000
+
+    return statut, resultat, duree
+
+def main():
+    parser = argparse.ArgumentParser(description="Simuler un paiement QR (webhook)")
+    parser.add_argument("code", help="QR code (6 chiffres) généré par la borne")
+    parser.add_argument("--url", default="http://localhost:8888", help="serveur parking")
+    parser.add_argument("--secret", default=os.environ.get("PARKING_WEBHOOK_SECRET", ""))
+    parser.add_argument("--montant", type=float, default=2.0, help="montant en TND")
+    parser.add_argument("--supabase", action="store_true", help="format webhook base de données Supabase")
+    args = parser.parse_args()
+
+    print(f"\n💳 Paiement simulé: QR {args.code} ({args.montant} TND) → {args.url}")
+    try:
+        statut, resultat, duree = envoyer_paiement(args.url, args.secret, args.code, args.montant, args.supabase)
+    except OSError as e:
+        print(f"✗ Serveur injoignable: {e}")
+        return
+
+    if statut == 200 and isinstance(resultat, dict) and resultat.get('confirme'):
+        print(f"✓ Paiement confirmé ({duree:.0f}ms)")
+    elif statut == 200:
+        print(f"⚠️  Reçu mais code non surveillé (déjà payé, expiré ou inconnu) ({duree:.0f}ms)")
+    else:
+        print(f"✗ HTTP {statut}: {resultat}")
+
+if __name__ == "__main__":
+    main()
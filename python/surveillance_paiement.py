@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+═══════════════════════════════════════════════════════════════
+SURVEILLANCE DES PAIEMENTS QR (UN SEUL THREAD)
+Une requête transactions .in_() par tick pour tous les codes
+Expirations gérées par le tas d'échéances du RegistreQR
+Confirmation poussée (webhook) : le tick ne sert plus qu'à réconcilier
+═══════════════════════════════════════════════════════════════
+"""
+
+import threading
+import time
+
+# ═══════════════════════════════════════════════════════════════
+# CONFIGURATION
+# ═══════════════════════════════════════════════════════════════
+
+TAILLE_REQUETE = 100         # codes max par requête .in_() (longueur d'URL)
+
+# ═══════════════════════════════════════════════════════════════
+# SURVEILLANT
+# ═══════════════════════════════════════════════════════════════
+
+class SurveillantPaiements:
+    """
+    Remplace un thread + une requête par QR code en attente
+
+    À chaque tick (intervalle secondes), une seule requête vérifie
+    les transactions "completed" de tous les codes surveillés. Les
+    codes dont l'échéance est dépassée sortent du tas et sont signalés
+    sans requête supplémentaire.
+
+    confirmer() permet à une source poussée (webhook de paiement)
+    de déclencher la même transition immédiatement ; le tick devient
+    alors une simple réconciliation lente. Chaque code n'est signalé
+    qu'une fois, quelle que soit la source qui le voit en premier.
+
+    Args:
+        registre: RegistreQR des codes en attente (partagé avec le serveur)
+        on_paye: on_paye(code, transaction, ecoule_s) appelé une fois par code payé
+        on_expire: on_expire(code) appelé une fois par code non payé à temps
+    """
+
+    def __init__(self, supabase, intervalle, registre, on_paye, on_expire):
+        self.supabase = supabase
+        self.intervalle = intervalle
+        self.registre = registre
+        self.on_paye = on_paye
+        self.on_expire = on_expire
+
+        self._cond = threading.Condition()
+        self._actif = False
+
+        # Statistiques
+        self.nb_ticks = 0
+        self.nb_requetes = 0
+        self.nb_payes = 0
+        self.nb_confirmations = 0
+        self.nb_expires = 0
+        self.nb_erreurs = 0
+
+    def surveiller(self, code, places=None):
+        """
+        Ajouter un code (remplace une surveillance existante du même code)
+
+        Returns:
+            False si le registre est plein
+        """
+        if self.registre.ajouter(code, places) is None:
+            return False
+        with self._cond:
+            self._cond.notify()
+        return True
+
+    def retirer(self, code):
+        """Arrêter la surveillance (ex. code utilisé entre-temps)"""
+        return self.registre.retirer(code) is not None
+
+    def confirmer(self, code, transaction):
+        """
+        Paiement signalé de l'extérieur (webhook)
+
+        Returns:
+            True si le code était surveillé (on_paye appelé), sinon False
+        """
+        entree = self.registre.retirer(code)
+        if entree is None:
+            return False
+        self.nb_payes += 1
+        self.nb_confirmations += 1
+        self._appeler(self.on_paye, code, transaction, entree.ecoule())
+        return True
+
+    def __len__(self):
+        return len(self.registre)
+
+    # ───────────────────────────────────────────────────────────
+    # Tick
+    # ───────────────────────────────────────────────────────────
+
+    def _transactions(self, codes):
+        """Transactions complétées pour une liste de codes (requêtes groupées)"""
+        transactions = {}
+        for i in range(0, len(codes), TAILLE_REQUETE):
+            self.nb_requetes += 1
+            response = self.supabase.table("transactions")\
+                .select("*")\
+                .in_("access_code", codes[i:i + TAILLE_REQUETE])\
+                .eq("status", "completed")\
+                .execute()
+            for transaction in response.data or []:
+                transactions.setdefault(transaction.get("access_code"), transaction)
+        return transactions
+
+    def tick(self):
+        """Une vérification de tous les codes surveillés"""
+        self.nb_ticks += 1
+        expires = self.registre.sortir_expires()
+        codes = self.registre.codes()
+
+        for entree in expires:
+            self.nb_expires += 1
+            self._appeler(self.on_expire, entree.code)
+
+        if not codes:
+            return
+
+        try:
+            transactions = self._transactions(codes)
+        except Exception as e:
+            self.nb_erreurs += 1
+            print(f"✗ Erreur vérification paiement: {e}")
+            return
+
+        for code, transaction in transactions.items():
+            entree = self.registre.retirer(code)
+            if entree is None:
+                continue
+            self.nb_payes += 1
+            self._appeler(self.on_paye, code, transaction, entree.ecoule())
+
+    def _appeler(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"✗ Surveillance paiement [{args[0]}]: {e}")
+
+    # ───────────────────────────────────────────────────────────
+    # Thread
+    # ───────────────────────────────────────────────────────────
+
+    def _boucle(self):
+        prochain_tick = time.monotonic()
+        while self._actif:
+            with self._cond:
+                # Rien à surveiller : dormir jusqu'au prochain code
+                while self._actif and not len(self.registre):
+                    self._cond.wait()
+                    prochain_tick = time.monotonic()
+                if not self._actif:
+                    return
+
+                attente = prochain_tick - time.monotonic()
+                echeance = self.registre.prochaine_echeance()
+                if echeance is not None:
+                    attente = min(attente, echeance - time.monotonic())
+                if attente > 0:
+                    self._cond.wait(attente)
+                    continue
+
+            self.tick()
+            prochain_tick = max(prochain_tick + self.intervalle, time.monotonic())
+
+    def demarrer(self):
+        self._actif = True
+        thread = threading.Thread(target=self._boucle, daemon=True)
+        thread.start()
+        return thread
+
+    def arreter(self):
+        with self._cond:
+            self._actif = False
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'codes': len(self.registre),
+                'ticks': self.nb_ticks,
+                'requetes': self.nb_requetes,
+                'payes': self.nb_payes,
+                'confirmations_push': self.nb_confirmations,
+                'expires': self.nb_expires,
+                'erreurs': self.nb_erreurs
+            }
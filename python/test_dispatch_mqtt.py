@@ -0,0 +1,126 @@
+"""
+Test DispatcheurMQTT : limite par topic, ordre dans un topic,
+un topic lent ne bloque pas les autres
+
+Handlers factices synchronisés par threading.Event (pas de sleep),
+aucune dépendance matérielle (cv2, Supabase, broker MQTT).
+
+Lancer depuis python/ :  python test_dispatch_mqtt.py
+"""
+
+import sys
+import threading
+from dispatch_mqtt import DispatcheurMQTT, MessageMQTT
+
+DELAI = 5  # secondes max d'attente d'un événement (échec sinon)
+
+def message(topic, texte):
+    return MessageMQTT(topic, texte.encode('utf-8'), 0, False)
+
+def attendre(evenement, quoi):
+    assert evenement.wait(DELAI), f"timeout : {quoi}"
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_limite_par_topic():
+    dispatcheur = DispatcheurMQTT(nb_workers=8)
+    lock = threading.Lock()
+    etat = {'en_cours': 0, 'max': 0, 'traites': 0}
+    deux_demarres = threading.Event()
+    liberer = threading.Event()
+    tous_traites = threading.Event()
+
+    def handler(client, msg):
+        with lock:
+            etat['en_cours'] += 1
+            etat['max'] = max(etat['max'], etat['en_cours'])
+            if etat['en_cours'] == 2:
+                deux_demarres.set()
+        liberer.wait(DELAI)
+        with lock:
+            etat['en_cours'] -= 1
+            etat['traites'] += 1
+            if etat['traites'] == 5:
+                tous_traites.set()
+
+    dispatcheur.enregistrer("parking/test", handler, limite=2)
+    try:
+        for i in range(5):
+            dispatcheur.soumettre(None, message("parking/test", str(i)))
+        attendre(deux_demarres, "2 traitements simultanés")
+
+        stats = dispatcheur.stats()['routes']["parking/test"]
+        assert stats['en_cours'] == 2, stats
+        assert stats['en_attente'] == 3, stats
+
+        liberer.set()
+        attendre(tous_traites, "5 messages traités")
+        assert etat['max'] == 2, etat
+    finally:
+        liberer.set()
+        dispatcheur.arreter()
+
+def test_ordre_dans_un_topic():
+    dispatcheur = DispatcheurMQTT(nb_workers=8)
+    recus = []
+    liberer = threading.Event()
+    termine = threading.Event()
+
+    def handler(client, msg):
+        liberer.wait(DELAI)
+        recus.append(msg.payload.decode('utf-8'))
+        if len(recus) == 20:
+            termine.set()
+
+    dispatcheur.enregistrer("parking/ordre", handler, limite=1)
+    try:
+        # Le premier message bloque : les 19 suivants passent par la file
+        for i in range(20):
+            dispatcheur.soumettre(None, message("parking/ordre", str(i)))
+        liberer.set()
+        attendre(termine, "20 messages traités")
+        assert recus == [str(i) for i in range(20)], recus
+    finally:
+        liberer.set()
+        dispatcheur.arreter()
+
+def test_topic_lent_ne_bloque_pas():
+    dispatcheur = DispatcheurMQTT(nb_workers=4)
+    lent_demarre = threading.Event()
+    liberer = threading.Event()
+    rapide_traite = threading.Event()
+
+    def handler_lent(client, msg):
+        lent_demarre.set()
+        liberer.wait(DELAI)
+
+    def handler_rapide(client, msg):
+        rapide_traite.set()
+
+    dispatcheur.enregistrer("parking/lent", handler_lent, limite=1)
+    dispatcheur.enregistrer("parking/rapide", handler_rapide, limite=1)
+    try:
+        for i in range(10):
+            dispatcheur.soumettre(None, message("parking/lent", str(i)))
+        attendre(lent_demarre, "handler lent démarré")
+
+        dispatcheur.soumettre(None, message("parking/rapide", "x"))
+        attendre(rapide_traite, "topic rapide traité pendant que le lent bloque")
+        assert not liberer.is_set()
+    finally:
+        liberer.set()
+        dispatcheur.arreter()
+
+if __name__ == "__main__":
+    print("Test dispatch MQTT\n")
+    echecs = 0
+    for test in [test_limite_par_topic, test_ordre_dans_un_topic, test_topic_lent_ne_bloque_pas]:
+        try:
+            test()
+            print(f"✓ {test.__name__}")
+        except Exception as e:
+            echecs += 1
+            print(f"✗ {test.__name__}: {e!r}")
+    sys.exit(1 if echecs else 0)